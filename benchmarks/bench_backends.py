@@ -0,0 +1,46 @@
+import argparse
+import sys
+import time
+
+from src.data.backends import PsutilBackend, ProcfsBackend
+
+
+def tick(backend):
+    # everything SystemDataCollector reads from the backend in one collection pass
+    backend.cpu_times()
+    backend.disk_io_counters()
+    backend.net_io_counters()
+    backend.virtual_memory()
+    backend.swap_memory()
+    backend.disk_usage_percent('/')
+
+
+def per_tick_cost(backend, ticks):
+    tick(backend)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tick(backend)
+    return (time.perf_counter() - start) / ticks
+
+
+def run(ticks=2000):
+    result = {'ticks': ticks, 'psutil_tick_sec': per_tick_cost(PsutilBackend(), ticks), 'procfs_tick_sec': None}
+    if sys.platform.startswith('linux'):
+        backend = ProcfsBackend()
+        result['procfs_tick_sec'] = per_tick_cost(backend, ticks)
+        backend.close()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-tick cost of the collector backends')
+    parser.add_argument('--ticks', type=int, default=2000)
+    args = parser.parse_args()
+
+    result = run(args.ticks)
+    print(f"psutil backend: {result['psutil_tick_sec'] * 1e6:8.1f} us/tick")
+    if result['procfs_tick_sec'] is None:
+        print("procfs backend: skipped (linux only)")
+    else:
+        print(f"procfs backend: {result['procfs_tick_sec'] * 1e6:8.1f} us/tick")
+        print(f"speedup: {result['psutil_tick_sec'] / result['procfs_tick_sec']:.1f}x")
@@ -0,0 +1,61 @@
+import argparse
+import time
+
+from benchmarks.synthetic import synthetic_memory_frame
+from src.visualization.transforms import (
+    UNITS, MEMORY_COMPOSITION_COLUMNS, MEMORY_SWAP_COLUMNS, prepare_memory_composition, prepare_memory_swap
+)
+
+
+def legacy_memory_composition(df, unit):
+    # what ChartGenerator did before: full copy + one python call per cell
+    df_converted = df.copy()
+    for col in MEMORY_COMPOSITION_COLUMNS:
+        df_converted[col] = df_converted[col].apply(lambda x: x / UNITS[unit])
+    return df_converted
+
+
+def legacy_memory_swap(df, unit):
+    df_converted = df.copy()
+    for col in MEMORY_SWAP_COLUMNS:
+        df_converted[col] = df_converted[col].apply(lambda x: x / UNITS[unit])
+    df_converted['memory_usage_percent'] = (df_converted['memory_used'] / df_converted['memory_total']) * 100
+    return df_converted
+
+
+def _best_of(fn, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df, 'GB')
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes=(1_000, 100_000, 1_000_000), repeat=3):
+    results = []
+    for rows in sizes:
+        df = synthetic_memory_frame(rows)
+        for name, legacy, vectorized in [
+            ('memory_composition', legacy_memory_composition, prepare_memory_composition),
+            ('memory_swap', legacy_memory_swap, prepare_memory_swap),
+        ]:
+            results.append({
+                'chart': name,
+                'rows': rows,
+                'legacy_sec': _best_of(legacy, df, repeat),
+                'vectorized_sec': _best_of(vectorized, df, repeat),
+            })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chart data preparation cost, per-cell apply vs vectorized')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'chart':<20}{'rows':>10}{'legacy ms':>14}{'vectorized ms':>16}{'speedup':>10}")
+    for r in run(args.sizes, args.repeat):
+        print(f"{r['chart']:<20}{r['rows']:>10}{r['legacy_sec'] * 1000:>14.2f}"
+              f"{r['vectorized_sec'] * 1000:>16.2f}{r['legacy_sec'] / r['vectorized_sec']:>9.1f}x")
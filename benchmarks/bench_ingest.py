@@ -0,0 +1,89 @@
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import NAMES, START
+from src.data.agent import AgentSink
+from src.data.ingest import IngestServer
+from src.data.storage import DataStorage
+
+
+def agent_samples(ticks, cores=8, processes=50):
+    # (family, sample) pairs of one agent: every tick a system row, one row per core and
+    # the top processes, the same shape the collector daemon produces
+    samples = []
+    for tick in range(ticks):
+        timestamp = START + tick * 1000
+        samples.append(('system', {
+            'timestamp': timestamp, 'cpu_percent': tick % 100, 'memory_percent': 50.0, 'disk_usage': 70.0,
+            'network_bytes_sent': tick * 10, 'network_bytes_recv': tick * 20,
+        }))
+        samples.append(('cpu_cores', {
+            'timestamp': timestamp,
+            'entities': [{'entity': f'cpu{i}', 'busy_percent': (tick + i) % 100} for i in range(cores)],
+        }))
+        samples.append(('process', {
+            'timestamp': timestamp,
+            'processes': [
+                {'pid': pid, 'name': NAMES[pid % len(NAMES)], 'cpu_percent': pid % 100, 'memory_rss': pid << 20,
+                 'read_bytes_per_sec': 0.0, 'write_bytes_per_sec': 0.0}
+                for pid in range(1, processes + 1)
+            ],
+        }))
+    return samples
+
+
+def run(agents=4, ticks=500, cores=8, processes=50, batch_size=2000):
+    # a localhost ingest server on a temp database and agent threads pushing synthetic samples
+    # as fast as they can. rows/sec is measured until every row is committed on the server
+    expected = agents * ticks * (1 + cores + processes)
+    samples = agent_samples(ticks, cores, processes)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = DataStorage(db_path=Path(tmp) / 'ingest.db', archive_dir=None)
+        server = IngestServer('tcp://127.0.0.1:0', storage)
+        server.start()
+        address = f'tcp://127.0.0.1:{server.server_address[1]}'
+
+        def agent(i):
+            sink = AgentSink(address, host=f'agent-{i}', batch_size=batch_size, flush_interval=float('inf'))
+            for family_name, data in samples:
+                sink.save(family_name, data)
+                sink.flush_if_due()
+            sink.close()
+
+        threads = [threading.Thread(target=agent, args=(i,)) for i in range(agents)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        while server.rows < expected:
+            time.sleep(0.01)
+        storage.flush()
+        elapsed = time.perf_counter() - start
+        server.close()
+
+    return {
+        'agents': agents,
+        'ticks': ticks,
+        'rows': expected,
+        'batches': server.batches,
+        'rows_per_sec': expected / elapsed,
+        'elapsed_sec': elapsed,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest server throughput with concurrent synthetic agents')
+    parser.add_argument('--agents', type=int, default=4)
+    parser.add_argument('--ticks', type=int, default=500, help='samples per agent and family')
+    parser.add_argument('--cores', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    result = run(args.agents, args.ticks, args.cores, args.processes, args.batch_size)
+    print(f"{result['agents']} agents, {result['rows']} rows in {result['batches']} batches")
+    print(f"ingest: {result['rows_per_sec']:10.0f} rows/sec")
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+from benchmarks.synthetic import synthetic_processes
+from src.data.process_table import ProcessTable
+from src.visualization.charts import ChartGenerator
+
+
+def legacy_sankey(pids, ppids, names):
+    # what the dashboard did before: one anytree Node per process, a pre-order walk
+    # and a list.index lookup of the parent label for every node
+    from anytree import Node, PreOrderIter
+
+    nodes = {pid: Node(f"{name} ({pid})", pid=pid) for pid, name in zip(pids, names)}
+    root = None
+    for pid, ppid in zip(pids, ppids):
+        if ppid not in nodes or pid == ppid:
+            root = nodes[pid]
+        else:
+            nodes[pid].parent = nodes[ppid]
+
+    node_labels, source, target = [], [], []
+    for i, node in enumerate(PreOrderIter(root)):
+        node_labels.append(node.name)
+        if node.parent:
+            source.append(node_labels.index(node.parent.name))
+            target.append(i)
+    return node_labels, source, target
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run(count=10_000):
+    pids, ppids, names = synthetic_processes(count)
+
+    def table_sankey():
+        table = ProcessTable(pids, ppids, names)
+        return table.labels(), table.sankey_links()
+
+    def table_chart():
+        return ChartGenerator.create_process_chart(ProcessTable(pids, ppids, names))
+
+    result = {
+        'processes': count,
+        'table_sankey_sec': _timed(table_sankey),
+        'table_chart_sec': _timed(table_chart),
+    }
+    try:
+        result['legacy_sankey_sec'] = _timed(legacy_sankey, pids, ppids, names)
+    except ImportError:
+        result['legacy_sankey_sec'] = None
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Process hierarchy build cost, ProcessTable vs anytree + list.index')
+    parser.add_argument('--processes', type=int, default=10_000)
+    args = parser.parse_args()
+
+    result = run(args.processes)
+    print(f"processes: {result['processes']}")
+    print(f"ProcessTable -> sankey arrays : {result['table_sankey_sec'] * 1000:10.1f} ms")
+    print(f"ProcessTable -> plotly figure : {result['table_chart_sec'] * 1000:10.1f} ms")
+    if result['legacy_sankey_sec'] is None:
+        print("anytree + list.index          : skipped (anytree not installed)")
+    else:
+        print(f"anytree + list.index          : {result['legacy_sankey_sec'] * 1000:10.1f} ms")
@@ -0,0 +1,70 @@
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from src.data.storage import DataStorage
+
+LEGACY_QUERY = '''
+INSERT INTO system_metrics (timestamp, cpu_percent, memory_percent, disk_usage, network_bytes_sent, network_bytes_recv)
+VALUES (:timestamp, :cpu_percent, :memory_percent, :disk_usage, :network_bytes_sent, :network_bytes_recv)
+'''
+
+
+def sample_row(i):
+    return {
+        'timestamp': 1_700_000_000_000 + i * 1000,
+        'cpu_percent': i % 100,
+        'memory_percent': 50.0,
+        'disk_usage': 70.0,
+        'network_bytes_sent': i * 10,
+        'network_bytes_recv': i * 20,
+    }
+
+
+def bench_legacy(db_path, rows):
+    # what DataStorage did before: one connection, one row and one commit per save
+    DataStorage(db_path=db_path).close()
+    start = time.perf_counter()
+    for i in range(rows):
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(LEGACY_QUERY, sample_row(i))
+            conn.commit()
+    return rows / (time.perf_counter() - start)
+
+
+def bench_batched(db_path, rows, batch_size):
+    storage = DataStorage(db_path=db_path, batch_size=batch_size, flush_interval=float('inf'))
+    start = time.perf_counter()
+    for i in range(rows):
+        storage.save_to_db(sample_row(i))
+    storage.flush()
+    elapsed = time.perf_counter() - start
+    storage.close()
+    return rows / elapsed
+
+
+def run(rows=2000, batch_size=500):
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = bench_legacy(Path(tmp) / 'legacy.db', rows)
+        batched = bench_batched(Path(tmp) / 'batched.db', rows, batch_size)
+    return {
+        'rows': rows,
+        'batch_size': batch_size,
+        'legacy_inserts_per_sec': legacy,
+        'batched_inserts_per_sec': batched,
+        'speedup': batched / legacy,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DataStorage insert throughput, per-row commits vs batched WAL writes')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    result = run(args.rows, args.batch_size)
+    print(f"legacy  (connect + commit per row): {result['legacy_inserts_per_sec']:10.0f} inserts/sec")
+    print(f"batched (WAL + executemany)       : {result['batched_inserts_per_sec']:10.0f} inserts/sec")
+    print(f"speedup: {result['speedup']:.1f}x")
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import bench_chart_prep, bench_ingest, bench_process_tree, bench_storage
+from benchmarks.synthetic import START, SyntheticBackend, bulk_load, synthetic_process_source
+from src.data.registry import registry
+
+SUITES = ['probes', 'inserts', 'loads', 'chart_prep', 'process_tree', 'ingest']
+
+
+def _best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_probes(ticks=200, processes=500):
+    # latency of every enabled probe over a synthetic backend and process table, so only
+    # the collector's own work is measured and runs are comparable across machines.
+    # the ticks run back to back, so the counter deltas are taken over any interval: with the
+    # usual COUNTER_MIN_INTERVAL most probes would return early without computing anything
+    from src.data.collector import SystemDataCollector
+
+    result = {'ticks': ticks, 'processes': processes}
+    with synthetic_process_source(processes):
+        collector = SystemDataCollector(backend=SyntheticBackend(), min_elapsed=0)
+        families = [family for family in registry if family.probe is not None]
+        for family in families:
+            # primes the counter deltas and the process handles
+            collector.collect(family)
+        # every family once per tick, like the daemon (the overhead probe reports the others' timings)
+        samples = {family.name: [] for family in families}
+        latest = {}
+        for _ in range(ticks):
+            for family in families:
+                start = time.perf_counter()
+                latest[family.name] = collector.collect(family)
+                samples[family.name].append(time.perf_counter() - start)
+        for family in families:
+            # a probe that returns nothing would be timed on its early exit
+            data = latest[family.name]
+            rows = len(data[family.rows_key]) if data and family.rows_key else int(bool(data))
+            if not rows:
+                raise RuntimeError(f'The {family.name} probe returned no data')
+            timings = samples[family.name]
+            result[family.name] = {
+                'rows': rows,
+                'mean_sec': float(np.mean(timings)),
+                'p50_sec': float(np.percentile(timings, 50)),
+                'p95_sec': float(np.percentile(timings, 95)),
+                'max_sec': float(np.max(timings)),
+            }
+        collector.close()
+    return result
+
+
+def bench_loads(sizes=(1_000, 100_000), repeat=3, window=1_000):
+    # DataStorage read paths against tables of each size: the newest window the dashboard
+    # charts, a range scan over the newest 10% of the rows, the incremental tail read of
+    # the RingBuffer, the breakdown join and hourly aggregates over the whole table (raw rows,
+    # bulk_load doesn't fill the rollup tiers)
+    from src.data.storage import DataStorage
+
+    system, cores = registry.get('system'), registry.get('cpu_cores')
+    results = {}
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / 'bench.db'
+            start = time.perf_counter()
+            bulk_load(db_path, system, rows)
+            bulk_load(db_path, cores, rows)
+            build = time.perf_counter() - start
+
+            storage = DataStorage(db_path=db_path, archive_dir=None)
+            recent = START + int(rows * 0.9) * 1000
+            results[str(rows)] = {
+                'bulk_rows_per_sec': 2 * rows / build,
+                'latest_window_sec': _best_of(lambda: storage.load('system', limit=window), repeat),
+                'range_10pct_sec': _best_of(lambda: storage.load('system', limit=None, since=recent), repeat),
+                'load_since_tail_sec': _best_of(
+                    lambda: storage.load_since('system_metrics', rows - 100), repeat
+                ),
+                'breakdown_sec': _best_of(lambda: storage.load_breakdown('cpu_cores', ticks=100), repeat),
+                'aggregate_sec': _best_of(
+                    lambda: storage.aggregate('system', ['cpu_percent'], START, bucket=3600,
+                                              aggregates=['avg', 'max', 'p95']), repeat
+                ),
+            }
+            storage.close()
+    return results
+
+
+def bench_chart_prep_sizes(sizes=(1_000, 100_000, 1_000_000), repeat=3):
+    return {
+        f"{r['chart']}_{r['rows']}": {'legacy_sec': r['legacy_sec'], 'vectorized_sec': r['vectorized_sec']}
+        for r in bench_chart_prep.run(sizes, repeat)
+    }
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout
+        return commit.strip() + ('-dirty' if dirty.strip() else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine():
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run(suites=SUITES, sizes=(1_000, 100_000), chart_sizes=(1_000, 100_000, 1_000_000), ticks=200,
+        probe_processes=500, insert_rows=2000, processes=10_000, repeat=3, agents=4):
+    results = {}
+    for suite in suites:
+        if suite == 'probes':
+            results[suite] = bench_probes(ticks, probe_processes)
+        elif suite == 'inserts':
+            results[suite] = bench_storage.run(insert_rows)
+        elif suite == 'loads':
+            results[suite] = bench_loads(sizes, repeat)
+        elif suite == 'chart_prep':
+            results[suite] = bench_chart_prep_sizes(chart_sizes, repeat)
+        elif suite == 'process_tree':
+            results[suite] = bench_process_tree.run(processes)
+        elif suite == 'ingest':
+            results[suite] = bench_ingest.run(agents)
+        else:
+            raise ValueError(f'Unknown benchmark suite: {suite}')
+    return {'machine': machine(), 'results': results}
+
+
+def flatten(results, prefix=''):
+    # {'loads': {'1000': {'latest_window_sec': x}}} -> {'loads.1000.latest_window_sec': x}
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current):
+    # (metric, baseline, current, ratio) for every timing present in both runs. ratio is
+    # current / baseline: above 1 is slower for *_sec, faster for *_per_sec
+    before, after = flatten(baseline['results']), flatten(current['results'])
+    rows = []
+    for name, value in after.items():
+        if not name.endswith('_sec') or name not in before or not before[name]:
+            continue
+        rows.append((name, before[name], value, value / before[name]))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the collect -> store -> load -> chart pipeline, JSON output')
+    parser.add_argument('--suites', nargs='+', choices=SUITES, default=SUITES)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000],
+                        help='table sizes of the load suite, e.g. 1000 100000 10000000')
+    parser.add_argument('--chart-sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--ticks', type=int, default=200, help='calls per probe')
+    parser.add_argument('--probe-processes', type=int, default=500)
+    parser.add_argument('--insert-rows', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=10_000, help='process tree size')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--agents', type=int, default=4, help='concurrent agents of the ingest suite')
+    parser.add_argument('--output', help='write the results to this file instead of stdout')
+    parser.add_argument('--compare', help='results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    report = run(args.suites, args.sizes, args.chart_sizes, args.ticks, args.probe_processes,
+                 args.insert_rows, args.processes, args.repeat, args.agents)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        print(f"compared to {baseline['machine'].get('commit')}", file=sys.stderr)
+        for name, before, after, ratio in compare(baseline, report):
+            print(f'{name:<60}{before:>14.6g}{after:>14.6g}{ratio:>8.2f}x', file=sys.stderr)
@@ -0,0 +1,228 @@
+import contextlib
+import random
+import sqlite3
+from collections import namedtuple
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import psutil
+
+from src.data.backends import CpuTimes, DiskCounters, MemoryInfo, MountUsage, NetCounters, SwapInfo
+from src.data.storage import DataStorage
+
+# a partition boundary, so archive/rollup code sees whole days
+START = 1_699_920_000_000
+GB = 1024**3
+
+NAMES = ['bash', 'python3', 'sshd', 'systemd', 'cc1', 'make', 'ld', 'node', 'java', 'postgres']
+
+_MemoryRss = namedtuple('_MemoryRss', ['rss'])
+_IoCounters = namedtuple('_IoCounters', ['read_bytes', 'write_bytes'])
+
+
+class SyntheticBackend:
+    # stand-in for PsutilBackend / ProcfsBackend: same methods and return types, counters
+    # that grow by seeded random steps on every read. the collector then runs its whole
+    # delta/rate path without touching the machine, so probe timings only measure our code
+    name = 'synthetic'
+
+    def __init__(self, cores=8, disks=4, nics=4, mounts=4, seed=0):
+        self._rng = random.Random(seed)
+        self._cores = {f'cpu{i}': [0.0] * len(CpuTimes._fields) for i in range(cores)}
+        self._disks = {f'sd{chr(ord("a") + i)}': [0, 0, 0] for i in range(disks)}
+        self._nics = {f'eth{i}': [0, 0] for i in range(nics)}
+        self._mounts = ['/'] + [f'/mnt/data{i}' for i in range(1, mounts)]
+
+    def cpu_times_percpu(self):
+        for values in self._cores.values():
+            values[0] += self._rng.uniform(0, 0.6)   # user
+            values[2] += self._rng.uniform(0, 0.2)   # system
+            values[3] += self._rng.uniform(0.2, 1)   # idle
+            values[4] += self._rng.uniform(0, 0.05)  # iowait
+        return {core: CpuTimes(*values) for core, values in self._cores.items()}
+
+    def cpu_times(self):
+        cores = self.cpu_times_percpu().values()
+        return CpuTimes(*(sum(c[i] for c in cores) for i in range(len(CpuTimes._fields))))
+
+    def disk_io_counters_perdisk(self):
+        for values in self._disks.values():
+            values[0] += self._rng.randint(0, 50_000_000)
+            values[1] += self._rng.randint(0, 20_000_000)
+            values[2] += self._rng.randint(0, 1000)
+        return {disk: DiskCounters(*values) for disk, values in self._disks.items()}
+
+    def disk_io_counters(self):
+        disks = self.disk_io_counters_perdisk().values()
+        return DiskCounters(*(sum(d[i] for d in disks) for i in range(len(DiskCounters._fields))))
+
+    def net_io_counters_pernic(self):
+        for values in self._nics.values():
+            values[0] += self._rng.randint(0, 1_000_000)
+            values[1] += self._rng.randint(0, 5_000_000)
+        return {nic: NetCounters(*values) for nic, values in self._nics.items()}
+
+    def net_io_counters(self):
+        nics = self.net_io_counters_pernic().values()
+        return NetCounters(sum(n.bytes_sent for n in nics), sum(n.bytes_recv for n in nics))
+
+    def virtual_memory(self):
+        total = 16 * GB
+        available = int(total * self._rng.uniform(0.1, 0.8))
+        cached, buffers = 2 * GB, GB // 4
+        used = total - available
+        return MemoryInfo(total, available, used, available - cached - buffers, cached, buffers,
+                          round(used / total * 100, 1))
+
+    def swap_memory(self):
+        total, used = 4 * GB, int(4 * GB * self._rng.uniform(0, 0.3))
+        return SwapInfo(total, used, total - used, round(used / total * 100, 1))
+
+    def disk_usage_percent(self, path='/'):
+        return round(self._rng.uniform(40, 90), 1)
+
+    def mount_usage(self):
+        usage = {}
+        for mount in self._mounts:
+            total = 500 * GB
+            used = int(total * self._rng.uniform(0.4, 0.9))
+            usage[mount] = MountUsage(total, used, total - used, round(used / total * 100, 1))
+        return usage
+
+    def close(self):
+        pass
+
+
+class SyntheticProcess:
+    # the part of psutil.Process that ProcessSampler reads
+    def __init__(self, pid, name, rng):
+        self.pid = pid
+        self._name = name
+        self._rng = rng
+        self._io = [0, 0]
+
+    def oneshot(self):
+        return contextlib.nullcontext()
+
+    def create_time(self):
+        # synthetic pids are never reused
+        return float(self.pid)
+
+    def name(self):
+        return self._name
+
+    def cpu_percent(self, interval=None):
+        return self._rng.uniform(0, 100)
+
+    def memory_info(self):
+        return _MemoryRss(self._rng.randint(1 << 20, 1 << 31))
+
+    def io_counters(self):
+        self._io[0] += self._rng.randint(0, 1 << 20)
+        self._io[1] += self._rng.randint(0, 1 << 20)
+        return _IoCounters(*self._io)
+
+
+class SyntheticPsutil:
+    # the part of the psutil module that ProcessSampler uses, over count synthetic processes.
+    # churn is the fraction of pids replaced by new ones on every pids() call
+    NoSuchProcess = psutil.NoSuchProcess
+    AccessDenied = psutil.AccessDenied
+    ZombieProcess = psutil.ZombieProcess
+
+    def __init__(self, count, churn=0.01, seed=0):
+        self._rng = random.Random(seed)
+        self._churn = churn
+        self._pids = list(range(1, count + 1))
+        self._next_pid = count + 1
+
+    def pids(self):
+        for _ in range(int(len(self._pids) * self._churn)):
+            self._pids[self._rng.randrange(len(self._pids))] = self._next_pid
+            self._next_pid += 1
+        return list(self._pids)
+
+    def Process(self, pid):
+        return SyntheticProcess(pid, self._rng.choice(NAMES), self._rng)
+
+
+def synthetic_process_source(count, churn=0.01, seed=0):
+    # context manager: ProcessSampler reads count synthetic processes instead of the machine's
+    return mock.patch('src.data.process_sampler.psutil', SyntheticPsutil(count, churn, seed))
+
+
+def synthetic_processes(count, seed=0):
+    # pid 1 is the root, every other process picks an earlier one as its parent.
+    # names come from a small pool, so many processes share a name like on a build host
+    rng = random.Random(seed)
+    pids = list(range(1, count + 1))
+    ppids = [0] + [rng.randint(max(1, pid - 50), pid - 1) for pid in pids[1:]]
+    names = [rng.choice(NAMES) for _ in pids]
+    return pids, ppids, names
+
+
+def synthetic_memory_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    total = 16 * GB
+    used = rng.uniform(0.2, 0.9, rows) * total
+    return pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'timestamp': pd.date_range('2024-01-01', periods=rows, freq='s'),
+        'memory_total': np.full(rows, float(total)),
+        'memory_available': total - used,
+        'memory_used': used,
+        'memory_cached': rng.uniform(0, 2, rows) * GB,
+        'memory_buffers': rng.uniform(0, 0.5, rows) * GB,
+        'memory_percent': used / total * 100,
+        'swap_total': np.full(rows, 4.0 * GB),
+        'swap_used': rng.uniform(0, 1, rows) * GB,
+        'swap_free': np.full(rows, 3.0 * GB),
+        'swap_percent': rng.uniform(0, 25, rows),
+    })
+
+
+def synthetic_rows(family, rows, offset=0, entities=4, step_ms=1000, seed=0):
+    # rows of any registered family in its table layout (epoch ms timestamps, entity ids for
+    # the breakdown families), one sample every step_ms. offset continues an earlier chunk.
+    # breakdown families get one row per entity and tick, entity ids 1..entities
+    rng = np.random.default_rng(seed + offset)
+    index = np.arange(offset, offset + rows)
+    data = {}
+    if family.entity_kind:
+        data['timestamp'] = START + (index // entities) * step_ms
+        data['entity_id'] = index % entities + 1
+    else:
+        data['host_id'] = np.zeros(rows, dtype=np.int64)
+        data['timestamp'] = START + index * step_ms
+    for field in family.fields:
+        if field.type == 'INTEGER':
+            data[field.name] = rng.integers(0, 1 << 40, rows)
+        elif field.type == 'TEXT':
+            data[field.name] = rng.choice(NAMES, rows)
+        else:
+            data[field.name] = rng.uniform(0, 100, rows)
+    return pd.DataFrame(data)
+
+
+def bulk_load(db_path, family, rows, entities=4, chunk=100_000):
+    # fills the table of family with rows synthetic rows, straight through sqlite3 in large
+    # transactions so building a 10M row table takes minutes, not hours. the schema comes
+    # from DataStorage, so the loaders see the same tables and indexes as in production
+    DataStorage(db_path=db_path, archive_dir=None).close()
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('PRAGMA synchronous=OFF')
+        if family.entity_kind:
+            conn.executemany(
+                'INSERT OR IGNORE INTO entities (id, kind, name) VALUES (?, ?, ?)',
+                [(i + 1, family.entity_kind, f'{family.entity_kind}{i}') for i in range(entities)],
+            )
+        columns = family.key_columns + family.columns
+        query = f'INSERT INTO {family.table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+        for offset in range(0, rows, chunk):
+            df = synthetic_rows(family, min(chunk, rows - offset), offset, entities)
+            conn.executemany(query, df[columns].itertuples(index=False, name=None))
+            conn.commit()
+    finally:
+        conn.close()
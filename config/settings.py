@@ -7,12 +7,156 @@ ROOT_DIR = Path(__file__).parent.parent
 # data directory
 DATA_DIR = ROOT_DIR / 'data'
 LOG_DIR = DATA_DIR / 'logs'
+LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 # database path
 DB_PATH = DATA_DIR / 'system_info.db'
 
+# database tuning: buffered rows are written in one transaction every DB_BATCH_SIZE rows
+# or DB_FLUSH_INTERVAL seconds, whichever comes first
+DB_BATCH_SIZE = 500
+DB_FLUSH_INTERVAL = 5
+DB_READER_POOL_SIZE = 2
+DB_CACHE_SIZE_KB = 8192
+
+# rollup tiers (name: bucket width in sec) kept next to the raw metric tables
+ROLLUP_TIERS = {'1m': 60, '5m': 300, '1h': 3600}
+
+# retention in days, None keeps the data forever
+RAW_RETENTION_DAYS = 7
+ROLLUP_RETENTION_DAYS = {'1m': 30, '5m': 90, '1h': None}
+
+# old rows are deleted in batches so the writer lock is never held for long
+PRUNE_BATCH_SIZE = 5000
+PRUNE_MAX_BATCHES = 20
+PRUNE_INTERVAL = 3600
+
+# closed time partitions of the raw tables are sealed into Parquet files under ARCHIVE_DIR
+# (None disables the archive). raw rows are only pruned from SQLite once archived
+ARCHIVE_DIR = DATA_DIR / 'archive'
+ARCHIVE_PARTITION_SECONDS = 24 * 3600
+# partitions sealed per table and archiver run, bounds the time a run takes after a long downtime
+ARCHIVE_MAX_PARTITIONS = 24
+ARCHIVE_ROW_GROUP_SIZE = 64 * 1024
+
+# agent mode: the collector daemon ships its samples to a central ingest server instead of
+# writing data/system_info.db, e.g. 'tcp://monitor.example.com:9500' or 'unix:///run/sysmon.sock'.
+# None stores locally
+AGENT_ADDRESS = None
+# rows sent per batch frame, and the longest a row waits before it is sent (sec)
+AGENT_BATCH_SIZE = 500
+AGENT_FLUSH_INTERVAL = 5
+# batches kept while the server is unreachable, the oldest are dropped past this
+AGENT_MAX_PENDING_FRAMES = 1000
+AGENT_CONNECT_TIMEOUT = 2
+# seconds between reconnection attempts
+AGENT_RETRY_INTERVAL = 10
+# where the ingest server (python3 -m src.data.ingest) listens for agents. the frames carry no
+# authentication, so only local agents by default: --listen tcp://0.0.0.0:9500 accepts others
+INGEST_ADDRESS = 'tcp://127.0.0.1:9500'
+
+# Prometheus / OpenMetrics endpoint of the collector daemon (http://<address>/metrics), served
+# from a snapshot rendered once per tick. None disables it. only reachable from this machine by
+# default, 'tcp://0.0.0.0:9464' serves it to a Prometheus server elsewhere
+METRICS_ADDRESS = 'tcp://127.0.0.1:9464'
+# prefix of every exported metric name
+METRICS_PREFIX = 'sysmon'
+# seconds a scrape client may stall before its connection is dropped
+METRICS_SCRAPE_TIMEOUT = 5
+
+# values kept per bucket for the approximate percentiles of DataStorage.aggregate(), buckets
+# with fewer rows get exact percentiles
+AGGREGATE_SAMPLE_SIZE = 2048
+
 # data collection interval (sec)
 COLLECTION_INTERVAL = 5 
 
+# counter readings closer than this (sec) are not turned into rates and percentages, e.g. the
+# first tick right after the collector starts: the next reading covers the whole interval
+COUNTER_MIN_INTERVAL = 0.25
+
+# adaptive sampling: starting from COLLECTION_INTERVAL, the collector samples every
+# ADAPTIVE_MIN_INTERVAL seconds while the watched metrics move and backs off towards
+# ADAPTIVE_MAX_INTERVAL while the system is quiet. False keeps the fixed COLLECTION_INTERVAL
+ADAPTIVE_SAMPLING = True
+ADAPTIVE_MIN_INTERVAL = 0.5
+ADAPTIVE_MAX_INTERVAL = 30
+# (family, metric) pairs in percent that drive the cadence
+ADAPTIVE_WATCH = [('system', 'cpu_percent'), ('memory', 'memory_percent'), ('system_io_wait', 'busy_percentage')]
+# a tick is volatile when a watched metric moved at least ADAPTIVE_DELTA_THRESHOLD points since
+# its previous sample, or drifted at least ADAPTIVE_DRIFT_THRESHOLD points from its recent level
+# (EWMA, weight ADAPTIVE_EWMA_ALPHA), and the move is also ADAPTIVE_NOISE_FACTOR times the recent
+# standard deviation: a system that is steadily noisy doesn't keep the fast cadence
+ADAPTIVE_DELTA_THRESHOLD = 10
+ADAPTIVE_DRIFT_THRESHOLD = 5
+ADAPTIVE_EWMA_ALPHA = 0.1
+ADAPTIVE_NOISE_FACTOR = 3
+# quiet ticks in a row before the interval doubles
+ADAPTIVE_QUIET_TICKS = 10
+# per-family budget: the shortest interval (sec) a family is sampled at, whatever the cadence.
+# the process walk is the most expensive probe, mountpoint usage barely moves
+FAMILY_MIN_INTERVALS = {'process': 5, 'mounts': 30, 'monitor_overhead': 5}
+
+# where system-wide counters are read from: 'procfs' (linux, reads /proc directly),
+# 'psutil', or 'auto' (procfs on linux, psutil everywhere else)
+COLLECTOR_BACKEND = 'auto'
+
+# number of top processes by CPU, by memory and by IO that are stored each tick
+PROCESS_TOP_N = 5
+# metric families that are declared in src/data/registry.py but off by default, e.g. ['sensors', 'host']
+OPTIONAL_METRIC_FAMILIES = []
+
+# probes of one tick run concurrently on this many threads
+COLLECTOR_WORKERS = 4
+# default deadline of a probe (sec) from the start of its tick, an overrunning probe is
+# skipped for that tick. families can override it in the registry
+PROBE_TIMEOUT = 2.0
+
+# timing histograms of the monitor's own probes, storage calls and chart building, stored
+# in monitor_overhead and shown on the dashboard. False removes the timers entirely
+INSTRUMENTATION_ENABLED = True
+# the overhead panel summarizes the last OVERHEAD_WINDOW seconds
+OVERHEAD_WINDOW = 15 * 60
+
+# online alerting in the collector daemon (rules in src/data/alerts.py), events are stored
+# in alert_events and drawn on the charts
+ALERTS_ENABLED = True
+# weight of the newest sample in the EWMA mean/variance of the anomaly rules, and the
+# samples seen before they can fire
+ALERT_EWMA_ALPHA = 0.05
+ALERT_WARMUP_SAMPLES = 30
+# the dashboard reads alert events this far back (sec), so an alert that started before its
+# window and is still firing is shown
+ALERT_LOOKBACK = 24 * 3600
+
+# memory-mapped ring files with the newest samples of the live panels, written by the
+# collector daemon next to SQLite and mapped read-only by the dashboard
+LIVE_STORE_ENABLED = True
+LIVE_STORE_DIR = DATA_DIR / 'live'
+LIVE_STORE_CAPACITY = 4096
+
+# dashboard refresh interval (sec), the dashboard only reads what the collector daemon wrote
+DASHBOARD_REFRESH_INTERVAL = COLLECTION_INTERVAL
+# panels that are expensive to build and change slowly (the process hierarchy) refresh less often
+DASHBOARD_SLOW_REFRESH_INTERVAL = 60
+
+# the summary panel aggregates this many seconds, the history chart offers these ranges (sec)
+# in about HISTORY_POINTS buckets, both computed inside SQLite
+SUMMARY_WINDOW = 3600
+HISTORY_RANGES = {'6 hours': 6 * 3600, '24 hours': 24 * 3600, '7 days': 7 * 86400, '30 days': 30 * 86400}
+HISTORY_POINTS = 300
+# number of most recent samples per metric the dashboard keeps in memory and charts
+DASHBOARD_WINDOW = 100
+
+# figures memoized per dashboard session, and the most rows a cached figure is extended
+# by instead of being rebuilt
+FIGURE_CACHE_SIZE = 32
+FIGURE_PATCH_MAX_POINTS = 50
+
+# time-series traces are downsampled to at most this many points before they are sent
+# to the browser ('lttb' or 'minmax'), None sends every point
+CHART_MAX_POINTS = 2000
+CHART_DOWNSAMPLE_METHOD = 'lttb'
+
 # logging setting
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -43,15 +43,20 @@ fi
 
 echo "Virtual environment is active."
 
-# run data collector as a background job
+cd "$(dirname "$0")"
+export PYTHONPATH="${PYTHONPATH}:$(pwd)"
+
+# run data collector as a background job, a single collector serves every dashboard viewer
 echo "Starting data collector..."
-python3 src/data/collector.py &
+python3 -m src.data.collector &
+COLLECTOR_PID=$!
+
+# stop the collector together with the dashboard
+trap 'kill $COLLECTOR_PID 2>/dev/null' EXIT
 
 # wait a moment for the collector to initialize
 sleep 2
 
-cd "$(dirname "$0")"
-
 # run Streamlit application
 streamlit run src/app/main.py
 
@@ -1,5 +1,5 @@
+import pandas as pd
 import streamlit as st
-import time
 from pathlib import Path
 import sys
 
@@ -8,100 +8,290 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
 from src.data.collector import SystemDataCollector
-from src.data.storage import DataStorage
+from src.data.storage import LOCAL_HOST, DataStorage
+from src.data.buffer import RingBuffer
+from src.data.mmap_store import MmapRingStore, live_families
+from src.data.registry import registry
+from src.data.instrumentation import TimingsWindow, timed
+from src.data.timestamps import epoch_ms, to_datetime
 from src.visualization.charts import ChartGenerator
-from config.settings import COLLECTION_INTERVAL
+from src.visualization.figure_cache import FigureCache
+from src.visualization.transforms import alert_spans
+from config.settings import (
+    ALERT_LOOKBACK, ALERTS_ENABLED, COLLECTION_INTERVAL, DASHBOARD_REFRESH_INTERVAL, DASHBOARD_SLOW_REFRESH_INTERVAL,
+    DASHBOARD_WINDOW, HISTORY_POINTS, HISTORY_RANGES, LIVE_STORE_ENABLED, INSTRUMENTATION_ENABLED, OVERHEAD_WINDOW,
+    SUMMARY_WINDOW
+)
 
-def main():
-    st.title("System Monitoring Dashboard")
+# families with their own panels below
+DEDICATED_PANELS = ('system', 'memory', 'system_io_wait', 'process', 'monitor_overhead', 'alerts')
 
-    # Reset data storage and dashboard generator
-    storage = DataStorage()
-    chart_gen = ChartGenerator()
-
-    # Real time data collection and saving
-    collector = SystemDataCollector()
-    data = collector.collect_system_data()
-
-    if data:
-        storage.save_to_db(data)    
-    
-    # load stored data
-    df = storage.load_data()
-
-    # new feature
-    data_mem = collector.collect_system_memory()
-    if data_mem:
-        storage.save_to_db_mem(data_mem)
-        
-    df_mem = storage.load_data_mem()
-
-    if sys.platform.startswith('linux') or sys.platform == 'win32':
-        data_process_io_wait = collector.collect_process_io_wait_time()
-    
-        if data_process_io_wait:
-            storage.save_to_db_process_io_wait(data_process_io_wait)
-   
-   
-    data_system_io_wait_time = collector.collect_system_io_wait_time()
-    if data_system_io_wait_time:
-        storage.save_to_db_system_io_wait(data_system_io_wait_time)
-    
-    (df_process_io_wait, df_system_io_wait) = storage.load_data_io_wait()
-        
+# Plotly serialization and sending of every chart is timed as one call
+show_chart = timed(st.plotly_chart, name='st.plotly_chart')
 
-    if not df.empty:
+@st.cache_resource
+def get_storage():
+    # shared by every session and rerun so the pooled connections stay open
+    return DataStorage()
 
-        # current system status
-        col1, col2, col3 = st.columns(3)
+@st.cache_resource
+def get_live_store():
+    # read-only mappings of the daemon's ring files, shared by every session
+    return MmapRingStore() if LIVE_STORE_ENABLED else None
 
-        with col1:
-            st.metric("CPU Usage", f"{data['cpu_percent']}%")
-        with col2:
-            st.metric("Memory Usage", f"{data['memory_percent']}%")
-        with col3:
-            st.metric("Disk Usage", f"{data['disk_usage']}%")
+@st.cache_resource
+def dashboard_timings():
+    # this process's own timings, in memory only: the dashboard never writes to the database
+    return TimingsWindow('dashboard', OVERHEAD_WINDOW, DASHBOARD_REFRESH_INTERVAL)
 
+def current_host():
+    # host picked in the sidebar, this machine unless agents report to this database
+    return st.session_state.get('host', LOCAL_HOST)
 
-    if not df_mem.empty:
-        memory_composition_chart = chart_gen.create_memory_composition_chart(df_mem, unit = 'GB')
-        memory_swap_comparison_chart = chart_gen.create_memory_swap_comparison_chart(df_mem, unit = 'GB')
+def host_selector(storage):
+    hosts = storage.hosts()
+    if len(hosts) < 2:
+        return
+    host = st.sidebar.selectbox('Host', list(hosts), format_func=hosts.get, key='host')
+    # figures of another host can't be extended in place with the rows of this one
+    if st.session_state.get('figures_host') != host:
+        st.session_state['figures_host'] = host
+        figure_cache().clear()
 
-        st.plotly_chart(memory_composition_chart)
-        st.plotly_chart(memory_swap_comparison_chart)
+def load_window(storage, table):
+    # live families are read straight from the memory-mapped ring files when the daemon writes them,
+    # which only hold this machine's samples
+    host = current_host()
+    live = get_live_store()
+    family = registry.by_table(table)
+    if host == LOCAL_HOST and live is not None and family in live_families():
+        df = live.frame(family.name, DASHBOARD_WINDOW)
+        if not df.empty:
+            return df
 
-        # cpu-memory chart
-        cpu_memory_chart = chart_gen.create_cpu_memory_chart(df)
-        st.plotly_chart(cpu_memory_chart)
+    # otherwise a per-session ring buffer kept across reruns, only rows newer than the last one seen are read
+    buffers = st.session_state.setdefault('buffers', {})
+    if (table, host) not in buffers:
+        buffers[table, host] = RingBuffer(DASHBOARD_WINDOW)
+    buffer = buffers[table, host]
+    buffer.extend(storage.load_since(table, buffer.last_id, limit=DASHBOARD_WINDOW, host_id=host))
+    return buffer.frame()
 
-        # network chart
-        network_chart = chart_gen.create_network_chart(df)
-        st.plotly_chart(network_chart, use_container_width=True)
+def table_version(storage, table):
+    # change counter of a table: the ring sequence of live families, the last row otherwise.
+    # the host is part of it so figures of different hosts never share a cache entry
+    host = current_host()
+    live = get_live_store()
+    family = registry.by_table(table)
+    if host == LOCAL_HOST and live is not None and family in live_families():
+        seq = live.seq(family.name)
+        if seq:
+            return ('live', seq)
+    return ('db', host, storage.change_counter(table))
 
+def figure_cache():
+    # per session, figures are patched in place and must not be shared between sessions
+    if 'figures' not in st.session_state:
+        st.session_state['figures'] = FigureCache()
+    return st.session_state['figures']
 
+def window_figure(kind, table, build, unit=None):
+    # figure of the dashboard window of table, reused while the table hasn't changed and
+    # extended in place when only a few rows were appended
+    storage = get_storage()
+    return figure_cache().figure(
+        kind, table, table_version(storage, table), lambda: load_window(storage, table), build,
+        window=DASHBOARD_WINDOW, unit=unit
+    )
 
-    # process hierarchy 
-    processes = collector.get_process_data()
-    if len(processes) > 0:
+def window_alerts(storage, family_name=None):
+    # alert episodes over the dashboard window, of one family or all of them. None when
+    # alerting is off. events are read from further back so an alert that fired before the
+    # window and is still going is shown too
+    if not ALERTS_ENABLED:
+        return None
+    now = epoch_ms()
+    # the cadence adapts to the load, the window starts at its oldest sample
+    window = load_window(storage, 'system_metrics')
+    if window.empty:
+        since = now - DASHBOARD_WINDOW * COLLECTION_INTERVAL * 1000
+    else:
+        since = epoch_ms(window['timestamp'].iloc[0].to_pydatetime())
+    events = storage.load('alerts', limit=None, since=since - ALERT_LOOKBACK * 1000, host_id=current_host())
+    if family_name is not None and not events.empty:
+        events = events[events['family'] == family_name]
+    start, end = to_datetime(pd.Series([since, now]))
+    return alert_spans(events, start, end)
+
+def show_annotated(fig, storage, family_name, **kwargs):
+    # the family's alerts drawn over a (possibly cached) figure before it is sent
+    spans = window_alerts(storage, family_name)
+    if spans is not None:
+        ChartGenerator.annotate_alerts(fig, spans)
+    show_chart(fig, **kwargs)
 
-        root = chart_gen.create_process_tree(processes)
+# every panel is its own fragment: it reruns on its own cadence without re-executing the
+# page, and reuses its figures while the collector hasn't published anything new
 
-        fig = chart_gen.create_process_chart(root)
-        st.plotly_chart(fig, use_container_width=True)
+@st.fragment(run_every=DASHBOARD_REFRESH_INTERVAL)
+def status_panel():
+    storage = get_storage()
+    df = load_window(storage, 'system_metrics')
+    if df.empty:
+        st.info("No metrics yet. Make sure the collector is running: python3 -m src.data.collector")
+        return
 
+    # current system status (latest row written by the collector)
+    data = df.iloc[-1]
+    col1, col2, col3 = st.columns(3)
 
-    if not df_process_io_wait.empty:
-        print("draw a chart here")   
+    with col1:
+        st.metric("CPU Usage", f"{data['cpu_percent']}%")
+    with col2:
+        st.metric("Memory Usage", f"{data['memory_percent']}%")
+    with col3:
+        st.metric("Disk Usage", f"{data['disk_usage']}%")
+
+    # alerts still firing, written by the collector daemon
+    spans = window_alerts(storage)
+    if spans is not None:
+        for span in spans[spans['active']].itertuples(index=False):
+            st.warning(span.message)
+
+@st.fragment(run_every=DASHBOARD_SLOW_REFRESH_INTERVAL)
+def summary_panel():
+    # statistics of the last SUMMARY_WINDOW seconds, aggregated inside SQLite: a single row
+    # per family crosses the database boundary however many samples the window holds
+    storage = get_storage()
+    since = epoch_ms() - SUMMARY_WINDOW * 1000
+    system = storage.aggregate('system', ['cpu_percent', 'memory_percent'], since, aggregates=['avg', 'max'],
+                               host_id=current_host())
+    io = storage.aggregate('system_io_wait', ['busy_percentage'], since, aggregates=['p95'], host_id=current_host())
+    if system.empty:
+        return
+
+    st.subheader(f"Last {SUMMARY_WINDOW // 60} minutes")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Average CPU", f"{system['cpu_percent_avg'][0]:.1f}%")
+    with col2:
+        st.metric("Peak CPU", f"{system['cpu_percent_max'][0]:.1f}%")
+    with col3:
+        st.metric("Peak Memory", f"{system['memory_percent_max'][0]:.1f}%")
+    with col4:
+        busy = io['busy_percentage_p95'][0] if not io.empty else None
+        st.metric("p95 IO Busy", f"{busy:.1f}%" if busy is not None else "n/a")
+
+@st.fragment(run_every=DASHBOARD_SLOW_REFRESH_INTERVAL)
+def history_panel():
+    # long-range chart: about HISTORY_POINTS buckets are aggregated in SQLite (from the rollup
+    # tiers when the buckets are wide enough) instead of loading the raw rows
+    storage = get_storage()
+    label = st.selectbox("History", list(HISTORY_RANGES), key='history_range')
+    df = storage.aggregate(
+        'system', ['cpu_percent', 'memory_percent'], epoch_ms() - HISTORY_RANGES[label] * 1000,
+        aggregates=['avg', 'min', 'max'], points=HISTORY_POINTS, host_id=current_host()
+    )
+    if not df.empty:
+        fig = ChartGenerator.create_summary_chart(df, ['cpu_percent', 'memory_percent'], f"CPU and Memory, last {label}")
+        show_chart(fig, use_container_width=True)
+
+@st.fragment(run_every=DASHBOARD_REFRESH_INTERVAL)
+def memory_panel():
+    for kind, build in [
+        ('memory_composition', ChartGenerator.create_memory_composition_chart),
+        ('memory_swap', ChartGenerator.create_memory_swap_comparison_chart),
+    ]:
+        fig = window_figure(kind, 'memory_metrics', lambda df, build=build: build(df, unit = 'GB'), unit='GB')
+        if fig is not None:
+            show_annotated(fig, get_storage(), 'memory')
+
+@st.fragment(run_every=DASHBOARD_REFRESH_INTERVAL)
+def cpu_network_panel():
+    # cpu-memory chart
+    fig = window_figure('cpu_memory', 'system_metrics', ChartGenerator.create_cpu_memory_chart)
+    if fig is not None:
+        show_annotated(fig, get_storage(), 'system')
+
+    # network chart
+    fig = window_figure('network', 'system_metrics', ChartGenerator.create_network_chart)
+    if fig is not None:
+        show_chart(fig, use_container_width=True)
+
+@st.fragment(run_every=DASHBOARD_SLOW_REFRESH_INTERVAL)
+def process_tree_panel():
+    # process hierarchy, read live from the system: the most expensive panel and the one
+    # that changes the least, so it has the slow cadence. agents don't ship it
+    if current_host() != LOCAL_HOST:
+        return
+    processes = SystemDataCollector.get_process_data()
+    if len(processes) > 0:
+        show_chart(ChartGenerator.create_process_chart(processes), use_container_width=True)
+
+@st.fragment(run_every=DASHBOARD_REFRESH_INTERVAL)
+def top_processes_panel():
+    storage = get_storage()
+    fig = figure_cache().figure(
+        'top_processes', 'process_metrics', table_version(storage, 'process_metrics'),
+        lambda: storage.load_top_processes(host_id=current_host()), ChartGenerator.create_top_process_chart
+    )
+    if fig is not None:
+        show_chart(fig, use_container_width=True)
+
+@st.fragment(run_every=DASHBOARD_REFRESH_INTERVAL)
+def system_io_panel():
+    fig = window_figure('system_io_wait', 'system_io_wait', ChartGenerator.create_system_io_wait_char)
+    if fig is not None:
+        show_annotated(fig, get_storage(), 'system_io_wait', use_container_width=True)
+
+@st.fragment(run_every=DASHBOARD_REFRESH_INTERVAL)
+def family_panel(family_name):
+    # per core / disk / mountpoint / interface breakdowns, and a generic line chart for the
+    # opt-in registry families
+    storage = get_storage()
+    family = registry.get(family_name)
+    if family.entity_kind is not None:
+        fig = figure_cache().figure(
+            'breakdown', family.table, table_version(storage, family.table),
+            lambda: storage.load_breakdown(family.name, ticks=DASHBOARD_WINDOW, host_id=current_host()),
+            lambda df: ChartGenerator.create_breakdown_chart(df, family), window=DASHBOARD_WINDOW
+        )
     else:
-        print("psutil doesn't support monitoring of per-process IO wait information")
+        fig = window_figure('metric', family.table, lambda df: ChartGenerator.create_metric_chart(df, family))
+    if fig is not None:
+        show_chart(fig, use_container_width=True)
 
-    if not df_system_io_wait.empty:
-        fig = chart_gen.create_system_io_wait_char(df_system_io_wait)
-        st.plotly_chart(fig, use_container_width=True)
+@st.fragment(run_every=DASHBOARD_REFRESH_INTERVAL)
+def overhead_panel():
+    # where the monitor spends its own time: collector probes and storage calls (stored by the
+    # daemon of the selected host), and this dashboard's loads, chart building and Plotly serialization
+    storage = get_storage()
+    now = epoch_ms()
+    stored = storage.load('monitor_overhead', limit=None, since=now - OVERHEAD_WINDOW * 1000, host_id=current_host())
+    dashboard = pd.DataFrame(dashboard_timings().rows(now))
+    frames = [frame for frame in (stored, dashboard) if not frame.empty]
+    if frames:
+        show_chart(ChartGenerator.create_overhead_chart(pd.concat(frames, ignore_index=True)), use_container_width=True)
 
+def main():
+    st.title("System Monitoring Dashboard")
+    host_selector(get_storage())
 
-    time.sleep(COLLECTION_INTERVAL)
-    st.rerun()
+    # the collector daemon (src/data/collector.py) samples and persists the metrics,
+    # the dashboard only reads them back
+    status_panel()
+    summary_panel()
+    memory_panel()
+    cpu_network_panel()
+    history_panel()
+    process_tree_panel()
+    top_processes_panel()
+    system_io_panel()
+    for family in registry:
+        if family.name not in DEDICATED_PANELS:
+            family_panel(family.name)
+    if INSTRUMENTATION_ENABLED:
+        overhead_panel()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,165 @@
+import logging
+import socket
+import threading
+import time
+from collections import deque
+
+from config.settings import (
+    AGENT_BATCH_SIZE, AGENT_CONNECT_TIMEOUT, AGENT_FLUSH_INTERVAL, AGENT_MAX_PENDING_FRAMES, AGENT_RETRY_INTERVAL
+)
+from src.data.registry import registry
+from src.data.timestamps import epoch_ms
+from src.data.wire import encode_batch, encode_hello, parse_address
+
+logger = logging.getLogger(__name__)
+
+
+def flatten(family, data, timestamp):
+    # one sample of a family -> its rows in table layout, the rows DataStorage would insert
+    # with entity names instead of ids. the server sets the host
+    rows = []
+    for row in family.rows(data, timestamp, entity_id=lambda kind, name: name):
+        if family.entity_kind:
+            row['entity'] = row.pop('entity_id')
+        else:
+            del row['host_id']
+        rows.append(row)
+    return rows
+
+
+class AgentSink:
+    # takes the place of DataStorage in the collector daemon when it runs as an agent: samples
+    # are buffered per family and encoded into one binary BATCH frame every batch_size rows or
+    # flush_interval seconds. a background thread connects and sends the frames, so an
+    # unreachable server never stalls the sampling thread. frames that can't be sent are kept
+    # (up to max_pending, oldest dropped first) and resent once the server is reachable again
+    def __init__(self, address, host=None, batch_size=AGENT_BATCH_SIZE, flush_interval=AGENT_FLUSH_INTERVAL,
+                 max_pending=AGENT_MAX_PENDING_FRAMES):
+        self.address = address
+        self._family, self._address = parse_address(address)
+        self.host = host or socket.gethostname()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = {}
+        self._row_count = 0
+        self._last_flush = time.monotonic()
+        self._unsent = deque(maxlen=max_pending)
+        self._sock = None
+        self._next_connect = 0
+        self.sent_frames = self.dropped_frames = 0
+        # guards _unsent, the sender waits on it for new frames
+        self._pending = threading.Condition()
+        self._closing = False
+        self._sender = threading.Thread(target=self._send_loop, name='agent-sender', daemon=True)
+        self._sender.start()
+
+    def save(self, family_name, data):
+        if data is None:
+            return
+        family = registry.get(family_name)
+        try:
+            rows = flatten(family, data, epoch_ms(data['timestamp']))
+        except Exception as e:
+            logger.error(f'Error buffering {family_name} metrics: {e}')
+            return
+        self._rows.setdefault(family_name, []).extend(rows)
+        self._row_count += len(rows)
+
+    def flush_if_due(self):
+        if self._row_count >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if self._rows:
+            rows, self._rows, self._row_count = self._rows, {}, 0
+            try:
+                frame = encode_batch(rows)
+            except Exception as e:
+                logger.error(f'Error encoding a batch: {e}')
+                frame = None
+            if frame is not None:
+                with self._pending:
+                    if len(self._unsent) == self._unsent.maxlen:
+                        self.dropped_frames += 1
+                        logger.warning('Ingest server unreachable for too long, dropping the oldest batch')
+                    self._unsent.append(frame)
+                    self._pending.notify()
+
+    def _connect(self):
+        if time.monotonic() < self._next_connect:
+            return None
+        sock = socket.socket(self._family, socket.SOCK_STREAM)
+        sock.settimeout(AGENT_CONNECT_TIMEOUT)
+        try:
+            sock.connect(self._address)
+            sock.sendall(encode_hello(self.host))
+        except OSError as e:
+            sock.close()
+            self._next_connect = time.monotonic() + AGENT_RETRY_INTERVAL
+            logger.warning(f'Cannot reach the ingest server at {self.address}: {e}')
+            return None
+        logger.info(f'Connected to the ingest server at {self.address} as {self.host}')
+        return sock
+
+    def _send_loop(self):
+        # sender thread: delivers the oldest frame first, waits for new frames or the next
+        # reconnection attempt in between. once closing it makes one last attempt and exits
+        while True:
+            with self._pending:
+                while not self._closing and (
+                        not self._unsent or self._sock is None and time.monotonic() < self._next_connect):
+                    timeout = self._next_connect - time.monotonic() if self._unsent else None
+                    self._pending.wait(timeout)
+                if not self._unsent:
+                    return
+                closing = self._closing
+            if closing:
+                self._next_connect = 0
+            if not self._send_pending() and closing:
+                return
+
+    def _send_pending(self):
+        # True once every frame queued so far is sent
+        while True:
+            with self._pending:
+                if not self._unsent:
+                    return True
+                frame = self._unsent[0]
+            if self._sock is None:
+                self._sock = self._connect()
+                if self._sock is None:
+                    return False
+            try:
+                self._sock.sendall(frame)
+            except OSError as e:
+                logger.warning(f'Lost the connection to the ingest server: {e}')
+                self._sock.close()
+                self._sock = None
+                self._next_connect = time.monotonic() + AGENT_RETRY_INTERVAL
+                return False
+            with self._pending:
+                # unless flush() dropped it meanwhile to make room
+                if self._unsent and self._unsent[0] is frame:
+                    self._unsent.popleft()
+                self.sent_frames += 1
+
+    # retention and archiving happen on the ingest server
+
+    def archive(self, *args, **kwargs):
+        return 0
+
+    def prune(self, *args, **kwargs):
+        return 0
+
+    def close(self):
+        self.flush()
+        with self._pending:
+            self._closing = True
+            self._pending.notify()
+        self._sender.join()
+        if self._unsent:
+            logger.warning(f'{len(self._unsent)} batches not delivered to the ingest server')
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
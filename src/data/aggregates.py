@@ -0,0 +1,149 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from config.settings import AGGREGATE_SAMPLE_SIZE
+from src.data.rollup import DEFAULT_INTERVAL_MS, rollup_table, weight
+
+# summary statistics computed inside SQLite: DataStorage.aggregate() groups the rows of a time
+# range into buckets with one GROUP BY, only the aggregated rows are sent back to pandas.
+# 'p<q>' (p50, p95, p99.9, ...) asks for an approximate percentile
+AGGREGATES = ('avg', 'min', 'max', 'count', 'last')
+
+
+class _Latest:
+    # latest(timestamp, value): the value of the row with the newest timestamp
+    def __init__(self):
+        self.timestamp = None
+        self.value = None
+
+    def step(self, timestamp, value):
+        if self.timestamp is None or timestamp >= self.timestamp:
+            self.timestamp, self.value = timestamp, value
+
+    def finalize(self):
+        return self.value
+
+
+class _ApproxQuantile:
+    # approx_quantile(value, q): q-quantile of a uniform reservoir sample of at most
+    # AGGREGATE_SAMPLE_SIZE values, so memory stays bounded whatever the size of a bucket.
+    # exact while a bucket holds fewer rows than that
+    def __init__(self):
+        self.q = None
+        self.seen = 0
+        self.sample = []
+        self.rng = random.Random(0)
+
+    def step(self, value, q):
+        if value is None:
+            return
+        self.q = q
+        self.seen += 1
+        if len(self.sample) < AGGREGATE_SAMPLE_SIZE:
+            self.sample.append(value)
+        else:
+            i = self.rng.randrange(self.seen)
+            if i < AGGREGATE_SAMPLE_SIZE:
+                self.sample[i] = value
+
+    def finalize(self):
+        if not self.sample:
+            return None
+        return float(np.quantile(self.sample, self.q))
+
+
+def register_functions(conn):
+    conn.create_aggregate('latest', 2, _Latest)
+    conn.create_aggregate('approx_quantile', 2, _ApproxQuantile)
+
+
+def percentile(name):
+    # 'p95' -> 0.95, None for the other aggregates
+    if not name.startswith('p'):
+        return None
+    try:
+        q = float(name[1:]) / 100
+    except ValueError:
+        return None
+    return q if 0 <= q <= 1 else None
+
+
+def check_aggregates(aggregates):
+    for name in aggregates:
+        if name not in AGGREGATES and percentile(name) is None:
+            raise ValueError(f'Unknown aggregate: {name} (use {", ".join(AGGREGATES)} or p<percentile>)')
+
+
+def _bucket(width):
+    # bucket start of every row, buckets are aligned to the epoch. without a width the whole
+    # range is a single bucket starting at its first row
+    return f'timestamp - timestamp % {width}' if width else 'min(timestamp)'
+
+
+def _column(metric, name):
+    return f'{metric}_{name}'.replace('.', '_')
+
+
+def raw_query(table, metrics, aggregates, width):
+    # the selected columns are named <metric>_<aggregate>
+    selected = []
+    for metric in metrics:
+        for name in aggregates:
+            q = percentile(name)
+            if q is not None:
+                expression = f'approx_quantile({metric}, {q!r})'
+            elif name == 'last':
+                expression = f'latest(timestamp, {metric})'
+            elif name == 'avg':
+                # weighted by the time each sample covers, rows without a value weigh nothing
+                expression = f'sum({metric} * {weight()}) / sum(CASE WHEN {metric} IS NOT NULL THEN {weight()} END)'
+            else:
+                expression = f'{name}({metric})'
+            selected.append(f'{expression} AS {_column(metric, name)}')
+    return f'SELECT {_bucket(width)} AS bucket, {", ".join(selected)} FROM {table}'
+
+
+def aggregate_frame(df, metrics, aggregates, width):
+    # the result of raw_query computed by pandas, for raw rows that are partly in the Parquet
+    # archive. percentiles are exact here, averages are weighted by interval_ms like in SQLite
+    names = [_column(metric, name) for metric in metrics for name in aggregates]
+    if df.empty:
+        return pd.DataFrame(columns=['bucket'] + names)
+    df = df.sort_values('timestamp')
+    bucket = df['timestamp'] - df['timestamp'] % width if width else pd.Series(df['timestamp'].min(), index=df.index)
+    bucket = bucket.rename('bucket')
+    grouped = df.groupby(bucket)
+    intervals = df['interval_ms'] if 'interval_ms' in df else pd.Series(np.nan, index=df.index)
+    intervals = intervals.astype('float64').fillna(DEFAULT_INTERVAL_MS)
+    columns = {}
+    for metric in metrics:
+        for name in aggregates:
+            q = percentile(name)
+            values = grouped[metric]
+            if q is not None:
+                columns[_column(metric, name)] = values.quantile(q)
+            elif name == 'avg':
+                weights = intervals.where(df[metric].notna())
+                weighted = (df[metric] * weights).groupby(bucket).sum(min_count=1)
+                columns[_column(metric, name)] = weighted / weights.groupby(bucket).sum(min_count=1)
+            else:
+                columns[_column(metric, name)] = getattr(values, {'avg': 'mean'}.get(name, name))()
+    return pd.DataFrame(columns).reset_index()
+
+
+def rollup_query(table, tier, metrics, aggregates, width):
+    # the same result from a rollup tier: its buckets are merged into the wider ones.
+    # percentiles can't be derived from the tiers
+    selected = []
+    for metric in metrics:
+        expressions = {
+            'avg': f'sum({metric}_sum) / sum(interval_sum)',
+            'min': f'min({metric}_min)',
+            'max': f'max({metric}_max)',
+            'count': 'sum(sample_count)',
+            'last': f'latest(last_timestamp, {metric}_last)',
+        }
+        selected += [f'{expressions[name]} AS {_column(metric, name)}' for name in aggregates]
+    return f'SELECT {_bucket(width)} AS bucket, {", ".join(selected)} FROM {rollup_table(table, tier)}'
@@ -0,0 +1,201 @@
+import logging
+import math
+from collections import deque
+
+from config.settings import ALERT_EWMA_ALPHA, ALERT_WARMUP_SAMPLES, ALERTS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# every update below is O(1) (amortized for the deques) and its memory is bounded by the rule,
+# not by how much history exists: alerting never reads the metric tables back
+
+
+class Ewma:
+    # exponentially weighted mean and variance. score(x) is how many standard deviations x
+    # is from the mean of the samples before it, None until warmup samples were seen
+    def __init__(self, alpha=ALERT_EWMA_ALPHA, warmup=ALERT_WARMUP_SAMPLES):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def update(self, x):
+        score = None
+        diff = x - self.mean
+        if self.count >= self.warmup and self.var > 0:
+            score = diff / math.sqrt(self.var)
+
+        if self.count == 0:
+            self.mean = x
+        else:
+            increment = self.alpha * diff
+            self.mean += increment
+            self.var = (1 - self.alpha) * (self.var + diff * increment)
+        self.count += 1
+        return score
+
+
+class RollingExtrema:
+    # min and max over the last window_ms, with one monotonic deque each: a sample is
+    # dropped as soon as a newer one makes it irrelevant, or when it leaves the window
+    def __init__(self, window_ms):
+        self.window_ms = window_ms
+        self._min = deque()
+        self._max = deque()
+
+    def update(self, timestamp, x):
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((timestamp, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((timestamp, x))
+
+        cutoff = timestamp - self.window_ms
+        while self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max[0][0] <= cutoff:
+            self._max.popleft()
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+
+class Sustained:
+    # turns a per-sample condition into alert transitions: 'firing' once the condition has
+    # held for duration_ms, 'resolved' on the first sample it no longer holds
+    def __init__(self, duration_ms=0):
+        self.duration_ms = duration_ms
+        self.since = None
+        self.firing = False
+
+    def update(self, timestamp, condition):
+        if not condition:
+            self.since = None
+            if self.firing:
+                self.firing = False
+                return 'resolved'
+            return None
+
+        if self.since is None:
+            self.since = timestamp
+        if not self.firing and timestamp - self.since >= self.duration_ms:
+            self.firing = True
+            return 'firing'
+        return None
+
+
+class AlertRule:
+    # one metric of a single-row family, checked on every sample:
+    #   'above'   value > threshold
+    #   'rise'    value - its minimum over window seconds >= threshold (e.g. swap climbing)
+    #   'anomaly' |EWMA z-score| >= threshold
+    # and reported once the condition held for duration seconds
+    KINDS = ('above', 'rise', 'anomaly')
+
+    def __init__(self, name, family, metric, kind, threshold, duration=0, window=None, severity='warning',
+                 description=None):
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown alert kind: {kind}')
+        if kind == 'rise' and not window:
+            raise ValueError(f'Alert rule {name} needs a window')
+        self.name = name
+        self.family = family
+        self.metric = metric
+        self.kind = kind
+        self.threshold = threshold
+        self.duration = duration
+        self.window = window
+        self.severity = severity
+        self.description = description or name
+
+    def state(self):
+        return _RuleState(self)
+
+    def message(self, value):
+        return f'{self.description} ({self.metric} = {value:.1f})'
+
+
+class _RuleState:
+    __slots__ = ('rule', 'ewma', 'extrema', 'sustained')
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.ewma = Ewma() if rule.kind == 'anomaly' else None
+        self.extrema = RollingExtrema(rule.window * 1000) if rule.kind == 'rise' else None
+        self.sustained = Sustained(rule.duration * 1000)
+
+    def update(self, timestamp, value):
+        rule = self.rule
+        if rule.kind == 'above':
+            condition = value > rule.threshold
+        elif rule.kind == 'rise':
+            self.extrema.update(timestamp, value)
+            condition = value - self.extrema.min >= rule.threshold
+        else:
+            score = self.ewma.update(value)
+            condition = score is not None and abs(score) >= rule.threshold
+        return self.sustained.update(timestamp, condition)
+
+
+DEFAULT_RULES = [
+    AlertRule('cpu_pegged', 'system', 'cpu_percent', 'above', 90, duration=120, severity='critical',
+              description='CPU above 90% for 2 minutes'),
+    AlertRule('cpu_anomaly', 'system', 'cpu_percent', 'anomaly', 4, severity='info',
+              description='Unusual CPU usage'),
+    AlertRule('memory_high', 'system', 'memory_percent', 'above', 90, duration=60, severity='warning',
+              description='Memory above 90% for 1 minute'),
+    AlertRule('swap_climbing', 'memory', 'swap_percent', 'rise', 10, window=600, severity='warning',
+              description='Swap usage up 10 points in 10 minutes'),
+    AlertRule('io_saturated', 'system_io_wait', 'busy_percentage', 'above', 90, duration=60, severity='warning',
+              description='Disks busy above 90% for 1 minute'),
+    AlertRule('io_anomaly', 'system_io_wait', 'busy_percentage', 'anomaly', 4, severity='info',
+              description='Unusual disk busy time'),
+]
+
+
+class AlertEngine:
+    # online detection stage of the collector daemon: fed every sample of the single-row
+    # families as it is stored, returns the alert events (firing / resolved) it caused
+    def __init__(self, rules=None, enabled=ALERTS_ENABLED):
+        self.enabled = enabled
+        self._states = {}
+        for rule in DEFAULT_RULES if rules is None else rules:
+            self._states.setdefault(rule.family, []).append(rule.state())
+
+    def observe(self, family_name, data):
+        if not self.enabled:
+            return []
+        events = []
+        for state in self._states.get(family_name, ()):
+            rule = state.rule
+            value = data.get(rule.metric)
+            if value is None:
+                continue
+            transition = state.update(data['timestamp'], value)
+            if transition is None:
+                continue
+            events.append({
+                'family': family_name,
+                'metric': rule.metric,
+                'rule': rule.name,
+                'severity': rule.severity,
+                'state': transition,
+                'value': value,
+                'message': rule.message(value),
+            })
+            logger.log(logging.WARNING if transition == 'firing' else logging.INFO,
+                       f'Alert {rule.name} {transition}: {rule.message(value)}')
+        return events
+
+    def rules(self):
+        return [state.rule.name for states in self._states.values() for state in states]
+
+    def active(self):
+        return [state.rule.name for states in self._states.values() for state in states if state.sustained.firing]
@@ -0,0 +1,103 @@
+import logging
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config.settings import ARCHIVE_ROW_GROUP_SIZE
+
+logger = logging.getLogger(__name__)
+
+ARROW_TYPES = {
+    'INTEGER': pa.int64(),
+    'REAL': pa.float64(),
+    'TEXT': pa.string(),
+}
+
+# monotonic integer columns, delta encoded instead of dictionary encoded
+_DELTA_COLUMNS = ('id', 'timestamp')
+
+
+def arrow_schema(family):
+    # same columns as the SQLite table of the family, so every partition file has the same schema
+    fields = [pa.field('id', pa.int64())] if not family.entity_kind else []
+    fields.append(pa.field('timestamp', pa.int64()))
+    if family.entity_kind:
+        fields.append(pa.field('entity_id', pa.int64()))
+    fields += [pa.field(f.name, ARROW_TYPES[f.type]) for f in family.fields]
+    if not family.entity_kind:
+        fields.append(pa.field('host_id', pa.int64()))
+    return pa.schema(fields)
+
+
+class ParquetArchive:
+    # cold storage of the raw tables: one zstd compressed Parquet file per sealed time
+    # partition, <root>/<table>/<partition start in epoch ms>.parquet. a partition is only
+    # written once it is closed, so files are immutable and reads need no locking
+    def __init__(self, root, partition_seconds):
+        self.root = Path(root)
+        self.width = int(partition_seconds * 1000)
+
+    def partition_start(self, timestamp):
+        return timestamp - timestamp % self.width
+
+    def _path(self, table, start):
+        return self.root / table / f'{start}.parquet'
+
+    def write(self, family, start, df):
+        schema = arrow_schema(family)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        path = self._path(family.table, start)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # written next to the target and renamed, readers never see a half-written file
+        tmp = path.with_suffix('.parquet.tmp')
+        pq.write_table(
+            table, tmp,
+            compression='zstd',
+            use_dictionary=[name for name in schema.names if name not in _DELTA_COLUMNS],
+            column_encoding={name: 'DELTA_BINARY_PACKED' for name in schema.names if name in _DELTA_COLUMNS},
+            row_group_size=ARCHIVE_ROW_GROUP_SIZE,
+            sorting_columns=[pq.SortingColumn(schema.get_field_index('timestamp'))],
+        )
+        os.replace(tmp, path)
+        return path
+
+    def files(self, table, since=None, until=None):
+        # partition files overlapping [since, until), picked by name without opening them
+        directory = self.root / table
+        if not directory.is_dir():
+            return []
+        selected = []
+        for path in sorted(directory.glob('*.parquet'), key=lambda p: int(p.stem)):
+            start = int(path.stem)
+            if since is not None and start + self.width <= since:
+                continue
+            if until is not None and start >= until:
+                continue
+            selected.append(path)
+        return selected
+
+    def read(self, family, columns=None, since=None, until=None, host_id=None):
+        # only the requested columns are decoded, and the timestamp filter is pushed down so
+        # row groups outside the range are skipped from their statistics. partitions sealed
+        # before the host column existed only hold host 0 rows
+        files = self.files(family.table, since, until)
+        if not files:
+            return None
+
+        dataset = ds.dataset([str(f) for f in files], schema=arrow_schema(family), format='parquet')
+        condition = None
+        if since is not None:
+            condition = ds.field('timestamp') >= since
+        if until is not None:
+            upper = ds.field('timestamp') < until
+            condition = upper if condition is None else condition & upper
+        if host_id is not None and not family.entity_kind:
+            host = ds.field('host_id') == host_id
+            if host_id == 0:
+                host = host | ds.field('host_id').is_null()
+            condition = host if condition is None else condition & host
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
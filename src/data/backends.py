@@ -0,0 +1,238 @@
+import logging
+import os
+import sys
+import threading
+from collections import namedtuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+CpuTimes = namedtuple('CpuTimes', ['user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest', 'guest_nice'])
+DiskCounters = namedtuple('DiskCounters', ['read_bytes', 'write_bytes', 'busy_time'])
+NetCounters = namedtuple('NetCounters', ['bytes_sent', 'bytes_recv'])
+MemoryInfo = namedtuple('MemoryInfo', ['total', 'available', 'used', 'free', 'cached', 'buffers', 'percent'])
+SwapInfo = namedtuple('SwapInfo', ['total', 'used', 'free', 'percent'])
+MountUsage = namedtuple('MountUsage', ['total', 'used', 'free', 'percent'])
+
+# /proc/diskstats always counts 512-byte sectors, whatever the device sector size
+SECTOR_SIZE = 512
+
+
+class PsutilBackend:
+    # portable source of the system-wide counters, also the fallback everywhere /proc isn't usable
+    name = 'psutil'
+
+    def cpu_times(self):
+        return psutil.cpu_times()
+
+    def disk_io_counters(self):
+        return psutil.disk_io_counters()
+
+    def net_io_counters(self):
+        return psutil.net_io_counters()
+
+    def virtual_memory(self):
+        return psutil.virtual_memory()
+
+    def swap_memory(self):
+        return psutil.swap_memory()
+
+    def disk_usage_percent(self, path='/'):
+        return psutil.disk_usage(path).percent
+
+    # per-entity readings, keyed by core / device / interface / mountpoint name
+
+    def cpu_times_percpu(self):
+        return {f'cpu{i}': times for i, times in enumerate(psutil.cpu_times(percpu=True))}
+
+    def disk_io_counters_perdisk(self):
+        disks = psutil.disk_io_counters(perdisk=True) or {}
+        return {
+            name: DiskCounters(d.read_bytes, d.write_bytes, getattr(d, 'busy_time', 0))
+            for name, d in disks.items()
+        }
+
+    def net_io_counters_pernic(self):
+        nics = psutil.net_io_counters(pernic=True) or {}
+        return {name: NetCounters(n.bytes_sent, n.bytes_recv) for name, n in nics.items()}
+
+    def mount_usage(self):
+        return mount_usage(lambda path: MountUsage(*psutil.disk_usage(path)))
+
+    def close(self):
+        pass
+
+
+class _ProcFile:
+    # a /proc file kept open for the lifetime of the backend. every read is a single pread
+    # at offset 0 into the same buffer, which the kernel answers with fresh content.
+    # probes run on several threads and share the buffer, hence the lock
+    def __init__(self, path, size=8192):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buffer = bytearray(size)
+        self._lock = threading.Lock()
+
+    def read(self):
+        # returns the number of valid bytes at the start of self.buffer
+        while True:
+            n = os.preadv(self.fd, [self.buffer], 0)
+            if n < len(self.buffer):
+                return n
+            # the content didn't fit, grow the buffer and read again
+            self.buffer = bytearray(len(self.buffer) * 2)
+
+    def first_line(self):
+        with self._lock:
+            n = self.read()
+            end = self.buffer.find(b'\n', 0, n)
+            return memoryview(self.buffer)[:end if end >= 0 else n].tobytes()
+
+    def lines(self):
+        with self._lock:
+            n = self.read()
+            return memoryview(self.buffer)[:n].tobytes().splitlines()
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ProcfsBackend:
+    # linux only: parses /proc/stat, /proc/meminfo, /proc/diskstats and /proc/net/dev directly,
+    # only for the fields that are stored, without psutil's per-call open/parse of every field
+    name = 'procfs'
+
+    def __init__(self, proc_root='/proc', sys_block='/sys/block'):
+        self._stat = _ProcFile(os.path.join(proc_root, 'stat'))
+        self._meminfo = _ProcFile(os.path.join(proc_root, 'meminfo'))
+        self._diskstats = _ProcFile(os.path.join(proc_root, 'diskstats'))
+        self._net_dev = _ProcFile(os.path.join(proc_root, 'net', 'dev'))
+        self._clock_ticks = os.sysconf('SC_CLK_TCK')
+        # whole disks only (like psutil), partitions would count the same IO twice
+        self._disks = {name.replace('!', '/').encode() for name in os.listdir(sys_block)}
+
+    def cpu_times(self):
+        # aggregate "cpu" line, in clock ticks
+        values = [int(v) / self._clock_ticks for v in self._stat.first_line().split()[1:11]]
+        values += [0.0] * (10 - len(values))
+        return CpuTimes(*values)
+
+    def cpu_times_percpu(self):
+        cores = {}
+        for line in self._stat.lines()[1:]:
+            if not line.startswith(b'cpu'):
+                # the per-core lines directly follow the aggregate one
+                break
+            fields = line.split()
+            values = [int(v) / self._clock_ticks for v in fields[1:11]]
+            values += [0.0] * (10 - len(values))
+            cores[fields[0].decode()] = CpuTimes(*values)
+        return cores
+
+    def disk_io_counters_perdisk(self):
+        disks = {}
+        for line in self._diskstats.lines():
+            fields = line.split()
+            if len(fields) < 13 or fields[2] not in self._disks:
+                continue
+            disks[fields[2].decode()] = DiskCounters(
+                int(fields[5]) * SECTOR_SIZE, int(fields[9]) * SECTOR_SIZE, int(fields[12])
+            )
+        return disks
+
+    def disk_io_counters(self):
+        disks = self.disk_io_counters_perdisk().values()
+        return DiskCounters(*(sum(d[i] for d in disks) for i in range(len(DiskCounters._fields))))
+
+    def net_io_counters_pernic(self):
+        nics = {}
+        # two header lines, then "iface: rx_bytes rx_packets ... tx_bytes ..."
+        for line in self._net_dev.lines()[2:]:
+            name, _, counters = line.partition(b':')
+            fields = counters.split()
+            nics[name.strip().decode()] = NetCounters(int(fields[8]), int(fields[0]))
+        return nics
+
+    def net_io_counters(self):
+        nics = self.net_io_counters_pernic().values()
+        return NetCounters(sum(n.bytes_sent for n in nics), sum(n.bytes_recv for n in nics))
+
+    def _meminfo_fields(self):
+        fields = {}
+        for line in self._meminfo.lines():
+            key, _, value = line.partition(b':')
+            fields[key] = int(value.split()[0]) * 1024
+        return fields
+
+    def virtual_memory(self):
+        # same definitions as psutil on linux (the version in requirements.txt): used is what
+        # neither free nor buffers/cache hold, percent is what isn't available
+        fields = self._meminfo_fields()
+        total = fields[b'MemTotal']
+        free = fields[b'MemFree']
+        buffers = fields.get(b'Buffers', 0)
+        cached = fields.get(b'Cached', 0) + fields.get(b'SReclaimable', 0)
+        available = fields.get(b'MemAvailable', free + buffers + cached)
+        used = total - free - cached - buffers
+        if used < 0:
+            # e.g. inside LXC containers, where Cached may include the host's page cache
+            used = total - free
+        percent = round((total - available) / total * 100, 1) if total else 0.0
+        return MemoryInfo(total, available, used, free, cached, buffers, percent)
+
+    def swap_memory(self):
+        fields = self._meminfo_fields()
+        total = fields.get(b'SwapTotal', 0)
+        free = fields.get(b'SwapFree', 0)
+        used = total - free
+        percent = round(used / total * 100, 1) if total else 0.0
+        return SwapInfo(total, used, free, percent)
+
+    def disk_usage_percent(self, path='/'):
+        st = os.statvfs(path)
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        total_user = used + st.f_bavail * st.f_frsize
+        return round(used / total_user * 100, 1) if total_user else 0.0
+
+    def mount_usage(self):
+        def usage(path):
+            st = os.statvfs(path)
+            total = st.f_blocks * st.f_frsize
+            used = (st.f_blocks - st.f_bfree) * st.f_frsize
+            free = st.f_bavail * st.f_frsize
+            return MountUsage(total, used, free, round(used / (used + free) * 100, 1) if used + free else 0.0)
+        return mount_usage(usage)
+
+    def close(self):
+        for f in (self._stat, self._meminfo, self._diskstats, self._net_dev):
+            f.close()
+
+
+def mount_usage(usage):
+    # {mountpoint: MountUsage} of the physical filesystems, mounts that can't be read are left out
+    mounts = {}
+    for partition in psutil.disk_partitions(all=False):
+        if partition.mountpoint in mounts:
+            continue
+        try:
+            mounts[partition.mountpoint] = usage(partition.mountpoint)
+        except OSError:
+            continue
+    return mounts
+
+
+def get_backend(name='auto'):
+    if name == 'psutil':
+        return PsutilBackend()
+    if name in ('auto', 'procfs') and sys.platform.startswith('linux'):
+        try:
+            return ProcfsBackend()
+        except OSError as e:
+            logger.warning(f'/proc backend unavailable, falling back to psutil: {e}')
+            return PsutilBackend()
+    if name == 'procfs':
+        logger.warning('/proc backend is only available on linux, falling back to psutil')
+    elif name != 'auto':
+        raise ValueError(f'Unknown collector backend: {name}')
+    return PsutilBackend()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+
+class RingBuffer:
+    # fixed-size window of the most recent rows of one metric table, one preallocated
+    # numpy array per column. new rows overwrite the oldest ones in place, so appending
+    # costs O(new rows) no matter how large the window is.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.last_id = 0
+        self._columns = None
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self.last_id = 0
+        self._columns = None
+        self._head = 0
+        self._size = 0
+
+    def _layout(self, df):
+        # columns follow the newest rows: a new column is NaN (None) in the rows kept so far,
+        # a dropped one goes away. a column whose values no longer fit its dtype (NaN in an
+        # integer column, ...) is converted to a common one
+        columns = {}
+        for col in df.columns:
+            values = None if self._columns is None else self._columns.get(col)
+            dtype = df[col].dtype
+            if values is None:
+                values = np.empty(self.capacity, dtype=dtype)
+                if self._columns is not None:
+                    values = values.astype(np.float64 if dtype.kind in 'iuf' else object)
+                    values[:] = np.nan if values.dtype.kind == 'f' else None
+            elif values.dtype != dtype:
+                try:
+                    common = np.result_type(values.dtype, dtype)
+                except TypeError:
+                    common = np.dtype(object)
+                if common != values.dtype:
+                    values = values.astype(common)
+            columns[col] = values
+        self._columns = columns
+
+    def extend(self, df):
+        if df.empty:
+            return
+        if self._columns is None or list(self._columns) != list(df.columns) or any(
+                self._columns[col].dtype != df[col].dtype for col in df.columns):
+            self._layout(df)
+
+        rows = df.iloc[-self.capacity:]
+        positions = (self._head + np.arange(len(rows))) % self.capacity
+        for col, values in self._columns.items():
+            values[positions] = rows[col].to_numpy()
+
+        self._head = (self._head + len(rows)) % self.capacity
+        self._size = min(self.capacity, self._size + len(rows))
+        if 'id' in rows.columns:
+            self.last_id = int(rows['id'].iloc[-1])
+
+    def frame(self):
+        # oldest to newest
+        if self._columns is None:
+            return pd.DataFrame()
+        order = (self._head - self._size + np.arange(self._size)) % self.capacity
+        return pd.DataFrame({col: values[order] for col, values in self._columns.items()})
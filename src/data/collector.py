@@ -1,12 +1,15 @@
 import psutil
-import time 
-from datetime import datetime
+import time
 from pathlib import Path 
 import logging
-import sys
-from anytree import Node
 
-from config.settings import LOG_DIR, LOG_FORMAT
+from config.settings import LOG_DIR, LOG_FORMAT, PROCESS_TOP_N, COLLECTOR_BACKEND, COUNTER_MIN_INTERVAL
+from src.data.backends import get_backend
+from src.data.timestamps import epoch_ms
+from src.data.sampler import CounterDelta, EntityDelta, rate, cpu_busy_percent
+from src.data.process_table import ProcessTable
+from src.data.process_sampler import ProcessSampler, top_processes
+from src.data.instrumentation import timed, timings
 
 
 # logging setup
@@ -21,30 +24,55 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class SystemDataCollector:
-    @staticmethod
-    def collect_system_data():
+    def __init__(self, backend=None, min_elapsed=COUNTER_MIN_INTERVAL):
+        # where the system-wide counters are read from: /proc directly on linux, psutil elsewhere
+        self.backend = backend or get_backend(COLLECTOR_BACKEND)
+
+        # previous raw counters, rates and percentages are computed from the deltas at each call.
+        # min_elapsed: shortest interval a delta is taken over (0 for benchmarks calling back to back)
+        self._cpu = CounterDelta(self.backend.cpu_times, wraps=False, min_elapsed=min_elapsed)
+        self._net = CounterDelta(self.backend.net_io_counters, min_elapsed=min_elapsed)
+        self._disk = CounterDelta(self.backend.disk_io_counters, min_elapsed=min_elapsed)
+        self._processes = ProcessSampler()
+
+        # per core / device / interface counters for the breakdown families
+        self._cores = EntityDelta(self.backend.cpu_times_percpu, wraps=False, min_elapsed=min_elapsed)
+        self._disks = EntityDelta(self.backend.disk_io_counters_perdisk, min_elapsed=min_elapsed)
+        self._nics = EntityDelta(self.backend.net_io_counters_pernic, min_elapsed=min_elapsed)
+
+    @timed
+    def collect_system_data(self):
         try:
+            cpu_deltas, cpu_elapsed = self._cpu.sample()
+            if cpu_deltas is None:
+                # too soon after the previous reading (or the collector start) for a cpu%
+                return None
+            net_deltas, net_elapsed = self._net.sample()
+            net = self._net.last
             return {
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
-                'cpu_percent': psutil.cpu_percent(interval=1), 
-                'memory_percent': psutil.virtual_memory().percent, 
-                'disk_usage': psutil.disk_usage('/').percent, 
-                'network_bytes_sent': psutil.net_io_counters().bytes_sent, 
-                'network_bytes_recv': psutil.net_io_counters().bytes_recv, 
+                'timestamp': epoch_ms(), 
+                'cpu_percent': cpu_busy_percent(cpu_deltas), 
+                'memory_percent': self.backend.virtual_memory().percent, 
+                'disk_usage': self.backend.disk_usage_percent('/'), 
+                'network_bytes_sent': net.bytes_sent, 
+                'network_bytes_recv': net.bytes_recv, 
+                'network_bytes_sent_per_sec': rate(net_deltas['bytes_sent'], net_elapsed) if net_deltas else None,
+                'network_bytes_recv_per_sec': rate(net_deltas['bytes_recv'], net_elapsed) if net_deltas else None,
+                'interval_ms': round(cpu_elapsed * 1000),
             }
         except Exception as e:
             logger.error(f'Error collecting system data: {e}')
             return None
     
-    @staticmethod
-    def collect_system_memory():
+    @timed
+    def collect_system_memory(self):
         try: 
 
-            mem = psutil.virtual_memory()
-            swap = psutil.swap_memory()
+            mem = self.backend.virtual_memory()
+            swap = self.backend.swap_memory()
             res = {
 
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
+                'timestamp': epoch_ms(), 
 
                 # detailed memory metric
                 'memory_total': mem.total,  # unit (GB)
@@ -60,8 +88,8 @@ class SystemDataCollector:
                 'swap_free': swap.free,
                 'swap_percent': swap.percent
             }
-            if hasattr(mem, 'cached'): mem['memory_cached'] = mem.cached 
-            if hasattr(mem, 'buffers'): mem['memory_cached'] = mem.buffers  
+            if hasattr(mem, 'cached'): res['memory_cached'] = mem.cached 
+            if hasattr(mem, 'buffers'): res['memory_buffers'] = mem.buffers  
 
             return res
 
@@ -70,31 +98,26 @@ class SystemDataCollector:
             return None
 
 
-    @staticmethod
-    def collect_system_io_wait_time(duration=1):
+    @timed
+    def collect_system_io_wait_time(self):
         # I/O Bottlenecks & Disk Saturation
         try:
+            deltas, elapsed = self._disk.sample()
+            if deltas is None:
+                # no disk counters on this system (e.g. some containers), or sampled less than
+                # COUNTER_MIN_INTERVAL ago
+                return None
 
-            # Get initial counters
-            io_start = psutil.disk_io_counters()
-            time.sleep(duration)
-
-            # Get counters after 1 second
-            io_end = psutil.disk_io_counters()
-            
-            # Calculate per-second metrics
-            read_io_bytes = io_end.read_bytes - io_start.read_bytes
-            write_io_bytes = io_end.write_bytes - io_start.write_bytes
-            
-            # Check busy time percentage (busy time percent means busy time / actual time elapsed. In the code below 1000 (= 1 sec) is an elapsed time)
-            busy_time = io_end.busy_time - io_start.busy_time if sys.platform.startswith('linux') else 0
-            busy_percentage = (busy_time / (duration*1000)) * 100  # Convert milliseconds to percentage
+            # busy time percent means busy time / actual time elapsed (busy_time is only reported on linux)
+            busy_time = deltas.get('busy_time', 0)
+            busy_percentage = rate(busy_time, elapsed * 1000) * 100
             
             return {
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
-                "read_io_bytes_per_sec": read_io_bytes,
-                "write_io_bytes_per_sec": write_io_bytes,
-                "busy_percentage": busy_percentage
+                'timestamp': epoch_ms(), 
+                "read_io_bytes_per_sec": rate(deltas['read_bytes'], elapsed),
+                "write_io_bytes_per_sec": rate(deltas['write_bytes'], elapsed),
+                "busy_percentage": busy_percentage,
+                'interval_ms': round(elapsed * 1000),
             }
 
         except Exception as e:
@@ -102,49 +125,147 @@ class SystemDataCollector:
             return None
 
 
-    # High Wait Time 
-    # This is not working on MacOS
-    @staticmethod
-    def collect_process_io_wait_time():
-        
-        iowait = psutil.cpu_times_percent()
-        
-        # Get per-process I/O wait
-        processes_io = []
-        for proc in psutil.process_iter(['name', 'pid']):
-            try:
-                proc_io = proc.io_counters()
-                processes_io.append({
-                    'name': proc.info()['name'],
-                    'pid': proc.info()['pid'],
-                    'read_time': proc_io.read_time,
-                    'write_time': proc_io.write_time
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        
-        return {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
-            'system_iowait': iowait,
-            'process_io_times': sorted(processes_io, 
-                                    key=lambda x: x['read_time'] + x['write_time'], 
-                                    reverse=True)[:5]  # Top 5 processes
-    }
+    @timed
+    def collect_process_metrics(self):
+        # top processes by CPU, memory and IO (IO rates stay 0 where psutil can't read them, e.g. macOS)
+        try:
+            rows = self._processes.sample()
+            return {
+                'timestamp': epoch_ms(),
+                'processes': top_processes(rows, PROCESS_TOP_N)
+            }
+        except Exception as e:
+            logger.error(f'Error collecting process metrics: {e}')
+            return None
+
+    @timed
+    def collect_cpu_cores(self):
+        try:
+            deltas, _ = self._cores.sample()
+            return {
+                'timestamp': epoch_ms(),
+                'entities': [
+                    {'entity': core, 'busy_percent': cpu_busy_percent(d)} for core, d in deltas.items()
+                ],
+            }
+        except Exception as e:
+            logger.error(f'Error collecting per-core CPU: {e}')
+            return None
+
+    @timed
+    def collect_disks(self):
+        try:
+            deltas, elapsed = self._disks.sample()
+            return {
+                'timestamp': epoch_ms(),
+                'entities': [
+                    {
+                        'entity': disk,
+                        'busy_percent': rate(d['busy_time'], elapsed * 1000) * 100,
+                        'read_bytes_per_sec': rate(d['read_bytes'], elapsed),
+                        'write_bytes_per_sec': rate(d['write_bytes'], elapsed),
+                    }
+                    for disk, d in deltas.items()
+                ],
+            }
+        except Exception as e:
+            logger.error(f'Error collecting per-disk IO: {e}')
+            return None
+
+    @timed
+    def collect_mounts(self):
+        try:
+            return {
+                'timestamp': epoch_ms(),
+                'entities': [
+                    {'entity': mount, 'used_percent': u.percent, 'used_bytes': u.used, 'free_bytes': u.free}
+                    for mount, u in self.backend.mount_usage().items()
+                ],
+            }
+        except Exception as e:
+            logger.error(f'Error collecting per-mount usage: {e}')
+            return None
+
+    @timed
+    def collect_nics(self):
+        try:
+            deltas, elapsed = self._nics.sample()
+            return {
+                'timestamp': epoch_ms(),
+                'entities': [
+                    {
+                        'entity': nic,
+                        'bytes_recv_per_sec': rate(d['bytes_recv'], elapsed),
+                        'bytes_sent_per_sec': rate(d['bytes_sent'], elapsed),
+                    }
+                    for nic, d in deltas.items()
+                ],
+            }
+        except Exception as e:
+            logger.error(f'Error collecting per-interface network: {e}')
+            return None
+
+    @timed
+    def collect_sensors(self):
+        # hottest temperature sensor, fastest fan and battery charge, None where not exposed
+        try:
+            temperatures = getattr(psutil, 'sensors_temperatures', dict)() or {}
+            fans = getattr(psutil, 'sensors_fans', dict)() or {}
+            battery = getattr(psutil, 'sensors_battery', lambda: None)()
+            readings = [t.current for entries in temperatures.values() for t in entries]
+            speeds = [f.current for entries in fans.values() for f in entries]
+            return {
+                'timestamp': epoch_ms(),
+                'temperature_max': max(readings) if readings else None,
+                'fan_rpm_max': max(speeds) if speeds else None,
+                'battery_percent': battery.percent if battery else None,
+            }
+        except Exception as e:
+            logger.error(f'Error collecting sensors: {e}')
+            return None
+
+    @timed
+    def collect_host_info(self):
+        try:
+            return {
+                'timestamp': epoch_ms(),
+                'uptime_sec': time.time() - psutil.boot_time(),
+                'users': len(psutil.users()),
+                'process_count': len(psutil.pids()),
+            }
+        except Exception as e:
+            logger.error(f'Error collecting host info: {e}')
+            return None
+
+    def collect_timings(self):
+        # the collector process's own timings since the previous tick
+        return {'timestamp': epoch_ms(), 'timings': timings.snapshot('collector')}
+
+    def prime(self):
+        # first reading of the per-process counters, a process is reported from its next sample on
+        self._processes.sample()
+
+    def collect(self, family):
+        # runs the probe a registered metric family declares
+        return getattr(self, family.probe)()
+
+    def close(self):
+        self.backend.close()
 
     @staticmethod
     def get_process_data():
-        processes = {}
+        pids, ppids, names = [], [], []
         for proc in psutil.process_iter(['pid', 'name', 'ppid']):
             try:
                 proc_info = proc.info
-                pid = proc_info['pid']
-                name = proc_info['name']
-                ppid = proc_info['ppid']
-                processes[pid] = {
-                    'name': name,
-                    'ppid': ppid,
-                    'node': Node(f"{name} ({pid})", pid=pid)
-                }
+                pids.append(proc_info['pid'])
+                ppids.append(proc_info['ppid'])
+                names.append(proc_info['name'])
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                 pass
-        return processes
\ No newline at end of file
+        return ProcessTable(pids, ppids, names)
+
+if __name__ == '__main__':
+    # run.sh starts this module as the background collector process
+    from src.data.daemon import main
+    main()
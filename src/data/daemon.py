@@ -0,0 +1,208 @@
+import argparse
+import logging
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from config.settings import (
+    ADAPTIVE_SAMPLING, AGENT_ADDRESS, COLLECTION_INTERVAL, COLLECTOR_WORKERS, COUNTER_MIN_INTERVAL, FAMILY_MIN_INTERVALS,
+    LIVE_STORE_ENABLED, LOG_DIR, LOG_FORMAT, METRICS_ADDRESS, PROBE_TIMEOUT, PRUNE_INTERVAL
+)
+from src.data.agent import AgentSink
+from src.data.alerts import AlertEngine
+from src.data.collector import SystemDataCollector
+from src.data.exporter import MetricsServer
+from src.data.registry import registry
+from src.data.storage import DataStorage
+from src.data.mmap_store import MmapRingStore
+from src.data.scheduler import AdaptiveScheduler, FixedRateScheduler
+from src.data.timestamps import epoch_ms
+
+# logging setup
+logging.basicConfig(
+    level=logging.INFO,
+    format=LOG_FORMAT,
+    handlers=[
+        logging.FileHandler(LOG_DIR / 'collector.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class CollectorDaemon:
+    # the only writer of the metric tables. the dashboard just reads what is persisted here,
+    # so the number of open browser tabs doesn't change how often the system is sampled.
+    def __init__(self, collector=None, storage=None, interval=COLLECTION_INTERVAL, workers=COLLECTOR_WORKERS,
+                 probe_timeout=PROBE_TIMEOUT, live=None, metrics=None, adaptive=ADAPTIVE_SAMPLING,
+                 min_intervals=FAMILY_MIN_INTERVALS):
+        self.collector = collector or SystemDataCollector()
+        self.storage = storage or DataStorage()
+        # the newest samples also go to the memory-mapped live store read by the dashboard
+        if live is None and LIVE_STORE_ENABLED and storage is None:
+            live = MmapRingStore(writable=True)
+        self.live = live
+        # optional /metrics endpoint, its snapshot is republished at the end of every tick
+        self.metrics = metrics
+        # alert rules are evaluated on every stored sample, before the next tick
+        self.alerts = AlertEngine()
+        # interval is where the adaptive cadence starts from
+        self.scheduler = AdaptiveScheduler(interval) if adaptive else FixedRateScheduler(interval)
+        # per family: shortest interval between two of its probes (sec), and when it last ran
+        self.min_intervals = min_intervals
+        self._last_run = {}
+        self._last_timestamp = {}
+        self.probe_timeout = probe_timeout
+        self._stop_event = threading.Event()
+        self._last_prune = None
+        self._maintenance = None
+
+        # probes are independent, a slow one (e.g. walking thousands of processes) must not
+        # delay the others. a probe still running from an earlier tick is not started again
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe')
+        self._running = {}
+        # per family: ticks skipped because the probe overran its deadline or was still running
+        self.timeouts = Counter()
+
+    def _due(self, family, now):
+        # half a tick of slack, so a family with a budget equal to the interval runs every tick
+        last = self._last_run.get(family.name)
+        budget = self.min_intervals.get(family.name, 0)
+        return last is None or now - last >= budget - self.scheduler.interval / 2
+
+    def _submit(self, family):
+        previous = self._running.get(family.name)
+        if previous is not None and not previous.done():
+            self.timeouts[family.name] += 1
+            logger.warning(f'{family.name} probe is still running from an earlier tick, skipped')
+            return None
+        future = self._executor.submit(self.collector.collect, family)
+        self._running[family.name] = future
+        self._last_run[family.name] = time.monotonic()
+        return future
+
+    def run_once(self):
+        # every enabled family of the registry in one pass. all rows of a tick share one
+        # logical timestamp, taken when the tick starts
+        start = time.monotonic()
+        timestamp = epoch_ms()
+        futures = [
+            (family, self._submit(family)) for family in registry
+            if family.probe is not None and self._due(family, start)
+        ]
+        events = []
+
+        for family, future in futures:
+            if future is None:
+                continue
+            timeout = family.timeout if family.timeout is not None else self.probe_timeout
+            # one failing probe must not take the whole daemon down
+            try:
+                data = future.result(timeout=max(0, start + timeout - time.monotonic()))
+                if data:
+                    data['timestamp'] = timestamp
+                    # the probe's own measurement when it has one (counter deltas), the time
+                    # since the family's previous sample otherwise
+                    previous = self._last_timestamp.get(family.name)
+                    data.setdefault('interval_ms', timestamp - previous if previous is not None else None)
+                    self._last_timestamp[family.name] = timestamp
+                    self.storage.save(family.name, data)
+                    if self.live is not None:
+                        self.live.save(family.name, data)
+                    if self.metrics is not None:
+                        self.metrics.snapshot.update(family.name, data)
+                    events += self.alerts.observe(family.name, data)
+                    self.scheduler.observe(family.name, data)
+            except TimeoutError:
+                self.timeouts[family.name] += 1
+                logger.warning(f'{family.name} probe overran its {timeout}s deadline, skipped this tick')
+            except Exception as e:
+                logger.error(f'Error running {family.name} probe: {e}')
+        if events:
+            self.storage.save('alerts', {'timestamp': timestamp, 'events': events})
+        self.storage.flush_if_due()
+        if self.metrics is not None:
+            rules = self.alerts.rules() if self.alerts.enabled else ()
+            self.metrics.snapshot.publish(timestamp, self.alerts.active(), rules)
+
+        # archiving and retention run in the background on the probe pool, in bounded batches.
+        # the archive goes first since raw rows are only pruned once archived
+        if self._last_prune is None or time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+            if self._maintenance is None or self._maintenance.done():
+                self._last_prune = time.monotonic()
+                self._maintenance = self._executor.submit(self._maintain)
+
+    def _maintain(self):
+        try:
+            self.storage.archive()
+            self.storage.prune()
+        except Exception as e:
+            logger.error(f'Error archiving or pruning: {e}')
+
+    def run(self):
+        logger.info(f'Collector started (interval={self.scheduler.interval}s)')
+        try:
+            self.scheduler.run(self.run_once, self._stop_event)
+        finally:
+            self.close()
+        logger.info('Collector stopped')
+
+    def stop(self, *args):
+        self._stop_event.set()
+
+    def close(self):
+        # archiving and pruning are bounded, let a running pass finish before the storage closes.
+        # a probe stuck past its deadline can't be interrupted, don't wait for it
+        if self._maintenance is not None:
+            self._maintenance.result()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.collector.close()
+        self.storage.close()
+        if self.live is not None:
+            self.live.close()
+        if self.metrics is not None:
+            self.metrics.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='System metric collector daemon')
+    parser.add_argument('--interval', type=float, default=COLLECTION_INTERVAL,
+                        help='sampling interval in seconds, where the adaptive cadence starts')
+    parser.add_argument('--fixed', action='store_true', help='always sample every --interval seconds')
+    parser.add_argument('--once', action='store_true', help='collect a single sample and exit')
+    parser.add_argument('--agent', default=AGENT_ADDRESS, metavar='ADDRESS',
+                        help='ship the samples to an ingest server (tcp://host:port or unix:///path) instead of storing them')
+    parser.add_argument('--metrics', default=METRICS_ADDRESS, metavar='ADDRESS',
+                        help='serve Prometheus metrics on tcp://host:port/metrics, "none" disables it')
+    args = parser.parse_args(argv)
+
+    # as an agent nothing is stored locally, the ingest server keeps the history
+    storage = AgentSink(args.agent) if args.agent else None
+    metrics = None
+    if args.metrics and args.metrics != 'none' and not args.once:
+        # the endpoint is optional, collecting goes on without it (e.g. when the port is taken)
+        try:
+            metrics = MetricsServer(args.metrics)
+            metrics.start()
+        except (OSError, ValueError) as e:
+            logger.error(f'Cannot serve metrics on {args.metrics}: {e}')
+            metrics = None
+    daemon = CollectorDaemon(storage=storage, interval=args.interval, metrics=metrics,
+                             adaptive=ADAPTIVE_SAMPLING and not args.fixed)
+    if args.once:
+        # rates and percentages are deltas: a first reading, then the sample over a short interval
+        daemon.collector.prime()
+        time.sleep(COUNTER_MIN_INTERVAL)
+        daemon.run_once()
+        daemon.close()
+        return
+
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import gzip
+import logging
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from config.settings import METRICS_PREFIX, METRICS_SCRAPE_TIMEOUT
+from src.data.instrumentation import timed
+from src.data.registry import INTERVAL_FIELD, registry
+from src.data.wire import parse_address
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# cumulative counters among the registry fields, every other field is exported as a gauge
+COUNTERS = {('system', 'network_bytes_sent'), ('system', 'network_bytes_recv')}
+# monitor_overhead rows are histograms of the last interval only, not something a scraper can sum up
+EXCLUDED = {'monitor_overhead'}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else 'NaN'
+    return str(value)
+
+
+def label_fields(family):
+    # (label, row key) pairs that tell the rows of a multi-row family apart: the entity
+    # (labelled with its kind), text fields and the pid. the other numeric fields become metrics
+    labels = [(f.name, f.name) for f in family.fields if f.type == 'TEXT' or f.name == 'pid']
+    return ([(family.entity_kind, 'entity')] if family.entity_kind else []) + labels
+
+
+class MetricsSnapshot:
+    # latest sample of every family in the Prometheus / OpenMetrics text formats. the daemon
+    # calls update() for each stored sample and publish() once per tick, which renders both
+    # formats (plain and gzip) into immutable bytes. a scrape only picks up the current bytes,
+    # swapping the reference is atomic, so readers never need a lock
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self._latest = {}
+        self._bodies = {}
+        self.publish()
+
+    def update(self, family_name, data):
+        self._latest[family_name] = data
+
+    def _metrics(self, timestamp, active_alerts, rules):
+        # [(family name, type, help, [(sample name, labels, value)])]
+        metrics = []
+        for family in registry:
+            data = self._latest.get(family.name)
+            if family.probe is None or family.name in EXCLUDED or not data:
+                continue
+            rows = data.get(family.rows_key, ()) if family.rows_key else [data]
+            labels = label_fields(family)
+            keys = {key for _, key in labels}
+            for field in family.fields:
+                # the interval of a multi-row sample would repeat on every row
+                if field.name in keys or (field is INTERVAL_FIELD and family.rows_key):
+                    continue
+                name = f'{self.prefix}_{family.name}_{field.name}'
+                counter = (family.name, field.name) in COUNTERS
+                sample = f'{name}_total' if counter else name
+                samples = [
+                    (sample, [(label, row.get(key)) for label, key in labels], row[field.name])
+                    for row in rows if row.get(field.name) is not None
+                ]
+                if samples:
+                    metrics.append((name, 'counter' if counter else 'gauge', f'{family.title}: {field.name}', samples))
+
+        if rules:
+            metrics.append((f'{self.prefix}_alert_active', 'gauge', 'Alert rules currently firing',
+                            [(f'{self.prefix}_alert_active', [('rule', rule)], int(rule in active_alerts))
+                             for rule in rules]))
+        if timestamp is not None:
+            name = f'{self.prefix}_last_tick_timestamp_seconds'
+            metrics.append((name, 'gauge', 'Start of the latest collection tick', [(name, [], timestamp / 1000)]))
+        return metrics
+
+    @staticmethod
+    def _render(metrics, openmetrics):
+        lines = []
+        for name, kind, help_text, samples in metrics:
+            # the 0.0.4 format names counter families with their _total suffix, OpenMetrics without
+            family = f'{name}_total' if kind == 'counter' and not openmetrics else name
+            lines.append(f'# HELP {family} {_escape(help_text)}')
+            lines.append(f'# TYPE {family} {kind}')
+            lines.extend(f'{sample}{_labels(labels)} {_value(value)}' for sample, labels, value in samples)
+        if openmetrics:
+            lines.append('# EOF')
+        return ('\n'.join(lines) + '\n').encode()
+
+    @timed
+    def publish(self, timestamp=None, active_alerts=(), rules=()):
+        metrics = self._metrics(timestamp, set(active_alerts), rules)
+        bodies = {}
+        for openmetrics in (False, True):
+            body = self._render(metrics, openmetrics)
+            bodies[openmetrics, False] = body
+            bodies[openmetrics, True] = gzip.compress(body, compresslevel=1)
+        self._bodies = bodies
+
+    def body(self, openmetrics=False, compressed=False):
+        return self._bodies[openmetrics, compressed]
+
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+    # a stalled client can't hold the server thread longer than this
+    timeout = METRICS_SCRAPE_TIMEOUT
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        compressed = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = self.server.snapshot.body(openmetrics, compressed)
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # one line per scrape would flood collector.log
+        pass
+
+
+class MetricsServer:
+    # /metrics endpoint of the collector daemon. requests are served one at a time on a single
+    # background thread and only copy the bytes published by the last tick: a scrape storm
+    # queues up in the listen backlog instead of spawning threads that compete with the probes
+    def __init__(self, address, snapshot=None):
+        self.address = address
+        self.snapshot = snapshot or MetricsSnapshot()
+        family, bind = parse_address(address)
+        if family != socket.AF_INET:
+            raise ValueError(f'The metrics endpoint needs a tcp://host:port address, not {address}')
+        self._server = HTTPServer(bind, _ScrapeHandler)
+        self._server.snapshot = self.snapshot
+        self._thread = None
+
+    @property
+    def server_address(self):
+        return self._server.server_address
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        logger.info(f'Serving metrics on {self.address}/metrics')
+
+    def close(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
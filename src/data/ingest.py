@@ -0,0 +1,158 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+
+from config.settings import DB_FLUSH_INTERVAL, INGEST_ADDRESS, LOG_DIR, LOG_FORMAT, PRUNE_INTERVAL
+from src.data.scheduler import FixedRateScheduler
+from src.data.storage import DataStorage
+from src.data.wire import BATCH, HELLO, FrameError, decode_batch, decode_hello, parse_address, read_frame
+
+# logging setup
+logging.basicConfig(
+    level=logging.INFO,
+    format=LOG_FORMAT,
+    handlers=[
+        logging.FileHandler(LOG_DIR / 'ingest.log'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class _AgentHandler(socketserver.BaseRequestHandler):
+    # one thread per agent connection. the first frame names the host, every BATCH after it
+    # is decoded and queued into DataStorage as whole blocks, the writes themselves are
+    # batched by the storage. a block the storage rejects is logged and skipped, the
+    # connection and the other blocks carry on
+    def handle(self):
+        server = self.server.ingest
+        host_id = None
+        try:
+            while True:
+                received = read_frame(self.request)
+                if received is None:
+                    break
+                frame_type, payload = received
+                if frame_type == HELLO:
+                    host = decode_hello(payload)
+                    host_id = server.storage.host_id(host)
+                    logger.info(f'Agent {host} connected (host {host_id})')
+                elif frame_type == BATCH and host_id is not None:
+                    rows = 0
+                    for family_name, block in decode_batch(payload):
+                        try:
+                            server.storage.save_rows(family_name, block, host_id)
+                        except (sqlite3.Error, KeyError) as e:
+                            logger.error(f'Dropped {len(block)} {family_name} rows of host {host_id}: {e!r}')
+                            continue
+                        rows += len(block)
+                    server.count(rows)
+                else:
+                    raise FrameError(f'Unexpected frame type {frame_type}')
+        except (OSError, FrameError, sqlite3.Error) as e:
+            logger.warning(f'Dropping agent connection: {e}')
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class IngestServer:
+    # central store of agent mode: accepts agents over TCP or a unix socket and writes their
+    # rows, tagged with their host, into DataStorage. also flushes the storage when traffic
+    # pauses and runs archiving and retention like the collector daemon does
+    def __init__(self, address=INGEST_ADDRESS, storage=None):
+        self.address = address
+        self.storage = storage or DataStorage()
+        # rows and batches received so far, over every connection
+        self.rows = self.batches = 0
+        self._count_lock = threading.Lock()
+        family, bind = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind):
+                os.unlink(bind)
+            self._server = _UnixServer(bind, _AgentHandler)
+        else:
+            self._server = _TCPServer(bind, _AgentHandler)
+        self._server.ingest = self
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._last_prune = None
+
+    @property
+    def server_address(self):
+        # the bound address, with the actual port when listening on port 0
+        return self._server.server_address
+
+    def count(self, rows):
+        with self._count_lock:
+            self.rows += rows
+            self.batches += 1
+
+    def _tick(self):
+        self.storage.flush_if_due()
+        if self._last_prune is None or time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            try:
+                self.storage.archive()
+                self.storage.prune()
+            except Exception as e:
+                logger.error(f'Error archiving or pruning: {e}')
+
+    def start(self):
+        # serves in background threads, for tests and the load generator
+        for target in (self._server.serve_forever, self._maintain):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _maintain(self):
+        FixedRateScheduler(DB_FLUSH_INTERVAL).run(self._tick, self._stop_event)
+
+    def run(self):
+        logger.info(f'Ingest server listening on {self.address}')
+        self.start()
+        try:
+            self._stop_event.wait()
+        finally:
+            self.close()
+        logger.info('Ingest server stopped')
+
+    def stop(self, *args):
+        self._stop_event.set()
+
+    def close(self):
+        self._stop_event.set()
+        if self._threads:
+            self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self.storage.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest server of the collector agents')
+    parser.add_argument('--listen', default=INGEST_ADDRESS, help='tcp://host:port or unix:///path')
+    args = parser.parse_args(argv)
+
+    server = IngestServer(args.listen)
+    signal.signal(signal.SIGTERM, server.stop)
+    signal.signal(signal.SIGINT, server.stop)
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import functools
+import threading
+import time
+
+from config.settings import INSTRUMENTATION_ENABLED
+
+# latency histogram buckets: bucket i holds durations below 2**i microseconds
+_BUCKETS = 32
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * _BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(_BUCKETS - 1, int(seconds * 1e6).bit_length())] += 1
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th duration, in seconds
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(self.max, (1 << i) / 1e6)
+        return self.max
+
+
+class Timings:
+    # in-process latency histograms of the monitor's own hot paths (probes, storage, chart
+    # building). snapshot() hands them over to be stored and starts a new interval
+    def __init__(self, enabled=INSTRUMENTATION_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def snapshot(self, source):
+        # one row per timed name since the previous snapshot, durations in ms
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        return [
+            {
+                'source': source,
+                'name': name,
+                'count': h.count,
+                'total_ms': h.total * 1000,
+                'max_ms': h.max * 1000,
+                'p50_ms': h.quantile(0.5) * 1000,
+                'p95_ms': h.quantile(0.95) * 1000,
+            }
+            for name, h in sorted(histograms.items())
+        ]
+
+
+timings = Timings()
+
+
+class TimingsWindow:
+    # the snapshots of a process that doesn't persist them (the dashboard), kept in memory for
+    # window seconds. any number of readers share one history: the histograms are drained at
+    # most once per interval, so concurrent readers don't take each other's calls
+    def __init__(self, source, window, interval, timings=timings):
+        self.source = source
+        self.window = window
+        self.interval = interval
+        self.timings = timings
+        self._lock = threading.Lock()
+        self._rows = []
+        self._last = None
+
+    def rows(self, now_ms):
+        with self._lock:
+            if self._last is None or now_ms - self._last >= self.interval * 1000:
+                self._last = now_ms
+                self._rows += [dict(row, timestamp=now_ms) for row in self.timings.snapshot(self.source)]
+            cutoff = now_ms - self.window * 1000
+            self._rows = [row for row in self._rows if row['timestamp'] >= cutoff]
+            return list(self._rows)
+
+
+def timed(func=None, name=None):
+    # times every call of func into timings. with instrumentation disabled the function is
+    # returned undecorated, so the switch costs nothing at run time
+    if func is None:
+        return functools.partial(timed, name=name)
+    if not timings.enabled:
+        return func
+
+    name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.record(name, time.perf_counter() - start)
+    return wrapper
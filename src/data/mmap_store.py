@@ -0,0 +1,197 @@
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.settings import LIVE_STORE_CAPACITY, LIVE_STORE_DIR
+from src.data.registry import registry
+from src.data.timestamps import epoch_ms, to_datetime
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SYSRING1'
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('capacity', '<u4'),
+    ('record_size', '<u4'),
+    # number of records written so far, the next record goes to slot seq % capacity
+    ('seq', '<u8'),
+])
+
+NUMPY_TYPES = {'INTEGER': '<i8', 'REAL': '<f8'}
+# copies of a window taken again when the writer overwrote some of its records meanwhile
+WINDOW_RETRIES = 3
+
+
+def live_families():
+    # families with one numeric row per sample, the ones the live panels chart
+    return [
+        family for family in registry
+        if family.rows_key is None and all(f.type in NUMPY_TYPES for f in family.fields)
+    ]
+
+
+def record_dtype(family):
+    # each record carries its own sequence number, written last, so a reader can tell a
+    # complete record from one that is being overwritten
+    return np.dtype(
+        [('seq', '<u8'), ('timestamp', '<i8')] + [(f.name, NUMPY_TYPES[f.type]) for f in family.fields]
+    )
+
+
+def compatible(path, family):
+    # whether the ring file at path holds records of the current layout of the family. a file
+    # left by an older version (another record size) is only replaced once the daemon restarts
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if not len(header) or header['magic'][0] != MAGIC:
+        return False
+    record_size, capacity = int(header['record_size'][0]), int(header['capacity'][0])
+    return (record_size == record_dtype(family).itemsize
+            and os.path.getsize(path) >= HEADER_DTYPE.itemsize + capacity * record_size)
+
+
+class RingFile:
+    # fixed-width records of one metric family in a memory-mapped file, used as a ring.
+    # there is a single writer (the collector daemon) and any number of read-only mappers,
+    # nothing is locked: readers check the sequence numbers instead
+    def __init__(self, path, family, capacity=LIVE_STORE_CAPACITY, writable=False):
+        self.path = Path(path)
+        self.family = family
+        self.dtype = record_dtype(family)
+        self.writable = writable
+        if writable:
+            self._create(capacity)
+        self._map()
+
+    def _create(self, capacity):
+        # an existing file with the same layout is reused, so a restart keeps the window
+        if self.path.exists():
+            header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+            layout = (MAGIC, self.dtype.itemsize, capacity)
+            if len(header) and tuple(header[['magic', 'record_size', 'capacity']][0]) == layout:
+                return
+
+        # a new file is renamed into place, readers holding the old mapping keep a valid inode
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header['magic'], header['capacity'], header['record_size'] = MAGIC, capacity, self.dtype.itemsize
+            f.write(header.tobytes())
+            f.truncate(HEADER_DTYPE.itemsize + capacity * self.dtype.itemsize)
+        os.replace(tmp, self.path)
+
+    def _map(self):
+        mode = 'r+' if self.writable else 'r'
+        self._inode = os.stat(self.path).st_ino
+        self._header = np.memmap(self.path, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+        capacity = int(self._header['capacity'][0])
+        self.records = np.memmap(self.path, dtype=self.dtype, mode=mode, offset=HEADER_DTYPE.itemsize,
+                                 shape=(capacity,))
+        self.capacity = capacity
+
+    @property
+    def seq(self):
+        return int(self._header['seq'][0])
+
+    def append(self, row):
+        # row: {'timestamp': epoch ms, field: value}. the record is marked incomplete (seq 0)
+        # while its fields are written, then stamped, then published through the header
+        n = self.seq
+        record = self.records[n % self.capacity]
+        record['seq'] = 0
+        record['timestamp'] = row['timestamp']
+        for name in self.family.columns:
+            value = row.get(name)
+            record[name] = value if value is not None else 0
+        record['seq'] = n + 1
+        self._header['seq'] = n + 1
+
+    def window(self, n):
+        # a copy of the newest n complete records, oldest first. the writer never waits for
+        # readers: after the copy the sequence number of every copied slot is read again, a
+        # slot the writer started to overwrite meanwhile (its seq is 0 or newer by now) would
+        # hold a torn record. the copy is taken again then, and after WINDOW_RETRIES attempts
+        # only the intact records are kept
+        if not self.writable and os.stat(self.path).st_ino != self._inode:
+            # the writer recreated the file with another layout
+            self._map()
+
+        for _ in range(WINDOW_RETRIES):
+            seq = self.seq
+            count = min(n, seq, self.capacity)
+            if count == 0:
+                return self.records[:0].copy()
+            positions = (seq - count + np.arange(count)) % self.capacity
+            window = self.records[positions]
+            expected = np.arange(seq - count + 1, seq + 1, dtype=np.uint64)
+            valid = (window['seq'] == expected) & (self.records['seq'][positions] == window['seq'])
+            if valid.all():
+                return window
+        return window[valid]
+
+    def flush(self):
+        self.records.flush()
+        self._header.flush()
+
+
+class MmapRingStore:
+    # live store for the real-time panels, next to DataStorage which keeps the durable
+    # history. the daemon writes every sample of the live families into one ring file per
+    # family, the dashboard maps them read-only
+    def __init__(self, root=LIVE_STORE_DIR, capacity=LIVE_STORE_CAPACITY, writable=False):
+        self.root = Path(root)
+        self.capacity = capacity
+        self.writable = writable
+        self._rings = {}
+
+    def _ring(self, family):
+        ring = self._rings.get(family.name)
+        if ring is None:
+            path = self.root / f'{family.table}.ring'
+            if not self.writable and (not path.exists() or not compatible(path, family)):
+                # nothing the dashboard can read yet, it falls back to DataStorage
+                return None
+            ring = self._rings[family.name] = RingFile(path, family, self.capacity, self.writable)
+        return ring
+
+    def save(self, family_name, data):
+        if data is None:
+            return
+        family = registry.get(family_name)
+        if family not in live_families():
+            return
+        try:
+            row = dict(data)
+            row['timestamp'] = epoch_ms(data['timestamp'])
+            self._ring(family).append(row)
+        except Exception as e:
+            logger.error(f'Error writing {family.name} to the live store: {e}')
+
+    def seq(self, family_name):
+        # records written so far, moves whenever the daemon publishes a sample. None without a ring file
+        ring = self._ring(registry.get(family_name))
+        return None if ring is None else ring.seq
+
+    def window(self, family_name, n):
+        # raw records (numpy structured array) or None when the daemon hasn't written any
+        ring = self._ring(registry.get(family_name))
+        return None if ring is None else ring.window(n)
+
+    def frame(self, family_name, n):
+        # same layout as DataStorage loads: timestamp as datetimes plus the metric columns
+        records = self.window(family_name, n)
+        if records is None or len(records) == 0:
+            return pd.DataFrame()
+        data = {'timestamp': to_datetime(pd.Series(records['timestamp']))}
+        for name in records.dtype.names[2:]:
+            data[name] = records[name]
+        return pd.DataFrame(data, copy=False)
+
+    def close(self):
+        for ring in self._rings.values():
+            if ring.writable:
+                ring.flush()
+        self._rings.clear()
@@ -0,0 +1,118 @@
+import time
+
+import psutil
+
+
+class ProcessSampler:
+    # per-process CPU%, RSS and IO byte rates. psutil.Process handles are kept across
+    # ticks: cpu_percent(None) then measures since the previous tick without sleeping, and
+    # only processes that appeared since the last tick pay for looking up their name. the
+    # handles are keyed on (pid, create_time), so a pid the kernel reused for a new process
+    # gets a new handle instead of being measured against the dead process's counters.
+    # each process is read inside oneshot() so its /proc files are parsed once per tick. a
+    # process is reported from its second tick on: on the tick it was tracked its cpu
+    # counter has only just been primed.
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._procs = {}
+        self._names = {}
+        self._io = {}
+        self._no_io = set()
+        self._last_time = clock()
+
+    def __len__(self):
+        return len(self._procs)
+
+    def _running(self):
+        # {(pid, create_time): handle} of the running processes, the handle is only kept
+        # for the processes that aren't tracked yet
+        running = {}
+        for pid in psutil.pids():
+            try:
+                proc = psutil.Process(pid)
+                running[(pid, proc.create_time())] = proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return running
+
+    def _track(self, key, proc):
+        try:
+            self._names[key] = proc.name()
+            # primes the cpu counter, the first real reading comes next tick
+            proc.cpu_percent(None)
+            self._procs[key] = proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self._names.pop(key, None)
+
+    def _forget(self, key):
+        self._procs.pop(key, None)
+        self._names.pop(key, None)
+        self._io.pop(key, None)
+        self._no_io.discard(key)
+
+    def sample(self):
+        now = self.clock()
+        elapsed = now - self._last_time
+        self._last_time = now
+
+        running = self._running()
+        for key in self._procs.keys() - running.keys():
+            self._forget(key)
+        new = running.keys() - self._procs.keys()
+        for key in new:
+            self._track(key, running[key])
+
+        rows = []
+        for key, proc in list(self._procs.items()):
+            try:
+                with proc.oneshot():
+                    cpu_percent = proc.cpu_percent(None)
+                    memory_rss = proc.memory_info().rss
+                    io = None
+                    if key not in self._no_io:
+                        try:
+                            io = proc.io_counters()
+                        except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                            # not readable for this process (or not supported on this platform), don't retry
+                            self._no_io.add(key)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                self._forget(key)
+                continue
+            except psutil.AccessDenied:
+                continue
+
+            read_rate = write_rate = 0.0
+            if io is not None:
+                previous = self._io.get(key)
+                self._io[key] = (io.read_bytes, io.write_bytes)
+                if previous is not None and elapsed > 0:
+                    read_rate = max(0, io.read_bytes - previous[0]) / elapsed
+                    write_rate = max(0, io.write_bytes - previous[1]) / elapsed
+            if key in new:
+                # its cpu% would cover the microseconds since _track()
+                continue
+
+            rows.append({
+                'pid': key[0],
+                'name': self._names[key],
+                'cpu_percent': cpu_percent,
+                'memory_rss': memory_rss,
+                'read_bytes_per_sec': read_rate,
+                'write_bytes_per_sec': write_rate,
+            })
+        return rows
+
+
+def top_processes(rows, n):
+    # union of the top n by cpu, by memory and by io, so a process that is heavy on any
+    # single resource is kept
+    keys = [
+        lambda r: r['cpu_percent'],
+        lambda r: r['memory_rss'],
+        lambda r: r['read_bytes_per_sec'] + r['write_bytes_per_sec'],
+    ]
+    selected = {}
+    for key in keys:
+        for row in sorted(rows, key=key, reverse=True)[:n]:
+            selected[row['pid']] = row
+    return list(selected.values())
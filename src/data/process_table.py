@@ -0,0 +1,37 @@
+class ProcessTable:
+    # flat snapshot of the process hierarchy: parallel pid/ppid/name lists and a pid -> index
+    # dict. parent links are resolved once in a single pass, so building the table and the
+    # sankey arrays is O(n) and processes that share a name stay distinct.
+    def __init__(self, pids, ppids, names):
+        self.pids = list(pids)
+        self.ppids = list(ppids)
+        self.names = list(names)
+        self.index = {pid: i for i, pid in enumerate(self.pids)}
+
+        # parent index per process, -1 for roots (no parent, unknown parent or its own parent)
+        self.parents = [-1] * len(self.pids)
+        self.children = [[] for _ in self.pids]
+        for i, ppid in enumerate(self.ppids):
+            parent = self.index.get(ppid, -1)
+            if parent != i and parent != -1:
+                self.parents[i] = parent
+                self.children[parent].append(i)
+
+    def __len__(self):
+        return len(self.pids)
+
+    @property
+    def roots(self):
+        return [i for i, parent in enumerate(self.parents) if parent == -1]
+
+    def labels(self):
+        return [f"{name} ({pid})" for pid, name in zip(self.pids, self.names)]
+
+    def sankey_links(self):
+        # node i of the sankey is process i, one link per parent -> child edge
+        source, target = [], []
+        for i, parent in enumerate(self.parents):
+            if parent != -1:
+                source.append(parent)
+                target.append(i)
+        return source, target, [1] * len(source)
@@ -0,0 +1,301 @@
+from collections import namedtuple
+
+from config.settings import ALERTS_ENABLED, INSTRUMENTATION_ENABLED, OPTIONAL_METRIC_FAMILIES
+
+MetricField = namedtuple('MetricField', ['name', 'type', 'nullable'], defaults=['REAL', False])
+
+# the cadence adapts to the load (see AdaptiveScheduler), so every sample of a probed family
+# records the time since the previous one of its family, in ms
+INTERVAL_FIELD = MetricField('interval_ms', 'INTEGER', True)
+
+
+class MetricFamily:
+    # one declaration per metric family: its table, its fields and their SQL types, and the
+    # SystemDataCollector probe that produces it. the table DDL, the prepared INSERT, the
+    # row parameters and the loaders are all derived from this.
+    def __init__(self, name, table, fields, probe, rows_key=None, rollup=True, enabled=True, title=None,
+                 timeout=None, entity_kind=None):
+        self.name = name
+        self.table = table
+        self.fields = [field if isinstance(field, MetricField) else MetricField(*field) for field in fields]
+        # None for families the daemon writes itself instead of collecting them (alert events)
+        self.probe = probe
+        if probe is not None:
+            self.fields.append(INTERVAL_FIELD)
+        # breakdown families (per core, per disk, ...) are stored in long format: one narrow
+        # row per (timestamp, entity_id), entity names live once in the entities table.
+        # their probes return {'timestamp': ..., 'entities': [{'entity': name, ...}, ...]}
+        self.entity_kind = entity_kind
+        if entity_kind is not None:
+            rows_key = 'entities'
+        # probes of families with rows_key return {'timestamp': ..., rows_key: [row, ...]},
+        # every other probe returns one row per sample
+        self.rows_key = rows_key
+        self.rollup = rollup and rows_key is None
+        self.enabled = enabled
+        self.title = title or name
+        # probe deadline in seconds, None means PROBE_TIMEOUT
+        self.timeout = timeout
+
+    @property
+    def columns(self):
+        return [field.name for field in self.fields]
+
+    @property
+    def metric_columns(self):
+        # what is charted and rolled up, without the sampling interval
+        return [field.name for field in self.fields if field is not INTERVAL_FIELD]
+
+    @property
+    def key_columns(self):
+        # rows of several hosts share the tables (agent mode): the breakdown rows through
+        # their entity, which belongs to one host, every other row has its own host_id
+        return ['timestamp', 'entity_id'] if self.entity_kind else ['host_id', 'timestamp']
+
+    @property
+    def row_key(self):
+        # what identifies a row for batched deletes
+        return 'timestamp, entity_id' if self.entity_kind else 'rowid'
+
+    def create_table_query(self):
+        columns = ',\n'.join(
+            f"{field.name} {field.type}{'' if field.nullable else ' NOT NULL'}" for field in self.fields
+        )
+        if self.entity_kind:
+            # clustered on the key, no rowid and no separate timestamp index
+            return f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                timestamp INTEGER NOT NULL,
+                entity_id INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (timestamp, entity_id)
+            ) WITHOUT ROWID
+            '''
+        return f'''
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            {columns},
+            host_id INTEGER NOT NULL DEFAULT 0
+        )
+        '''
+
+    def insert_query(self):
+        columns = self.key_columns + self.columns
+        values = ', '.join(f':{col}' for col in columns)
+        # a repeated (timestamp, entity) must not fail the whole batch of a breakdown table
+        verb = 'INSERT OR REPLACE' if self.entity_kind else 'INSERT'
+        return f'{verb} INTO {self.table} ({", ".join(columns)}) VALUES ({values})'
+
+    def rows(self, data, timestamp, entity_id=None, host_id=0):
+        # parameter dicts for the INSERT, only the declared fields are kept.
+        # entity_id(kind, name) maps entity names to their ids for breakdown families
+        samples = data[self.rows_key] if self.rows_key else [data]
+        for sample in samples:
+            # fields missing from a row are taken from the sample it belongs to (interval_ms)
+            params = {col: sample[col] if col in sample else data.get(col) for col in self.columns}
+            params['timestamp'] = timestamp
+            if self.entity_kind:
+                params['entity_id'] = entity_id(self.entity_kind, sample['entity'])
+            else:
+                params['host_id'] = host_id
+            yield params
+
+
+class MetricRegistry:
+    def __init__(self):
+        self._families = {}
+
+    def register(self, family):
+        if family.name in self._families:
+            raise ValueError(f'Metric family already registered: {family.name}')
+        self._families[family.name] = family
+        return family
+
+    def get(self, name):
+        return self._families[name]
+
+    def by_table(self, table):
+        for family in self._families.values():
+            if family.table == table:
+                return family
+        raise KeyError(table)
+
+    def families(self, enabled_only=True):
+        return [f for f in self._families.values() if f.enabled or not enabled_only]
+
+    def __iter__(self):
+        return iter(self.families())
+
+
+registry = MetricRegistry()
+
+registry.register(MetricFamily(
+    'system', 'system_metrics',
+    fields=[
+        ('cpu_percent', 'REAL'),
+        ('memory_percent', 'REAL'),
+        ('disk_usage', 'REAL'),
+        ('network_bytes_sent', 'REAL'),
+        ('network_bytes_recv', 'REAL'),
+        # added after the first release, so nullable (see DataStorage._add_missing_columns)
+        ('network_bytes_sent_per_sec', 'REAL', True),
+        ('network_bytes_recv_per_sec', 'REAL', True),
+    ],
+    probe='collect_system_data',
+    title='CPU, memory, disk and network',
+))
+
+registry.register(MetricFamily(
+    'memory', 'memory_metrics',
+    fields=[
+        ('memory_total', 'REAL'),
+        ('memory_available', 'REAL'),
+        ('memory_used', 'REAL'),
+        ('memory_cached', 'REAL'),
+        ('memory_buffers', 'REAL'),
+        ('memory_percent', 'REAL'),
+        ('swap_total', 'REAL'),
+        ('swap_used', 'REAL'),
+        ('swap_free', 'REAL'),
+        ('swap_percent', 'REAL'),
+    ],
+    probe='collect_system_memory',
+    title='Memory and swap',
+))
+
+registry.register(MetricFamily(
+    'system_io_wait', 'system_io_wait',
+    fields=[
+        ('read_io_bytes_per_sec', 'REAL'),
+        ('write_io_bytes_per_sec', 'REAL'),
+        ('busy_percentage', 'REAL'),
+    ],
+    probe='collect_system_io_wait_time',
+    title='System IO',
+))
+
+registry.register(MetricFamily(
+    'process', 'process_metrics',
+    fields=[
+        ('pid', 'INTEGER'),
+        ('name', 'TEXT', True),
+        ('cpu_percent', 'REAL'),
+        ('memory_rss', 'INTEGER'),
+        ('read_bytes_per_sec', 'REAL'),
+        ('write_bytes_per_sec', 'REAL'),
+    ],
+    probe='collect_process_metrics',
+    rows_key='processes',
+    # walks every process, the slowest probe on busy hosts
+    timeout=4.0,
+    title='Top processes',
+))
+
+# per-entity breakdowns of the system-wide families
+registry.register(MetricFamily(
+    'cpu_cores', 'cpu_core_metrics',
+    fields=[('busy_percent', 'REAL')],
+    probe='collect_cpu_cores',
+    entity_kind='cpu',
+    title='CPU usage per core',
+))
+
+registry.register(MetricFamily(
+    'disks', 'disk_metrics',
+    fields=[
+        ('busy_percent', 'REAL'),
+        ('read_bytes_per_sec', 'REAL'),
+        ('write_bytes_per_sec', 'REAL'),
+    ],
+    probe='collect_disks',
+    entity_kind='disk',
+    title='Disk IO per device',
+))
+
+registry.register(MetricFamily(
+    'mounts', 'mount_metrics',
+    fields=[
+        ('used_percent', 'REAL'),
+        ('used_bytes', 'INTEGER'),
+        ('free_bytes', 'INTEGER'),
+    ],
+    probe='collect_mounts',
+    entity_kind='mount',
+    title='Disk usage per mountpoint',
+))
+
+registry.register(MetricFamily(
+    'nics', 'nic_metrics',
+    fields=[
+        ('bytes_recv_per_sec', 'REAL'),
+        ('bytes_sent_per_sec', 'REAL'),
+    ],
+    probe='collect_nics',
+    entity_kind='nic',
+    title='Network traffic per interface',
+))
+
+# the monitor's own overhead: latency histograms of its probes, storage calls and charts,
+# one row per timed name and interval (see src/data/instrumentation.py)
+registry.register(MetricFamily(
+    'monitor_overhead', 'monitor_overhead',
+    fields=[
+        ('source', 'TEXT'),
+        ('name', 'TEXT'),
+        ('count', 'INTEGER'),
+        ('total_ms', 'REAL'),
+        ('max_ms', 'REAL'),
+        ('p50_ms', 'REAL'),
+        ('p95_ms', 'REAL'),
+    ],
+    probe='collect_timings',
+    rows_key='timings',
+    enabled=INSTRUMENTATION_ENABLED,
+    title='Monitor overhead',
+))
+
+# firing / resolved transitions of the alert rules (see src/data/alerts.py), written by the
+# daemon from the samples of the other families
+registry.register(MetricFamily(
+    'alerts', 'alert_events',
+    fields=[
+        ('family', 'TEXT'),
+        ('metric', 'TEXT'),
+        ('rule', 'TEXT'),
+        ('severity', 'TEXT'),
+        ('state', 'TEXT'),
+        ('value', 'REAL', True),
+        ('message', 'TEXT', True),
+    ],
+    probe=None,
+    rows_key='events',
+    enabled=ALERTS_ENABLED,
+    title='Alerts',
+))
+
+# opt-in families, enabled through OPTIONAL_METRIC_FAMILIES in config/settings.py
+registry.register(MetricFamily(
+    'sensors', 'sensor_metrics',
+    fields=[
+        ('temperature_max', 'REAL', True),
+        ('fan_rpm_max', 'REAL', True),
+        ('battery_percent', 'REAL', True),
+    ],
+    probe='collect_sensors',
+    rollup=False,
+    enabled='sensors' in OPTIONAL_METRIC_FAMILIES,
+    title='Sensors',
+))
+
+registry.register(MetricFamily(
+    'host', 'host_metrics',
+    fields=[
+        ('uptime_sec', 'REAL'),
+        ('users', 'INTEGER'),
+        ('process_count', 'INTEGER'),
+    ],
+    probe='collect_host_info',
+    enabled='host' in OPTIONAL_METRIC_FAMILIES,
+    title='Host',
+))
@@ -0,0 +1,139 @@
+import time
+
+from config.settings import COLLECTION_INTERVAL
+
+# averages are weighted by the time each sample covers: the cadence adapts to the load, so busy
+# periods hold many more samples than quiet ones. a sample without an interval (the first of
+# its family) covers one COLLECTION_INTERVAL
+DEFAULT_INTERVAL_MS = int(COLLECTION_INTERVAL * 1000)
+
+
+def weight(interval='interval_ms'):
+    return f'coalesce({interval}, {DEFAULT_INTERVAL_MS})'
+
+
+def rollup_table(table, tier):
+    return f'{table}_{tier}'
+
+
+class RollupManager:
+    # keeps min/max/avg/last aggregates of the raw metric tables at coarser resolutions.
+    # each tier is a separate table keyed by host and bucket start (epoch ms), updated with
+    # an upsert for every raw row so the aggregates are always current without rescanning.
+    # {col}_sum adds up value * interval and interval_sum the intervals, their ratio is the
+    # time-weighted average
+    def __init__(self, tables, tiers):
+        # tables: {raw table: metric columns}, tiers: {name: bucket width in seconds}
+        self.tables = tables
+        self.tiers = {name: int(seconds * 1000) for name, seconds in tiers.items()}
+        self._upserts = {table: self._upsert_queries(table, columns) for table, columns in tables.items()}
+
+    def tier_columns(self, table):
+        return [f'{col}_{name}' for col in self.tables[table] for name in ('min', 'max', 'sum', 'last')]
+
+    def create_table_queries(self, table):
+        columns = ', '.join(f'{column} REAL' for column in self.tier_columns(table))
+        return [f'''
+            CREATE TABLE IF NOT EXISTS {rollup_table(table, tier)} (
+                host_id INTEGER NOT NULL DEFAULT 0,
+                timestamp INTEGER NOT NULL,
+                sample_count INTEGER NOT NULL,
+                last_timestamp INTEGER NOT NULL,
+                interval_sum REAL,
+                {columns},
+                PRIMARY KEY (host_id, timestamp)
+            )
+        ''' for tier in self.tiers]
+
+    def _upsert_queries(self, table, columns):
+        queries = []
+        for tier, width in self.tiers.items():
+            insert_columns = ', '.join(f'{c}_min, {c}_max, {c}_sum, {c}_last' for c in columns)
+            values = ', '.join(f':{c}, :{c}, :{c} * {weight(":interval_ms")}, :{c}' for c in columns)
+            # all expressions of an UPDATE see the old row, so the CASE compares against the previous last_timestamp.
+            # NULL values (a nullable field, or a column added to a bucket that already existed) are skipped
+            updates = ',\n'.join(
+                f'{c}_min = coalesce(min({c}_min, excluded.{c}_min), {c}_min, excluded.{c}_min), '
+                f'{c}_max = coalesce(max({c}_max, excluded.{c}_max), {c}_max, excluded.{c}_max), '
+                f'{c}_sum = coalesce({c}_sum + excluded.{c}_sum, {c}_sum, excluded.{c}_sum), '
+                f'{c}_last = CASE WHEN excluded.last_timestamp >= last_timestamp THEN excluded.{c}_last ELSE {c}_last END'
+                for c in columns
+            )
+            queries.append(f'''
+                INSERT INTO {rollup_table(table, tier)}
+                    (host_id, timestamp, sample_count, last_timestamp, interval_sum, {insert_columns})
+                VALUES (:host_id, :timestamp - :timestamp % {width}, 1, :timestamp, {weight(":interval_ms")}, {values})
+                ON CONFLICT(host_id, timestamp) DO UPDATE SET
+                    sample_count = sample_count + 1,
+                    interval_sum = interval_sum + excluded.interval_sum,
+                    {updates},
+                    last_timestamp = max(last_timestamp, excluded.last_timestamp)
+            ''')
+        return queries
+
+    def update(self, conn, table, rows):
+        # rows are the parameter dicts that were just inserted into the raw table
+        for query in self._upserts.get(table, ()):
+            conn.executemany(query, rows)
+
+    def backfill(self, conn, table):
+        # rebuild the tiers of a raw table from scratch, used when the tiers are first created
+        columns = self.tables[table]
+        for tier, width in self.tiers.items():
+            aggregates = ', '.join(
+                f'min({c}) AS {c}_min, max({c}) AS {c}_max, sum({c} * {weight()}) AS {c}_sum' for c in columns
+            )
+            lasts = ', '.join(
+                f'(SELECT r.{c} FROM {table} r WHERE r.host_id = g.host_id AND r.timestamp = g.last_timestamp '
+                f'ORDER BY r.id DESC LIMIT 1)'
+                for c in columns
+            )
+            selected = ', '.join(f'g.{c}_min, g.{c}_max, g.{c}_sum' for c in columns)
+            insert_columns = ', '.join(f'{c}_min, {c}_max, {c}_sum' for c in columns)
+            last_columns = ', '.join(f'{c}_last' for c in columns)
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {rollup_table(table, tier)}
+                    (host_id, timestamp, sample_count, last_timestamp, interval_sum, {insert_columns}, {last_columns})
+                SELECT g.host_id, g.bucket, g.sample_count, g.last_timestamp, g.interval_sum, {selected}, {lasts}
+                FROM (
+                    SELECT host_id, timestamp - timestamp % {width} AS bucket, count(*) AS sample_count,
+                           max(timestamp) AS last_timestamp, sum({weight()}) AS interval_sum, {aggregates}
+                    FROM {table}
+                    GROUP BY host_id, bucket
+                ) g
+            ''')
+
+    def pick_tier(self, since, until=None, min_points=100):
+        # coarsest tier that still yields at least min_points buckets over the window,
+        # None means the raw table is needed
+        window = (until if until is not None else int(time.time() * 1000)) - since
+        for tier, width in sorted(self.tiers.items(), key=lambda item: item[1], reverse=True):
+            if window // width >= min_points:
+                return tier
+        return None
+
+    def select_query(self, table, tier):
+        # same column names as the raw table (averages), plus the _min/_max/_last aggregates.
+        # rows of every host, the caller filters on host_id
+        columns = ', '.join(
+            f'{c}_sum / interval_sum AS {c}, {c}_min, {c}_max, {c}_last' for c in self.tables[table]
+        )
+        return f'SELECT timestamp, sample_count, {columns} FROM {rollup_table(table, tier)}'
+
+    def migrate_table_queries(self, table, existing):
+        # v3 schema: the tiers of an older database move to the (host_id, timestamp) key,
+        # their existing buckets belong to host 0. existing: the columns the tiers have now
+        queries = []
+        columns = ', '.join(
+            c for c in ['timestamp', 'sample_count', 'last_timestamp'] + self.tier_columns(table) if c in existing
+        )
+        for tier, create in zip(self.tiers, self.create_table_queries(table)):
+            name = rollup_table(table, tier)
+            queries += [
+                f'ALTER TABLE {name} RENAME TO {name}_v2',
+                create,
+                f'INSERT INTO {name} (host_id, {columns}) SELECT 0, {columns} FROM {name}_v2',
+                f'DROP TABLE {name}_v2',
+            ]
+        return queries
+
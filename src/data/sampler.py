@@ -0,0 +1,98 @@
+import time
+
+from config.settings import COUNTER_MIN_INTERVAL
+
+# cpu_times fields that are already accounted for in user/nice on linux
+_CPU_GUEST_FIELDS = ('guest', 'guest_nice')
+_CPU_IDLE_FIELDS = ('idle', 'iowait')
+# width of the kernel's byte / operation counters
+_COUNTER_WRAP = 2 ** 64
+
+
+class CounterDelta:
+    # keeps the previous raw reading of a group of monotonically increasing counters
+    # (cpu_times, disk_io_counters, net_io_counters, ...) and turns the next reading
+    # into deltas over the real elapsed time, so no sampling call ever has to sleep.
+    # the first reading is taken here, a sample less than min_elapsed after the previous one
+    # has no deltas (None) and keeps that previous reading for the next sample.
+    # wraps=False is for counters that may step back a little (cpu_times), such steps are 0
+    def __init__(self, read, clock=time.monotonic, wraps=True, min_elapsed=COUNTER_MIN_INTERVAL):
+        self.read = read
+        self.clock = clock
+        self.wraps = wraps
+        self.min_elapsed = min_elapsed
+        self.resets = 0
+        self._prev = read()
+        self._prev_time = clock()
+
+    @property
+    def last(self):
+        # the most recent raw reading
+        return self._prev
+
+    def sample(self):
+        current = self.read()
+        now = self.clock()
+        elapsed = now - self._prev_time
+        if elapsed < self.min_elapsed:
+            return None, elapsed
+        previous = self._prev
+        self._prev, self._prev_time = current, now
+
+        if current is None or previous is None:
+            return None, elapsed
+        return self._deltas(current, previous), elapsed
+
+    def _deltas(self, current, previous):
+        deltas = {}
+        for field in current._fields:
+            value, prev = getattr(current, field), getattr(previous, field)
+            delta = value - prev
+            if delta < 0:
+                if not self.wraps:
+                    # e.g. iowait is not monotonic on linux, the step back is noise
+                    delta = 0
+                elif prev >= _COUNTER_WRAP // 2:
+                    # the counter wrapped around
+                    self.resets += 1
+                    delta = (value - prev) % _COUNTER_WRAP
+                else:
+                    # the counter was reset (device re-attached, driver reloaded, ...).
+                    # assume it restarted from zero rather than reporting a huge negative rate
+                    self.resets += 1
+                    delta = value
+            deltas[field] = delta
+        return deltas
+
+
+class EntityDelta(CounterDelta):
+    # same as CounterDelta for readings keyed by entity ({'cpu0': cpu_times, 'sda': ...}).
+    # an entity that just appeared has no previous reading and is reported from the next
+    # sample on, one that disappeared is dropped
+    def sample(self):
+        current = self.read() or {}
+        now = self.clock()
+        elapsed = now - self._prev_time
+        if elapsed < self.min_elapsed:
+            return {}, elapsed
+        previous = self._prev or {}
+        self._prev, self._prev_time = current, now
+
+        deltas = {
+            entity: self._deltas(reading, previous[entity])
+            for entity, reading in current.items() if entity in previous
+        }
+        return deltas, elapsed
+
+
+def rate(delta, elapsed):
+    return delta / elapsed if elapsed > 0 else 0.0
+
+
+def cpu_busy_percent(deltas):
+    # same definition as psutil.cpu_percent: everything except idle (and iowait) is busy time
+    total = sum(v for k, v in deltas.items() if k not in _CPU_GUEST_FIELDS)
+    if total <= 0:
+        return 0.0
+    idle = sum(deltas.get(k, 0) for k in _CPU_IDLE_FIELDS)
+    return round(max(0.0, min(100.0, (total - idle) / total * 100)), 1)
@@ -0,0 +1,123 @@
+import logging
+import math
+import time
+
+from config.settings import (
+    ADAPTIVE_DELTA_THRESHOLD, ADAPTIVE_DRIFT_THRESHOLD, ADAPTIVE_EWMA_ALPHA, ADAPTIVE_MAX_INTERVAL,
+    ADAPTIVE_MIN_INTERVAL, ADAPTIVE_NOISE_FACTOR, ADAPTIVE_QUIET_TICKS, ADAPTIVE_WATCH
+)
+from src.data.alerts import Ewma
+
+logger = logging.getLogger(__name__)
+
+
+class FixedRateScheduler:
+    # runs tick() on a fixed cadence anchored to the first run, so the time spent inside
+    # tick() does not drift the schedule. if a tick overruns, the missed slots are skipped
+    # instead of firing back to back.
+    def __init__(self, interval, clock=time.monotonic):
+        if interval <= 0:
+            raise ValueError(f'interval must be positive, got {interval}')
+        self.interval = interval
+        self.clock = clock
+        self.missed_ticks = 0
+
+    def run(self, tick, stop_event):
+        next_run = self.clock()
+        while not stop_event.is_set():
+            tick()
+
+            next_run += self.interval
+            now = self.clock()
+            if now >= next_run:
+                missed = int((now - next_run) // self.interval) + 1
+                self.missed_ticks += missed
+                next_run += missed * self.interval
+                logger.warning(f'Collection overran its interval, skipped {missed} tick(s)')
+
+            stop_event.wait(next_run - now)
+
+    def observe(self, family_name, data):
+        # the cadence doesn't depend on the samples
+        pass
+
+
+class AdaptiveScheduler:
+    # runs tick() like FixedRateScheduler, but the interval follows the samples passed to
+    # observe(): it drops to min_interval as soon as a watched metric jumps or drifts out of its
+    # usual noise, so short spikes are caught, and doubles (up to max_interval) after quiet_ticks
+    # calm ticks
+    def __init__(self, interval, min_interval=ADAPTIVE_MIN_INTERVAL, max_interval=ADAPTIVE_MAX_INTERVAL,
+                 watch=ADAPTIVE_WATCH, delta_threshold=ADAPTIVE_DELTA_THRESHOLD,
+                 drift_threshold=ADAPTIVE_DRIFT_THRESHOLD, noise_factor=ADAPTIVE_NOISE_FACTOR,
+                 quiet_ticks=ADAPTIVE_QUIET_TICKS, clock=time.monotonic):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(f'need 0 < min_interval <= max_interval, got {min_interval} and {max_interval}')
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.delta_threshold = delta_threshold
+        self.drift_threshold = drift_threshold
+        self.noise_factor = noise_factor
+        self.quiet_ticks = quiet_ticks
+        self.clock = clock
+        self.missed_ticks = 0
+        self._watch = {}
+        for family_name, metric in watch:
+            self._watch.setdefault(family_name, []).append(metric)
+        self._previous = {}
+        self._ewmas = {}
+        self._volatile = False
+        self._quiet = 0
+
+    def observe(self, family_name, data):
+        for metric in self._watch.get(family_name, ()):
+            value = data.get(metric)
+            if value is None:
+                continue
+            key = (family_name, metric)
+            ewma = self._ewmas.get(key)
+            if ewma is None:
+                ewma = self._ewmas[key] = Ewma(ADAPTIVE_EWMA_ALPHA, warmup=0)
+            previous, self._previous[key] = self._previous.get(key), value
+            # measured against the samples before this one. the drift needs two of them to
+            # have a level, a jump only one
+            deviation = abs(value - ewma.mean)
+            jumped = previous is not None and abs(value - previous) >= self.delta_threshold
+            drifted = ewma.count >= 2 and deviation >= self.drift_threshold
+            if (jumped or drifted) and deviation >= self.noise_factor * math.sqrt(ewma.var):
+                self._volatile = True
+            ewma.update(value)
+
+    def adapt(self):
+        # once per tick, with everything observed since the previous call
+        volatile, self._volatile = self._volatile, False
+        if volatile:
+            self._quiet = 0
+            if self.interval > self.min_interval:
+                logger.info(f'Metrics are moving, sampling every {self.min_interval}s')
+            self.interval = self.min_interval
+        else:
+            self._quiet += 1
+            if self._quiet >= self.quiet_ticks and self.interval < self.max_interval:
+                self._quiet = 0
+                self.interval = min(self.max_interval, self.interval * 2)
+                logger.info(f'Metrics are quiet, sampling every {self.interval}s')
+        return self.interval
+
+    def run(self, tick, stop_event):
+        next_run = self.clock()
+        while not stop_event.is_set():
+            tick()
+            self.adapt()
+
+            # the next tick is due one (new) interval after this one started. there is no fixed
+            # grid to go back to after an overrun, the schedule restarts from now
+            next_run += self.interval
+            now = self.clock()
+            if now >= next_run:
+                self.missed_ticks += 1
+                next_run = now + self.interval
+                logger.debug(f'Collection overran its {self.interval}s interval')
+
+            stop_event.wait(next_run - now)
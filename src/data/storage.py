@@ -1,8 +1,26 @@
+import math
 import sqlite3
+import queue
+import threading
+import time
+from contextlib import contextmanager
 import pandas as pd 
 from pathlib import Path 
 import logging
-from config.settings import DB_PATH, LOG_DIR, LOG_FORMAT 
+import socket
+from src.data.timestamps import epoch_ms, to_datetime
+from src.data.rollup import RollupManager, rollup_table
+from src.data.aggregates import (
+    aggregate_frame, check_aggregates, percentile, raw_query, register_functions, rollup_query
+)
+from src.data.registry import registry
+from src.data.archive import ParquetArchive
+from src.data.instrumentation import timed
+from config.settings import (
+    DB_PATH, LOG_DIR, LOG_FORMAT, DB_BATCH_SIZE, DB_FLUSH_INTERVAL, DB_READER_POOL_SIZE, DB_CACHE_SIZE_KB,
+    ROLLUP_TIERS, RAW_RETENTION_DAYS, ROLLUP_RETENTION_DAYS, PRUNE_BATCH_SIZE, PRUNE_MAX_BATCHES,
+    ARCHIVE_DIR, ARCHIVE_PARTITION_SECONDS, ARCHIVE_MAX_PARTITIONS
+)
 
 # setup logging
 logging.basicConfig(
@@ -15,269 +33,763 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# bumped whenever a migration is added to DataStorage._migrate
+SCHEMA_VERSION = 6
+
+# tables holding one row per sample with rollup tiers, and their metric columns
+METRIC_COLUMNS = {
+    family.table: tuple(family.metric_columns) for family in registry.families(enabled_only=False) if family.rollup
+}
+METRIC_TABLES = tuple(METRIC_COLUMNS)
+
+# tables indexed on timestamp and pruned by retention
+RETAINED_TABLES = tuple(family.table for family in registry.families(enabled_only=False))
+
+# long-format breakdown tables (per core, per disk, ...), keyed by (timestamp, entity_id)
+BREAKDOWN_TABLES = tuple(family.table for family in registry.families(enabled_only=False) if family.entity_kind)
+
+# names of the cores, devices, interfaces and mountpoints of the breakdown tables, and of the
+# remote hosts (kind 'host'). the names of a host's entities are unique per host
+ENTITIES_TABLE = '''
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    host_id INTEGER NOT NULL DEFAULT 0,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (host_id, kind, name)
+)
+'''
+
+# host_id of the rows this machine collects itself, remote hosts (agent mode) get the id
+# of their 'host' entity
+LOCAL_HOST = 0
+
 class DataStorage:
-    def __init__(self):
-        self.db_path = DB_PATH
-        self._create_table()
-        self._create_table_mem()
-        self._create_table_system_io_wait()
-    
-    def _create_table(self):
-        query = '''
-        CREATE TABLE IF NOT EXISTS system_metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            timestamp DATETIME NOT NULL,
-            cpu_percent REAL NOT NULL,
-            memory_percent REAL NOT NULL,
-            disk_usage REAL NOT NULL,
-            network_bytes_sent REAL NOT NULL,
-            network_bytes_recv REAL NOT NULL  
-        )
-        '''
+    def __init__(self, db_path=DB_PATH, batch_size=DB_BATCH_SIZE, flush_interval=DB_FLUSH_INTERVAL,
+                 reader_pool_size=DB_READER_POOL_SIZE, archive_dir=ARCHIVE_DIR):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(query)
-            conn.commit()
+        # sealed partitions of the raw tables go to Parquet files, None keeps everything in SQLite
+        self._archive = ParquetArchive(archive_dir, ARCHIVE_PARTITION_SECONDS) if archive_dir is not None else None
 
-    def _create_table_mem(self):
-        query = '''
-            CREATE TABLE IF NOT EXISTS memory_metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            memory_total REAL NOT NULL, 
-            memory_available REAL NOT NULL,
-            memory_used REAL NOT NULL,
-            memory_cached REAL NOT NULL,
-            memory_buffers REAL NOT NULL,
-            memory_percent REAL NOT NULL,
-            swap_total REAL NOT NULL,
-            swap_used REAL NOT NULL,
-            swap_free REAL NOT NULL,
-            swap_percent REAL NOT NULL
-        )
-        '''
+        # one long-lived writer connection, writes are buffered and flushed in a single transaction
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        self._pending = {}
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(query)
-            conn.commit()
-    
-    def save_to_db(self, data):
-        if data is None: return
-        query = '''
-        INSERT INTO system_metrics (timestamp, cpu_percent, memory_percent, disk_usage, network_bytes_sent, network_bytes_recv)
-        VALUES (:timestamp, :cpu_percent, :memory_percent, :disk_usage, :network_bytes_sent, :network_bytes_recv)
-        '''
+        # small pool of reader connections, WAL lets them read while the writer commits
+        self._readers = queue.Queue(maxsize=reader_pool_size)
+        for _ in range(reader_pool_size):
+            self._readers.put(self._connect(read_only=True))
+
+        self._create_tables()
+
+        self._rollups = RollupManager(METRIC_COLUMNS, ROLLUP_TIERS)
+        for table in METRIC_TABLES:
+            for query in self._rollups.create_table_queries(table):
+                self._execute_ddl(query)
+
+        self._migrate()
+        self._create_indexes()
+        self._load_caches()
+
+    def _migrate(self):
+        with self._write_lock:
+            version = self._writer.execute('PRAGMA user_version').fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+
+            if version < 3:
+                # v3: a host column, so one database can hold the rows of several hosts. it goes
+                # in first, the v2 backfill below is written against it
+                self._add_host_columns()
+
+            if version < 6:
+                # v4: nullable fields declared since the table was created (interval_ms),
+                # v6: the network rates, with their rollup columns
+                self._add_missing_columns()
+
+            if version < 1:
+                # v1: '%Y-%m-%d %H:%M:%S' local time strings -> integer epoch milliseconds (UTC)
+                for table in METRIC_TABLES:
+                    cursor = self._writer.execute(f'''
+                        UPDATE {table}
+                        SET timestamp = CAST(strftime('%s', timestamp, 'utc') AS INTEGER) * 1000
+                        WHERE typeof(timestamp) = 'text'
+                    ''')
+                    if cursor.rowcount:
+                        logger.info(f'Migrated {cursor.rowcount} timestamps of {table} to epoch milliseconds')
+
+            if version < 2:
+                # v2: rollup tiers, built once from the raw rows that already exist
+                for table in METRIC_TABLES:
+                    self._rollups.backfill(self._writer, table)
+
+            if version < 5:
+                # v5: averages weighted by the sampling interval, the tiers are rebuilt from the raw
+                # rows that are left (the v2 backfill above already wrote them weighted)
+                self._add_interval_sums()
+                if version >= 2:
+                    for table in METRIC_TABLES:
+                        self._rollups.backfill(self._writer, table)
+
+            self._writer.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            self._writer.commit()
+
+    def _columns(self, table):
+        return {row[1] for row in self._writer.execute(f'PRAGMA table_info({table})')}
+
+    def _add_host_columns(self):
+        # only tables created before v3 lack the column, fresh ones are created with it.
+        # adding a column with a default doesn't rewrite the table. existing rows are this machine's
+        for table in RETAINED_TABLES:
+            if table not in BREAKDOWN_TABLES and 'host_id' not in self._columns(table):
+                self._writer.execute(f'ALTER TABLE {table} ADD COLUMN host_id INTEGER NOT NULL DEFAULT 0')
+                logger.info(f'Added the host column to {table}')
+        # the rollup tiers are keyed by host now and the entity names unique per host, those are rebuilt
+        for table in METRIC_TABLES:
+            existing = self._columns(rollup_table(table, next(iter(ROLLUP_TIERS)))) if ROLLUP_TIERS else {'host_id'}
+            if 'host_id' not in existing:
+                for query in self._rollups.migrate_table_queries(table, existing):
+                    self._writer.execute(query)
+        if 'host_id' not in self._columns('entities'):
+            self._writer.execute('ALTER TABLE entities RENAME TO entities_v2')
+            self._writer.execute(ENTITIES_TABLE)
+            self._writer.execute('INSERT INTO entities (id, host_id, kind, name) SELECT id, 0, kind, name FROM entities_v2')
+            self._writer.execute('DROP TABLE entities_v2')
+
+    def _add_interval_sums(self):
+        # buckets whose raw rows were pruned keep their unweighted sums, each of their samples
+        # then counts once
+        for table in METRIC_TABLES:
+            for tier in self._rollups.tiers:
+                name = rollup_table(table, tier)
+                if 'interval_sum' not in self._columns(name):
+                    self._writer.execute(f'ALTER TABLE {name} ADD COLUMN interval_sum REAL')
+                self._writer.execute(f'UPDATE {name} SET interval_sum = sample_count WHERE interval_sum IS NULL')
+
+    def _add_missing_columns(self):
+        for family in registry.families(enabled_only=False):
+            existing = self._columns(family.table)
+            for field in family.fields:
+                if field.nullable and field.name not in existing:
+                    self._writer.execute(f'ALTER TABLE {family.table} ADD COLUMN {field.name} {field.type}')
+                    logger.info(f'Added {field.name} to {family.table}')
+            if family.table not in METRIC_COLUMNS:
+                continue
+            for tier in self._rollups.tiers:
+                name = rollup_table(family.table, tier)
+                existing = self._columns(name)
+                for column in self._rollups.tier_columns(family.table):
+                    if column not in existing:
+                        self._writer.execute(f'ALTER TABLE {name} ADD COLUMN {column} REAL')
+
+    def _create_indexes(self):
+        for table in RETAINED_TABLES:
+            if table in BREAKDOWN_TABLES:
+                # their primary key already starts with timestamp
+                continue
+            self._execute_ddl(f'CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)')
+            # the loaders read one host at a time, newest first
+            self._execute_ddl(f'CREATE INDEX IF NOT EXISTS idx_{table}_host ON {table} (host_id, timestamp)')
+
+    def _connect(self, read_only=False):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        if read_only:
+            conn.execute('PRAGMA query_only=ON')
+        # latest() and approx_quantile() of the aggregate queries
+        register_functions(conn)
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        # reading through this instance should see the rows it buffered itself
+        if self._pending_rows:
+            self.flush()
+        conn = self._readers.get()
         try:
+            yield conn
+        finally:
+            self._readers.put(conn)
 
-            logger.debug(f"Attempting to save data: {data}")
-            logger.debug(f"Data type: {type(data)}")
-            logger.debug(f"Data keys: {list(data.keys())}")
-            
-            params = {
-                'timestamp': data['timestamp'],
-                "cpu_percent": data["cpu_percent"],
-                "memory_percent": data["memory_percent"],
-                "disk_usage": data["disk_usage"],
-                "network_bytes_sent": data["network_bytes_sent"],
-                "network_bytes_recv": data["network_bytes_recv"]
-            }
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(query, params)
-                conn.commit()
-            logger.info("Data saved successfully")
-        
-        except Exception as e:
-            logger.error(f"Error saving data: {e}")
-            logger.error(f'Query was: {query}')
+    def _execute_ddl(self, query):
+        with self._write_lock:
+            self._writer.execute(query)
+            self._writer.commit()
 
+    def _queue(self, query, params, table):
+        with self._write_lock:
+            self._pending.setdefault((table, query), []).append(params)
+            self._pending_rows += 1
+        self.flush_if_due()
 
-    def save_to_db_mem(self, data):
-        if data is None: 
+    def flush_if_due(self):
+        if self._pending_rows >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    @timed
+    def flush(self):
+        with self._write_lock:
+            pending, self._pending = self._pending, {}
+            rows, self._pending_rows = self._pending_rows, 0
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+
+            # every buffered row goes out in one transaction, one executemany per statement.
+            # a failing statement is logged without dropping the others: each statement and the
+            # rollup upserts of its rows run in a savepoint, so they are undone together and the
+            # tiers never count rows the raw table doesn't have. the rows of a failed statement
+            # are then retried one by one, so one bad row (e.g. a NULL in a NOT NULL column)
+            # only loses itself. the tables without tiers have no rollup upserts
+            try:
+                if not self._writer.in_transaction:
+                    self._writer.execute('BEGIN')
+                for (table, query), params in pending.items():
+                    try:
+                        self._save_batch(table, query, params)
+                    except sqlite3.Error as e:
+                        dropped = sum(not self._save_batch(table, query, [row], quiet=True) for row in params)
+                        logger.error(f'Error saving {len(params)} rows, dropped {dropped} of them: {e}')
+                        logger.error(f'Query was: {query}')
+                self._writer.commit()
+                logger.debug(f'Flushed {rows} rows')
+            except sqlite3.Error as e:
+                self._writer.rollback()
+                logger.error(f'Error flushing {rows} rows: {e}')
+
+    def _save_batch(self, table, query, params, quiet=False):
+        # the rows and their rollups in a savepoint of the flush transaction, undone together on
+        # an error. quiet returns False instead of raising
+        self._writer.execute('SAVEPOINT batch')
+        try:
+            self._writer.executemany(query, params)
+            self._rollups.update(self._writer, table, params)
+            self._mark_late(table, params)
+        except sqlite3.Error:
+            self._writer.execute('ROLLBACK TO batch')
+            self._writer.execute('RELEASE batch')
+            if quiet:
+                return False
+            raise
+        self._writer.execute('RELEASE batch')
+        return True
+
+    def _mark_late(self, table, params):
+        # rows older than the archive watermark (an agent resending its backlog) belong to a
+        # partition that is already sealed: it is listed for archive() to seal again, and
+        # prune() leaves its rows alone until then
+        if self._archive is None:
             return
-        
-        query = '''
-        INSERT INTO memory_metrics (
-            timestamp,
-            memory_total, 
-            memory_available, 
-            memory_used, 
-            memory_cached, 
-            memory_buffers, 
-            memory_percent,
-            swap_total, 
-            swap_used, 
-            swap_free, 
-            swap_percent
+        watermark = self._watermark(table, self._writer)
+        late = {self._archive.partition_start(row['timestamp']) for row in params if row['timestamp'] < watermark}
+        if late:
+            self._writer.executemany(
+                'INSERT OR IGNORE INTO archive_late (table_name, partition_start) VALUES (?, ?)',
+                [(table, start) for start in late]
+            )
+            logger.warning(f'{table} received rows of {len(late)} archived partition(s), they are sealed again')
+
+    @timed
+    def prune(self, now=None):
+        # delete rows past their retention in bounded batches, each batch is its own short transaction
+        now = epoch_ms(now)
+        day = 24 * 3600 * 1000
+        targets = []
+        for family in registry.families(enabled_only=False):
+            if RAW_RETENTION_DAYS is not None:
+                cutoff = now - RAW_RETENTION_DAYS * day
+                if self._archive is not None:
+                    # raw rows are only dropped once they are safely in the archive: before the
+                    # watermark and before the first partition waiting to be sealed again
+                    cutoff = min(cutoff, self._watermark(family.table), self._first_late(family.table))
+                targets.append((family.table, family.row_key, cutoff))
+        for table in METRIC_TABLES:
+            for tier in ROLLUP_TIERS:
+                days = ROLLUP_RETENTION_DAYS.get(tier)
+                if days is not None:
+                    targets.append((rollup_table(table, tier), 'rowid', now - days * day))
+
+        deleted = 0
+        for table, key, cutoff in targets:
+            query = f'''
+                DELETE FROM {table} WHERE ({key}) IN (
+                    SELECT {key} FROM {table} WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+                )
+            '''
+            for _ in range(PRUNE_MAX_BATCHES):
+                with self._write_lock:
+                    try:
+                        count = self._writer.execute(query, (cutoff, PRUNE_BATCH_SIZE)).rowcount
+                        self._writer.commit()
+                    except sqlite3.Error as e:
+                        self._writer.rollback()
+                        logger.error(f'Error pruning {table}: {e}')
+                        break
+                deleted += count
+                if count < PRUNE_BATCH_SIZE:
+                    break
+
+        if deleted:
+            logger.info(f'Pruned {deleted} rows past retention')
+        return deleted
+
+    @timed
+    def archive(self, now=None, max_partitions=ARCHIVE_MAX_PARTITIONS):
+        # seal closed partitions of every raw table into Parquet, oldest first, and move the
+        # table's watermark past them. the current partition is never sealed, at most
+        # max_partitions are sealed per table
+        if self._archive is None:
+            return 0
+        self.flush()
+        current = self._archive.partition_start(epoch_ms(now))
+        sealed = 0
+        for family in registry.families(enabled_only=False):
+            table = family.table
+            sealed += self._reseal(family)
+            for _ in range(max_partitions):
+                watermark = self._watermark(table)
+                with self._reader() as conn:
+                    first = conn.execute(
+                        f'SELECT min(timestamp) FROM {table} WHERE timestamp >= ?', (watermark,)
+                    ).fetchone()[0]
+                if first is None:
+                    break
+                start = self._archive.partition_start(first)
+                end = start + self._archive.width
+                if end > current:
+                    break
+
+                try:
+                    with self._reader() as conn:
+                        df = pd.read_sql_query(
+                            f'SELECT * FROM {table} WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp',
+                            conn, params=(start, end)
+                        )
+                    self._archive.write(family, start, df)
+                except Exception as e:
+                    logger.error(f'Error archiving {table} partition {start}: {e}')
+                    break
+
+                with self._write_lock:
+                    self._writer.execute('''
+                        INSERT INTO archive_watermarks (table_name, sealed_until) VALUES (?, ?)
+                        ON CONFLICT(table_name) DO UPDATE SET sealed_until = excluded.sealed_until
+                    ''', (table, end))
+                    self._writer.commit()
+                sealed += 1
+                logger.info(f'Archived {len(df)} rows of {table} up to {end}')
+        return sealed
+
+    def _reseal(self, family):
+        # rewrite the sealed partitions that received late rows: the rows already in the file
+        # and the rows SQLite still has, the SQLite copy wins for rows that are in both
+        table = family.table
+        with self._reader() as conn:
+            starts = [row[0] for row in conn.execute(
+                'SELECT partition_start FROM archive_late WHERE table_name = ? ORDER BY partition_start', (table,)
+            )]
+        key = ['timestamp', 'entity_id'] if family.entity_kind else ['id']
+        resealed = 0
+        for start in starts:
+            end = start + self._archive.width
+            # unlisted before the rows are read, rows arriving meanwhile list it again
+            self._set_late(table, start, False)
+            try:
+                with self._reader() as conn:
+                    df = pd.read_sql_query(
+                        f'SELECT * FROM {table} WHERE timestamp >= ? AND timestamp < ?', conn, params=(start, end)
+                    )
+                archived = self._archive.read(family, since=start, until=end)
+                if archived is not None and not archived.empty:
+                    df = pd.concat([archived, df], ignore_index=True).drop_duplicates(key, keep='last')
+                self._archive.write(family, start, df.sort_values('timestamp', kind='stable'))
+            except Exception as e:
+                self._set_late(table, start, True)
+                logger.error(f'Error sealing {table} partition {start} again: {e}')
+                break
+            resealed += 1
+            logger.info(f'Archived {len(df)} rows of {table} partition {start} again, with its late rows')
+        return resealed
+
+    def _set_late(self, table, start, late):
+        query = (
+            'INSERT OR IGNORE INTO archive_late (table_name, partition_start) VALUES (?, ?)' if late
+            else 'DELETE FROM archive_late WHERE table_name = ? AND partition_start = ?'
         )
-        VALUES (
-            :timestamp,
-            :memory_total, 
-            :memory_available, 
-            :memory_used, 
-            :memory_cached, 
-            :memory_buffers, 
-            :memory_percent,
-            :swap_total, 
-            :swap_used, 
-            :swap_free, 
-            :swap_percent
+        with self._write_lock:
+            self._writer.execute(query, (table, start))
+            self._writer.commit()
+
+    def close(self):
+        self.flush()
+        with self._write_lock:
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+    
+    def _create_tables(self):
+        self._execute_ddl(ENTITIES_TABLE)
+        for family in registry.families(enabled_only=False):
+            self._execute_ddl(family.create_table_query())
+
+        # per raw table, everything before sealed_until is in the Parquet archive
+        self._execute_ddl('''
+        CREATE TABLE IF NOT EXISTS archive_watermarks (
+            table_name TEXT PRIMARY KEY,
+            sealed_until INTEGER NOT NULL
         )
-        '''
-        
-        try:
-            logger.debug(f"Attempting to save data: {data}")
-            logger.debug(f"Data type: {type(data)}")
-            logger.debug(f"Data keys: {list(data.keys())}")
-            
-            params = {
-                'timestamp': data['timestamp'],
-                'memory_total': data['memory_total'],
-                'memory_available': data['memory_available'],
-                'memory_used': data['memory_used'],
-                'memory_cached': data['memory_cached'],
-                'memory_buffers': data['memory_buffers'],
-                'memory_percent': data['memory_percent'],
-                'swap_total': data['swap_total'],
-                'swap_used': data['swap_used'],
-                'swap_free': data['swap_free'],
-                'swap_percent': data['swap_percent']
+        ''')
+        # sealed partitions that received rows after they were written, see _mark_late
+        self._execute_ddl('''
+        CREATE TABLE IF NOT EXISTS archive_late (
+            table_name TEXT NOT NULL,
+            partition_start INTEGER NOT NULL,
+            PRIMARY KEY (table_name, partition_start)
+        )
+        ''')
+
+    def _load_caches(self):
+        with self._write_lock:
+            self._entities = {
+                (host_id, kind, name): entity_id
+                for entity_id, host_id, kind, name in self._writer.execute('SELECT id, host_id, kind, name FROM entities')
             }
-            
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(query, params)
-                conn.commit()  # Ensure changes are committed
-            
-            logger.info("Memory metrics saved successfully")
-        
+
+    def _watermark(self, table, conn=None):
+        # read on every use (a primary key lookup): the collector moves it while a dashboard
+        # process keeps its DataStorage open. flush() reads it on the writer it holds
+        query = 'SELECT sealed_until FROM archive_watermarks WHERE table_name = ?'
+        if conn is not None:
+            row = conn.execute(query, (table,)).fetchone()
+        else:
+            with self._reader() as conn:
+                row = conn.execute(query, (table,)).fetchone()
+        return row[0] if row else 0
+
+    def _first_late(self, table):
+        with self._reader() as conn:
+            row = conn.execute('SELECT min(partition_start) FROM archive_late WHERE table_name = ?', (table,)).fetchone()
+        return row[0] if row[0] is not None else math.inf
+
+    def _entity_id(self, kind, name, host_id=LOCAL_HOST):
+        # ids are assigned the first time an entity is seen and cached for the process lifetime
+        key = (host_id, kind, name)
+        entity_id = self._entities.get(key)
+        if entity_id is None:
+            with self._write_lock:
+                self._writer.execute('INSERT OR IGNORE INTO entities (host_id, kind, name) VALUES (?, ?, ?)', key)
+                entity_id = self._writer.execute(
+                    'SELECT id FROM entities WHERE host_id = ? AND kind = ? AND name = ?', key
+                ).fetchone()[0]
+                self._writer.commit()
+                self._entities[key] = entity_id
+        return entity_id
+
+    def host_id(self, name):
+        # id of a remote host by name, registered on first use
+        return self._entity_id('host', name)
+
+    def hosts(self):
+        # {host_id: name} of every host with rows in this database, this machine first
+        # read from the database, hosts are registered by the ingest server process
+        hosts = {LOCAL_HOST: socket.gethostname()}
+        try:
+            with self._reader() as conn:
+                hosts.update(conn.execute("SELECT id, name FROM entities WHERE kind = 'host' ORDER BY id"))
+        except sqlite3.Error as e:
+            logger.error(f"Error loading hosts: {e}")
+        return hosts
+
+    @timed
+    def save(self, family_name, data, host_id=LOCAL_HOST):
+        # queue one sample (or one row per entry of rows_key) of a registered family
+        if data is None:
+            return
+        family = registry.get(family_name)
+        query = family.insert_query()
+        try:
+            timestamp = epoch_ms(data['timestamp'])
+            entity_id = lambda kind, name: self._entity_id(kind, name, host_id)
+            for params in family.rows(data, timestamp, entity_id, host_id):
+                self._queue(query, params, family.table)
+            logger.debug(f"{family.name} metrics saved")
+
         except Exception as e:
-            logger.error(f"Error saving memory metrics: {e}")
+            logger.error(f"Error saving {family.name} metrics: {e}")
             logger.error(f'Query was: {query}')
 
-   
+    @timed
+    def save_rows(self, family_name, rows, host_id=LOCAL_HOST):
+        # bulk path of the ingest server: rows already in table layout ({'timestamp': epoch ms,
+        # field: value}, plus 'entity' for breakdown families), queued in one go
+        family = registry.get(family_name)
+        if family.entity_kind:
+            for row in rows:
+                row['entity_id'] = self._entity_id(family.entity_kind, row.pop('entity'), host_id)
+        else:
+            for row in rows:
+                row['host_id'] = host_id
+        with self._write_lock:
+            self._pending.setdefault((family.table, family.insert_query()), []).extend(rows)
+            self._pending_rows += len(rows)
+        self.flush_if_due()
+
+    def save_to_db(self, data):
+        self.save('system', data)
+
+    def save_to_db_mem(self, data):
+        self.save('memory', data)
+
     def save_to_db_system_io_wait(self, data):
-        if data is None: return
-
-        querySystem = '''
-            INSERT INTO system_io_wait (
-                timestamp, 
-                read_io_bytes_per_sec,
-                write_io_bytes_per_sec,
-                busy_percentage
-            ) 
-            VALUES (
-                :timestamp, 
-                :read_io_bytes_per_sec,
-                :write_io_bytes_per_sec,
-                :busy_percentage            )
-        '''
-        
-        params1 = {
-            'timestamp': data['timestamp'],
-            'read_io_bytes_per_sec': data['read_io_bytes_per_sec'],
-            'write_io_bytes_per_sec': data['write_io_bytes_per_sec'],
-            'busy_percentage': data['busy_percentage']
-        }
-        try: 
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(querySystem, params1)
-            
-            logger.info("system-wide io wait metric saved successfully")
+        self.save('system_io_wait', data)
 
-        except Exception as e:
-            logger.error(f'Error saving system io wait metrics: {e}')
-            logger.error(f'Query was {querySystem}')
+    def save_to_db_process_metrics(self, data):
+        self.save('process', data)
 
-    def _create_table_system_io_wait(self):
+    def _load(self, table, limit=100, since=None, until=None, min_points=None, columns=None, host_id=LOCAL_HOST):
+        # newest rows of one host first. since/until (datetime, epoch ms or string) bound the range
+        # with an index range scan on timestamp, until is exclusive.
+        # with min_points and a since bound the coarsest rollup tier that still gives
+        # min_points rows over the window is read instead of the raw rows.
+        # columns restricts the raw columns that are read (timestamp is always included)
+        since = None if since is None else epoch_ms(since)
+        until = None if until is None else epoch_ms(until)
+        tier = None
+        if min_points is not None and since is not None and table in METRIC_COLUMNS:
+            tier = self._rollups.pick_tier(since, until, min_points)
 
-        query = '''
-        CREATE TABLE IF NOT EXISTS system_io_wait (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            timestamp DATETIME NOT NULL,
-            read_io_bytes_per_sec REAL NOT NULL,
-            write_io_bytes_per_sec REAL NOT NULL,
-            busy_percentage REAL NOT NULL
-        )
-        '''
+        # raw rows older than the archive watermark are read from the sealed Parquet partitions,
+        # SQLite only serves the rows after it, so nothing is returned twice
+        watermark = self._watermark(table) if self._archive is not None and tier is None else 0
+        cold = watermark > 0 and (since is None or since < watermark)
+        hot_since = max(since or 0, watermark) if cold else since
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(query)
-            conn.commit()
-
-
-    def save_to_db_process_io_wait(self, data):
-        queryProcess = '''
-            INSERT INTO process_io_wait (
-                timestamp, 
-                process_name, 
-                io_wait_time_per_process)
-            VALUES (
-                :timestamp, 
-                :process_name, 
-                :process_io_wait_time
+        conditions, params = ['host_id = ?'], [host_id]
+        if hot_since is not None:
+            conditions.append('timestamp >= ?')
+            params.append(hot_since)
+        if until is not None:
+            conditions.append('timestamp < ?')
+            params.append(until)
+
+        projection = ['timestamp'] + [c for c in columns if c != 'timestamp'] if columns else None
+        if tier:
+            query = self._rollups.select_query(table, tier)
+        else:
+            query = f'SELECT {", ".join(projection) if projection else "*"} FROM {table}'
+        query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        with self._reader() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+
+        if cold and (limit is None or len(df) < limit):
+            archived = self._archive.read(
+                registry.by_table(table), projection, since, watermark if until is None else min(until, watermark),
+                host_id
             )
-        '''
-        params2 = {
-            'timestamp': data['timestamp'],
-            'process_name': None,
-            'process_io_wait_time': None
-        }
+            if archived is not None and not archived.empty:
+                archived = archived.sort_values('timestamp', ascending=False)
+                if limit is not None:
+                    archived = archived.head(limit - len(df))
+                df = archived if df.empty else pd.concat([df, archived], ignore_index=True)
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(queryProcess, params2)
-                
-                for p in data['process_io_times']:
-                    params2['process_name'] = p['name']
-                    params2['process_io_wait_time'] = p['read_time'] + p['write_time']
+        df['timestamp'] = to_datetime(df['timestamp'])
+        return df
 
-                    conn.execute(queryProcess, params2)
+    @timed
+    def load_since(self, table, last_id=0, limit=None, host_id=LOCAL_HOST):
+        # rows of one host appended after last_id, oldest first. id is the rowid so this is a
+        # range scan on the primary key and costs O(new rows). limit keeps only the newest ones
+        if table not in RETAINED_TABLES or table in BREAKDOWN_TABLES:
+            raise ValueError(f'Unknown metric table: {table}')
 
-            logger.info("process io wait metric saved successfully")
-        
-        except Exception as e:
-            logger.error(f'Error saving io wait metrics: {e}')
-            logger.error(f'Query was {queryProcess}')
+        if limit is None:
+            query = f'SELECT * FROM {table} WHERE id > ? AND host_id = ? ORDER BY id'
+            params = (last_id, host_id)
+        else:
+            query = f'''
+                SELECT * FROM (SELECT * FROM {table} WHERE id > ? AND host_id = ? ORDER BY id DESC LIMIT ?)
+                ORDER BY id
+            '''
+            params = (last_id, host_id, limit)
 
-    def load_data(self, limit=100):
-        query = f"SELECT * FROM system_metrics ORDER BY timestamp DESC LIMIT {limit}"
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                return pd.read_sql_query(query, conn)
+            with self._reader() as conn:
+                df = pd.read_sql_query(query, conn, params=params)
+            df['timestamp'] = to_datetime(df['timestamp'])
+            return df
         except Exception as e:
-            logger.error(f"Error loading data: {e}")
+            logger.error(f"Error loading new rows of {table}: {e}")
             return pd.DataFrame()
 
-    def load_data_mem(self, limit=100):
-        query = f"SELECT * FROM memory_metrics ORDER BY timestamp DESC LIMIT {limit}"
-        try: 
-            with sqlite3.connect(self.db_path) as conn:
-                return pd.read_sql_query(query, conn)
+    @timed
+    def load(self, family_name, limit=100, since=None, until=None, min_points=None, columns=None,
+             host_id=LOCAL_HOST):
+        family = registry.get(family_name)
+        try:
+            return self._load(family.table, limit, since, until, min_points, columns, host_id)
         except Exception as e:
-            logger.error(f"Error loading memory metrics: {e}")
+            logger.error(f"Error loading {family.name} metrics: {e}")
             return pd.DataFrame()
-    
 
-    def load_data_io_wait(self, limit=100):
-        query1 = f"SELECT * FROM process_io_wait ORDER BY timestamp DESC LIMIT {limit}"
+    def change_counter(self, table):
+        # cheap marker that moves whenever rows are appended to table: the last rowid, or the
+        # latest timestamp of the breakdown tables. both are a single b-tree seek
+        column = 'max(timestamp)' if table in BREAKDOWN_TABLES else 'max(rowid)'
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                df1 = pd.read_sql_query(query1, conn)
+            with self._reader() as conn:
+                return conn.execute(f'SELECT {column} FROM {table}').fetchone()[0] or 0
+        except sqlite3.Error as e:
+            logger.error(f"Error reading the change counter of {table}: {e}")
+            return None
+
+    @timed
+    def load_breakdown(self, family_name, ticks=100, host_id=LOCAL_HOST):
+        # the last ticks samples of a breakdown family of one host in long format, one row per
+        # (timestamp, entity) with the entity name joined in, oldest first
+        family = registry.get(family_name)
+        columns = ', '.join(f't.{col}' for col in family.columns)
+        entities = 'SELECT id FROM entities WHERE host_id = ? AND kind = ?'
+        query = f'''
+            SELECT t.timestamp, e.name AS entity, {columns}
+            FROM {family.table} t JOIN entities e ON e.id = t.entity_id
+            WHERE e.host_id = ? AND t.timestamp >= (
+                SELECT min(timestamp) FROM (
+                    SELECT DISTINCT timestamp FROM {family.table} WHERE entity_id IN ({entities})
+                    ORDER BY timestamp DESC LIMIT ?
+                )
+            )
+            ORDER BY t.timestamp, e.name
+        '''
+        try:
+            with self._reader() as conn:
+                df = pd.read_sql_query(query, conn, params=(host_id, host_id, family.entity_kind, ticks))
+            df['timestamp'] = to_datetime(df['timestamp'])
+            return df
         except Exception as e:
-            if 'no such table' in str(e): 
-                logger.info('Process io wait monitoring not available on Mac')
+            logger.error(f"Error loading {family.name} metrics: {e}")
+            return pd.DataFrame()
+
+    def load_data(self, limit=100, since=None, until=None, min_points=None):
+        return self.load('system', limit, since, until, min_points)
+
+    def load_data_mem(self, limit=100, since=None, until=None, min_points=None):
+        return self.load('memory', limit, since, until, min_points)
+
+    def _aggregate_tier(self, table, metrics, aggregates, width):
+        # coarsest rollup tier whose buckets add up to whole buckets of width, None when the
+        # raw rows are needed (no bucketing, percentiles, or columns without rollups)
+        if not width or table not in METRIC_COLUMNS or not set(metrics) <= set(METRIC_COLUMNS[table]):
+            return None
+        if any(percentile(name) is not None for name in aggregates):
+            return None
+        tiers = [(tier_width, tier) for tier, tier_width in self._rollups.tiers.items() if width % tier_width == 0]
+        return max(tiers)[1] if tiers else None
+
+    @timed
+    def aggregate(self, family_name, metrics, since, until=None, bucket=None, aggregates=('avg', 'min', 'max'),
+                  points=None, host_id=LOCAL_HOST):
+        # summary statistics of metrics over [since, until), grouped in SQLite into buckets of
+        # bucket seconds aligned to the epoch (None: a single row for the whole range; points:
+        # about that many buckets, widened to whole rollup buckets). aggregates are avg, min,
+        # max, count, last and approximate percentiles 'p50', 'p95', ...
+        # returns timestamp (bucket start) and a <metric>_<aggregate> column per pair.
+        # every bucket overlapping the range is aggregated whole. bucket widths that are
+        # multiples of a rollup tier are read from the tier, which gives the same buckets as
+        # the raw rows and also covers ranges whose raw rows were pruned. the raw rows older
+        # than the archive watermark are read from the Parquet archive
+        family = registry.get(family_name)
+        if family.entity_kind:
+            raise ValueError(f'Cannot aggregate the breakdown family {family_name}')
+        numeric = {field.name for field in family.fields if field.type != 'TEXT'}
+        unknown = [metric for metric in metrics if metric not in numeric]
+        if unknown:
+            raise ValueError(f'Unknown {family_name} metrics: {", ".join(unknown)}')
+        check_aggregates(aggregates)
+
+        since = epoch_ms(since)
+        until = epoch_ms() if until is None else epoch_ms(until)
+        width = None
+        if points is not None:
+            width = max(1000, math.ceil((until - since) / points))
+            fitting = [tier_width for tier_width in self._rollups.tiers.values() if tier_width <= width]
+            step = max(fitting) if fitting else 1000
+            width = math.ceil(width / step) * step
+        elif bucket is not None:
+            width = int(bucket * 1000)
+        if width:
+            since -= since % width
+            until += -until % width
+
+        tier = self._aggregate_tier(family.table, metrics, aggregates, width)
+        watermark = self._watermark(family.table) if self._archive is not None and tier is None else 0
+        if tier:
+            query = rollup_query(family.table, tier, metrics, aggregates, width)
+        else:
+            query = raw_query(family.table, metrics, aggregates, width)
+        query += ' WHERE host_id = ? AND timestamp >= ? AND timestamp < ?'
+        if width:
+            query += ' GROUP BY bucket ORDER BY bucket'
+
+        try:
+            if watermark > since:
+                df = self._aggregate_archived(family, metrics, aggregates, width, since, until, watermark, host_id)
             else:
-                logger.info(f"Error loading io process wait metric: {e}")
-            df1 = pd.DataFrame()
-        
-        query2 = f"SELECT * FROM system_io_wait ORDER BY timestamp DESC LIMIT {limit}"
+                with self._reader() as conn:
+                    df = pd.read_sql_query(query, conn, params=(host_id, since, until))
+        except Exception as e:
+            logger.error(f"Error aggregating {family_name} metrics: {e}")
+            return pd.DataFrame()
+        # without buckets an empty range still gives one row of NULLs
+        df = df.dropna(subset=['bucket']).rename(columns={'bucket': 'timestamp'})
+        df['timestamp'] = to_datetime(df['timestamp'].astype('int64'))
+        return df.reset_index(drop=True)
+
+    def _aggregate_archived(self, family, metrics, aggregates, width, since, until, watermark, host_id):
+        # a range reaching past the archive watermark: the raw rows of both stores, as _load
+        # reads them, aggregated by pandas
+        columns = ['timestamp'] + list(metrics) + (['interval_ms'] if 'interval_ms' not in metrics else [])
+        query = f'SELECT {", ".join(columns)} FROM {family.table} WHERE host_id = ? AND timestamp >= ? AND timestamp < ?'
+        with self._reader() as conn:
+            df = pd.read_sql_query(query, conn, params=(host_id, watermark, until))
+        archived = self._archive.read(family, columns, since, min(until, watermark), host_id)
+        if archived is not None and not archived.empty:
+            df = archived if df.empty else pd.concat([archived, df], ignore_index=True)
+        return aggregate_frame(df, metrics, aggregates, width)
 
+    @timed
+    def load_top_processes(self, host_id=LOCAL_HOST):
+        # the top processes of one host stored at its latest tick
+        query = '''
+            SELECT * FROM process_metrics
+            WHERE host_id = ? AND timestamp = (SELECT max(timestamp) FROM process_metrics WHERE host_id = ?)
+            ORDER BY cpu_percent DESC
+        '''
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                df2 = pd.read_sql_query(query2, conn)
+            with self._reader() as conn:
+                df = pd.read_sql_query(query, conn, params=(host_id, host_id))
+            df['timestamp'] = to_datetime(df['timestamp'])
+            return df
         except Exception as e:
-            logger.error(f"Error loading system io wait metric: {e}")
-            df2 = pd.DataFrame()
+            logger.error(f"Error loading process metrics: {e}")
+            return pd.DataFrame()
 
+    def load_data_io_wait(self, limit=100, since=None, until=None, min_points=None):
+        df1 = self.load_top_processes()
+        df2 = self.load('system_io_wait', limit, since, until, min_points)
         return (df1, df2)
 
     # since process graph is real-time, we don't need to store it into database
@@ -0,0 +1,26 @@
+import time
+from datetime import datetime
+
+import pandas as pd
+
+
+def epoch_ms(value=None):
+    # metric rows store timestamps as integer epoch milliseconds (UTC)
+    if value is None:
+        return int(time.time() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        # legacy '%Y-%m-%d %H:%M:%S' strings were written in local time
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.astimezone()
+        return int(value.timestamp() * 1000)
+    raise TypeError(f'Unsupported timestamp: {value!r}')
+
+
+def to_datetime(series):
+    # epoch ms -> naive local datetimes, vectorized and without parsing strings
+    local_tz = datetime.now().astimezone().tzinfo
+    return pd.to_datetime(series, unit='ms', utc=True).dt.tz_convert(local_tz).dt.tz_localize(None)
@@ -0,0 +1,209 @@
+import socket
+import struct
+from urllib.parse import urlparse
+
+from src.data.registry import registry
+
+# agent -> ingest server framing. every frame is a fixed header followed by its payload:
+#   magic 'SM', version, frame type, payload length (network byte order)
+# a HELLO frame names the host of the connection, BATCH frames carry rows of any number of
+# families, each as a block:
+#   family name length (u8), family name, row count (u32), block length in bytes (u32), rows
+# rows are little-endian structs derived from the registry declaration of the family:
+#   timestamp (i64), null mask (u32), numeric fields (f64 / i64), then for every text field
+#   (the entity name first for breakdown families) a u16 length and its utf-8 bytes
+MAGIC = b'SM'
+# bumped whenever the row layout changes (v2: interval_ms), a server drops agents of another version
+VERSION = 2
+HEADER = struct.Struct('!2sBBI')
+HELLO, BATCH = 1, 2
+# largest payload a server accepts, the length comes from an untrusted header.
+# a batch of AGENT_BATCH_SIZE rows is a few hundred KB at most
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+_BLOCK = struct.Struct('<II')
+_TEXT_LENGTH = struct.Struct('<H')
+_NUMERIC_CODES = {'REAL': 'd', 'INTEGER': 'q'}
+
+
+class FrameError(ValueError):
+    pass
+
+
+def parse_address(address):
+    # 'tcp://host:port' or 'unix:///path/to/socket' -> (socket family, address)
+    url = urlparse(address)
+    if url.scheme == 'tcp':
+        if not url.hostname or url.port is None:
+            raise ValueError(f'Invalid tcp address: {address}')
+        return socket.AF_INET, (url.hostname, url.port)
+    if url.scheme == 'unix' and url.path:
+        return socket.AF_UNIX, url.path
+    raise ValueError(f'Unsupported address: {address} (use tcp://host:port or unix:///path)')
+
+
+class RowCodec:
+    # packs and unpacks the rows of one family, the layout is derived from its fields
+    def __init__(self, family):
+        self.family = family
+        self.numeric = [f.name for f in family.fields if f.type in _NUMERIC_CODES]
+        self.text = (['entity'] if family.entity_kind else []) + [f.name for f in family.fields if f.type == 'TEXT']
+        self.fixed = struct.Struct('<qI' + ''.join(_NUMERIC_CODES[f.type] for f in family.fields
+                                                  if f.type in _NUMERIC_CODES))
+        # bit i of the null mask is field i of numeric + text
+        self._names = self.numeric + self.text
+        if len(self._names) > 32:
+            raise ValueError(f'{family.name} has too many fields for the wire format')
+
+    def encode(self, rows):
+        parts = []
+        for row in rows:
+            mask = 0
+            values = []
+            for i, name in enumerate(self.numeric):
+                value = row.get(name)
+                if value is None:
+                    mask |= 1 << i
+                    value = 0
+                values.append(value)
+            texts = []
+            for i, name in enumerate(self.text, len(self.numeric)):
+                value = row.get(name)
+                if value is None:
+                    mask |= 1 << i
+                    value = ''
+                texts.append(str(value).encode())
+            parts.append(self.fixed.pack(row['timestamp'], mask, *values))
+            for text in texts:
+                parts.append(_TEXT_LENGTH.pack(len(text)))
+                parts.append(text)
+        return b''.join(parts)
+
+    def decode(self, buffer, count):
+        # buffer holds exactly count rows
+        if not self.text:
+            # fixed-size rows, unpacked in one pass
+            if len(buffer) != count * self.fixed.size:
+                raise FrameError(f'{self.family.name} block has the wrong size')
+            return [self._row(values) for values in self.fixed.iter_unpack(buffer)]
+
+        rows = []
+        offset = 0
+        for _ in range(count):
+            values = self.fixed.unpack_from(buffer, offset)
+            offset += self.fixed.size
+            row = self._row(values)
+            for i, name in enumerate(self.text, len(self.numeric)):
+                length, = _TEXT_LENGTH.unpack_from(buffer, offset)
+                offset += _TEXT_LENGTH.size
+                row[name] = None if values[1] >> i & 1 else bytes(buffer[offset:offset + length]).decode()
+                offset += length
+            rows.append(row)
+        if offset != len(buffer):
+            raise FrameError(f'{self.family.name} block has the wrong size')
+        return rows
+
+    def _row(self, values):
+        timestamp, mask = values[0], values[1]
+        row = dict(zip(self.numeric, values[2:]))
+        row['timestamp'] = timestamp
+        if mask:
+            for i, name in enumerate(self.numeric):
+                if mask >> i & 1:
+                    row[name] = None
+        return row
+
+
+_codecs = {}
+
+
+def codec(family_name):
+    if family_name not in _codecs:
+        _codecs[family_name] = RowCodec(registry.get(family_name))
+    return _codecs[family_name]
+
+
+def frame(frame_type, payload):
+    if len(payload) > MAX_FRAME_SIZE:
+        raise FrameError(f'Frame of {len(payload)} bytes is over MAX_FRAME_SIZE')
+    return HEADER.pack(MAGIC, VERSION, frame_type, len(payload)) + payload
+
+
+def encode_hello(host):
+    return frame(HELLO, host.encode())
+
+
+def encode_batch(blocks):
+    # blocks: {family name: [row, ...]}
+    parts = []
+    for family_name, rows in blocks.items():
+        if not rows:
+            continue
+        name = family_name.encode()
+        body = codec(family_name).encode(rows)
+        parts += [bytes([len(name)]), name, _BLOCK.pack(len(rows), len(body)), body]
+    return frame(BATCH, b''.join(parts))
+
+
+def decode_hello(payload):
+    try:
+        return bytes(payload).decode()
+    except UnicodeDecodeError as e:
+        raise FrameError(f'Malformed HELLO frame: {e}') from e
+
+
+def decode_batch(payload):
+    # -> [(family name, rows)]. blocks of families this side doesn't know are skipped.
+    # anything malformed in the payload raises FrameError
+    try:
+        return _decode_blocks(payload)
+    except (struct.error, UnicodeDecodeError, IndexError) as e:
+        raise FrameError(f'Malformed BATCH frame: {e}') from e
+
+
+def _decode_blocks(payload):
+    view = memoryview(payload)
+    blocks = []
+    offset = 0
+    while offset < len(view):
+        length = view[offset]
+        name = bytes(view[offset + 1:offset + 1 + length]).decode()
+        offset += 1 + length
+        count, size = _BLOCK.unpack_from(view, offset)
+        offset += _BLOCK.size
+        body = view[offset:offset + size]
+        offset += size
+        try:
+            family_codec = codec(name)
+        except KeyError:
+            continue
+        blocks.append((name, family_codec.decode(body, count)))
+    return blocks
+
+
+def _read_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return buffer
+
+
+def read_frame(sock):
+    # -> (frame type, payload), None once the peer closed the connection
+    header = _read_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    magic, version, frame_type, length = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise FrameError(f'Unexpected frame header {magic!r} v{version}')
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f'Frame of {length} bytes is over MAX_FRAME_SIZE')
+    payload = _read_exactly(sock, length) if length else bytearray()
+    if payload is None:
+        return None
+    return frame_type, payload
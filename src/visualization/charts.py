@@ -1,39 +1,57 @@
-import plotly.express as px
 import plotly.graph_objects as go 
 from plotly.subplots import make_subplots
-from anytree import Node, PreOrderIter
-from anytree.exporter import DictExporter
-import streamlit as st
-
-def convert_bytes(x, to_unit: str):
-    units = {
-        'B': 1,
-        'KB': 1024,
-        'MB': 1024**2,
-        'GB': 1024**3
-    }
-    return x / units[to_unit]
+
+from config.settings import CHART_MAX_POINTS, CHART_DOWNSAMPLE_METHOD, PROCESS_TOP_N
+from src.visualization.downsample import downsample
+from src.visualization.figure_cache import trace_meta
+from src.data.instrumentation import timed
+from src.visualization.transforms import (
+    convert_bytes, prepare_memory_composition, prepare_memory_swap, summarize_overhead, MEMORY_COMPOSITION_COLUMNS
+)
+
+ALERT_COLORS = {
+    'critical': 'red',
+    'warning': 'orange',
+    'info': 'royalblue'
+}
+
+MEMORY_COMPOSITION_COLORS = {
+    'memory_used': 'red',
+    'memory_cached': 'blue',
+    'memory_buffers': 'green',
+    'memory_available': 'gray'
+}
 
 class ChartGenerator:
+
+    @staticmethod
+    def _downsample(df, col, max_points):
+        # bounds the points shipped to the browser per trace, spikes are kept
+        return downsample(df['timestamp'], df[col], max_points, CHART_DOWNSAMPLE_METHOD)
     
     @staticmethod
-    def create_cpu_memory_chart(df):
+    @timed
+    def create_cpu_memory_chart(df, max_points=CHART_MAX_POINTS):
         fig = make_subplots(specs=[[{"secondary_y": True}]])
 
+        x, y = ChartGenerator._downsample(df, 'cpu_percent', max_points)
         fig.add_trace(
             go.Scatter(
-                x=df['timestamp'], 
-                y=df['cpu_percent'], 
-                name='CPU Usage'
+                x=x, 
+                y=y, 
+                name='CPU Usage',
+                meta=trace_meta('cpu_percent')
             ), 
             secondary_y=False
         )
 
+        x, y = ChartGenerator._downsample(df, 'memory_percent', max_points)
         fig.add_trace(
             go.Scatter(
-                x=df['timestamp'],
-                y=df['memory_percent'], 
-                name='Memory Usage'
+                x=x,
+                y=y, 
+                name='Memory Usage',
+                meta=trace_meta('memory_percent')
             ), 
             secondary_y=True
         )
@@ -48,20 +66,74 @@ class ChartGenerator:
         return fig
 
     @staticmethod
-    def create_network_chart(df):
+    @timed
+    def create_metric_chart(df, family, max_points=CHART_MAX_POINTS):
+        # one line per declared field, for registry families without a dedicated chart
         fig = make_subplots()
+        for col in family.metric_columns:
+            if col not in df.columns or df[col].isna().all():
+                continue
+            x, y = ChartGenerator._downsample(df, col, max_points)
+            fig.add_trace(go.Scatter(x=x, y=y, name=col.replace('_', ' ').capitalize(), meta=trace_meta(col)))
+
+        fig.update_layout(title=f'{family.title} Over Time', xaxis_title='Time')
+        return fig
+
+    @staticmethod
+    @timed
+    def create_summary_chart(df, metrics, title):
+        # bucketed aggregates of DataStorage.aggregate(): the average of every bucket, in the
+        # band between its min and max so peaks stay visible over long ranges
+        fig = make_subplots()
+        for metric in metrics:
+            name = metric.replace('_', ' ').capitalize()
+            if f'{metric}_min' in df.columns and f'{metric}_max' in df.columns:
+                fig.add_trace(go.Scatter(x=df['timestamp'], y=df[f'{metric}_max'], line=dict(width=0),
+                                         showlegend=False, hoverinfo='skip', legendgroup=metric))
+                fig.add_trace(go.Scatter(x=df['timestamp'], y=df[f'{metric}_min'], line=dict(width=0),
+                                         fill='tonexty', name=f'{name} (min-max)', legendgroup=metric))
+            fig.add_trace(go.Scatter(x=df['timestamp'], y=df[f'{metric}_avg'], name=name, legendgroup=metric))
+
+        fig.update_layout(title=title, xaxis_title='Time')
+        return fig
+
+    @staticmethod
+    @timed
+    def create_breakdown_chart(df, family, column=None, max_points=CHART_MAX_POINTS):
+        # one line per entity (core, device, interface, mountpoint) of a long-format family
+        column = column or family.columns[0]
+        fig = make_subplots()
+        for entity, group in df.groupby('entity', sort=True):
+            x, y = ChartGenerator._downsample(group, column, max_points)
+            fig.add_trace(go.Scatter(x=x, y=y, name=entity))
+
+        fig.update_layout(
+            title=f'{family.title} Over Time',
+            xaxis_title='Time',
+            yaxis_title=column.replace('_', ' ').capitalize()
+        )
+        return fig
+
+    @staticmethod
+    @timed
+    def create_network_chart(df, max_points=CHART_MAX_POINTS):
+        fig = make_subplots()
+        x, y = ChartGenerator._downsample(df, 'network_bytes_sent', max_points)
         fig.add_trace(go.Scatter(
-            x = df['timestamp'], 
-            y = df['network_bytes_sent'],
+            x = x, 
+            y = y,
             name = 'Network Bytes Sent',
-            mode = 'lines+markers'
+            mode = 'lines+markers',
+            meta = trace_meta('network_bytes_sent')
         ))
         
+        x, y = ChartGenerator._downsample(df, 'network_bytes_recv', max_points)
         fig.add_trace(go.Scatter(
-            x = df['timestamp'], 
-            y = df['network_bytes_recv'],
+            x = x, 
+            y = y,
             name = 'Network Bytes Received',
-            mode = 'lines+markers'
+            mode = 'lines+markers',
+            meta = trace_meta('network_bytes_recv')
         ))
 
         fig.update_layout(title='Network Usage Over Time', yaxis_type='log')
@@ -69,59 +141,69 @@ class ChartGenerator:
         return fig
 
     @staticmethod
-    def create_memory_composition_chart(df, unit='MB'):
+    @timed
+    def create_memory_composition_chart(df, unit='MB', max_points=CHART_MAX_POINTS):
  
-        df_converted = df.copy()
-        memory_columns = ['memory_used', 'memory_cached', 'memory_buffers', 'memory_available']
-        
-        for col in memory_columns:
-            df_converted[col] = df_converted[col].apply(lambda x: convert_bytes(x, unit))
+        df_converted = prepare_memory_composition(df, unit)
 
-        fig = px.area(
-            df_converted, 
-            x='timestamp', 
-            y=memory_columns,
+        # stacked areas, one trace per memory column. each column keeps its own points, the
+        # stack interpolates the others where they have none
+        fig = go.Figure()
+        for col in MEMORY_COMPOSITION_COLUMNS:
+            x, y = ChartGenerator._downsample(df_converted, col, max_points)
+            fig.add_trace(go.Scatter(
+                x=x,
+                y=y,
+                name=col,
+                mode='lines',
+                stackgroup='one',
+                stackgaps='interpolate',
+                line=dict(color=MEMORY_COMPOSITION_COLORS[col]),
+                meta=trace_meta(col, unit)
+            ))
+
+        fig.update_layout(
             title=f'Memory Usage Composition Over Time ({unit})',
-            labels={
-                'value': f'Memory ({unit})', 
-                'variable': 'Type'
-            },
-            color_discrete_map={
-                'memory_used': 'red',
-                'memory_cached': 'blue',
-                'memory_buffers': 'green',
-                'memory_available': 'gray'
-            }
+            xaxis_title='timestamp',
+            yaxis_title=f'Memory ({unit})',
+            legend_title_text='Type'
         )
         
         return fig
     @staticmethod
-    def create_system_io_wait_char(df):
+    @timed
+    def create_system_io_wait_char(df, max_points=CHART_MAX_POINTS):
         fig = go.Figure()
 
+        x, y = ChartGenerator._downsample(df, 'read_io_bytes_per_sec', max_points)
         fig.add_trace(go.Scatter(
-            x=df['timestamp'], 
-            y=df['read_io_bytes_per_sec'],
+            x=x, 
+            y=y,
             name='Read IO',
             mode='lines',
+            meta=trace_meta('read_io_bytes_per_sec'),
             fill='tozeroy', 
             line=dict(color='blue') 
         ))
+        x, y = ChartGenerator._downsample(df, 'write_io_bytes_per_sec', max_points)
         fig.add_trace(go.Scatter(
-            x=df['timestamp'], 
-            y=df['write_io_bytes_per_sec'],
+            x=x, 
+            y=y,
             name='Write IO',
             mode='lines',
+            meta=trace_meta('write_io_bytes_per_sec'),
             fill='tozeroy',
             line=dict(color='red')
         ))
 
         # line gragh to represent Busy percentage
+        x, y = ChartGenerator._downsample(df, 'busy_percentage', max_points)
         fig.add_trace(go.Scatter(
-            x=df['timestamp'], 
-            y=df['busy_percentage'],
+            x=x, 
+            y=y,
             name='Busy %',
             mode='lines',
+            meta=trace_meta('busy_percentage'),
             line=dict(color='green', dash='dash'),
             yaxis='y2',  # second Y-axis
         ))
@@ -144,53 +226,66 @@ class ChartGenerator:
 
 
     @staticmethod
-    @st.fragment
-    def create_memory_swap_comparison_chart(df, unit='MB'):
-        def convert_bytes(x, to_unit):
-            units = {
-                'B': 1,
-                'KB': 1024,
-                'MB': 1024**2,
-                'GB': 1024**3
-            }
-            return x / units[to_unit]
-
-        df_converted = df.copy()
-        memory_columns = ['memory_used', 'memory_total', 'swap_used', 'swap_total']
-        
-        for col in memory_columns:
-            df_converted[col] = df_converted[col].apply(lambda x: convert_bytes(x, unit))
+    @timed
+    def create_top_process_chart(df, n=PROCESS_TOP_N):
+        # one horizontal bar panel per resource, each with its own top n
+        panels = [
+            ('CPU (%)', df['cpu_percent']),
+            ('Memory RSS (MB)', convert_bytes(df['memory_rss'], 'MB')),
+            ('IO (MB/sec)', convert_bytes(df['read_bytes_per_sec'] + df['write_bytes_per_sec'], 'MB')),
+        ]
+        labels = df['name'].astype(str) + ' (' + df['pid'].astype(str) + ')'
+
+        fig = make_subplots(rows=1, cols=len(panels), subplot_titles=[title for title, _ in panels])
+        for col, (title, values) in enumerate(panels, start=1):
+            top = values.nlargest(n).iloc[::-1]
+            fig.add_trace(
+                go.Bar(x=top, y=labels[top.index], orientation='h', name=title, showlegend=False),
+                row=1, col=col
+            )
+
+        fig.update_layout(title='Top Processes')
+        return fig
+
+    @staticmethod
+    @timed
+    def create_memory_swap_comparison_chart(df, unit='MB', max_points=CHART_MAX_POINTS):
+        df_converted = prepare_memory_swap(df, unit)
 
         fig = make_subplots(specs=[[{"secondary_y": True}]])
         
-        df_converted['memory_usage_percent'] = (df_converted['memory_used'] / df_converted['memory_total']) * 100
-        
         # primary y-axis: memory usage
+        x, y = ChartGenerator._downsample(df_converted, 'memory_used', max_points)
         fig.add_trace(
             go.Scatter(
-                x=df_converted['timestamp'], 
-                y=df_converted['memory_used'], 
-                name=f"Memory Used ({unit})"
+                x=x, 
+                y=y, 
+                name=f"Memory Used ({unit})",
+                meta=trace_meta('memory_used', unit)
             ),
             secondary_y=False,
         )
         
         # secondary y-aix: swap usage
+        x, y = ChartGenerator._downsample(df_converted, 'swap_used', max_points)
         fig.add_trace(
             go.Scatter(
-                x=df_converted['timestamp'], 
-                y=df_converted['swap_used'], 
-                name=f"Swap Used ({unit})"
+                x=x, 
+                y=y, 
+                name=f"Swap Used ({unit})",
+                meta=trace_meta('swap_used', unit)
             ),
             secondary_y=True,
         )
 
         # third y-axis: memory usage percentage
+        x, y = ChartGenerator._downsample(df_converted, 'memory_usage_percent', max_points)
         fig.add_trace(
             go.Scatter(
-                x=df_converted['timestamp'],
-                y=df_converted['memory_usage_percent'],
-                name="Memory Usage Percent (%)"
+                x=x, 
+                y=y, 
+                name="Memory Usage Percent (%)",
+                meta=trace_meta('memory_used', of='memory_total')
             )
         )
         
@@ -203,53 +298,68 @@ class ChartGenerator:
         return fig
 
     @staticmethod
-    def create_process_tree(processes):
-        root = None
-        for pid, data in processes.items():
-            if data['ppid'] not in processes or pid == data['ppid']:
-                # This is the root process or a process without a parent
-                root = data['node']
-            elif data['ppid'] in processes:
-                data['node'].parent = processes[data['ppid']]['node']
-        
-        if root is None:
-            # If no root was found, use the process with the lowest PID as root
-            root = min(processes.values(), key=lambda x: x['node'].pid)['node']
-        
-        return root
+    @timed
+    def create_process_chart(processes):
+        # processes is a ProcessTable, sankey node i is process i
+        source, target, value = processes.sankey_links()
+        node_colors = ["lightgreen" if children else "lightblue" for children in processes.children]
 
-    @staticmethod
-    def create_process_chart(root):
-        node_labels = []
-        node_colors = []
-        source = []
-        target = []
-        value = []
-
-        for i, node in enumerate(PreOrderIter(root)):
-            node_labels.append(f"{node.name}")
-            node_colors.append("lightblue" if node.is_leaf else "lightgreen")
-            
-            if node.parent:
-                parent_index = node_labels.index(f"{node.parent.name}")
-                source.append(parent_index)
-                target.append(i)
-                value.append(1)
-
-        fig = go.Figure(data=[go.Sankey(
+        # the arrays are built by ProcessTable, skipping plotly's per-element validation
+        # (mostly the node colors) keeps this linear and fast with thousands of processes
+        fig = go.Figure(data=[dict(
+            type = 'sankey',
             node = dict(
             pad = 15,
             thickness = 20,
             line = dict(color = "black", width = 0.5),
-            label = node_labels,
+            label = processes.labels(),
             color = node_colors
             ),
             link = dict(
             source = source,
             target = target,
             value = value
-        ))])
+        ))], _validate=False)
 
         fig.update_layout(title_text="Process Hierarchy", font_size=10)
         return fig
-    
+
+    @staticmethod
+    @timed
+    def create_overhead_chart(df):
+        # time the monitor spends in its own hot paths, per timed call
+        summary = summarize_overhead(df)
+        labels = summary['source'] + ': ' + summary['name']
+
+        fig = go.Figure()
+        fig.add_trace(go.Bar(y=labels, x=summary['mean_ms'], name='Mean (ms)', orientation='h'))
+        fig.add_trace(go.Bar(y=labels, x=summary['p95_ms'], name='p95 (ms)', orientation='h'))
+        fig.update_layout(
+            title='Monitor Overhead',
+            xaxis_title='Latency per call (ms)',
+            yaxis=dict(autorange='reversed'),
+            barmode='group',
+            height=max(300, 22 * len(summary) + 120)
+        )
+        return fig
+
+    @staticmethod
+    def annotate_alerts(fig, spans):
+        # shades every alert episode (see transforms.alert_spans) and labels it with its rule.
+        # the alert shapes of an earlier call are replaced, so a cached figure can be
+        # annotated again on every refresh
+        shapes = [shape for shape in fig.layout.shapes if shape.name != 'alert']
+        annotations = [a for a in fig.layout.annotations if a.name != 'alert']
+        for span in spans.itertuples(index=False):
+            color = ALERT_COLORS.get(span.severity, 'gray')
+            shapes.append(dict(
+                type='rect', name='alert', xref='x', yref='paper', x0=span.start, x1=span.end, y0=0, y1=1,
+                fillcolor=color, opacity=0.15, line_width=0, layer='below'
+            ))
+            annotations.append(dict(
+                name='alert', xref='x', yref='paper', x=span.start, y=1, text=span.rule, hovertext=span.message,
+                showarrow=False, xanchor='left', yanchor='bottom', font=dict(color=color, size=10)
+            ))
+        fig.layout.shapes = shapes
+        fig.layout.annotations = annotations
+        return fig
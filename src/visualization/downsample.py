@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[ns]').astype(np.int64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, per bucket, the
+    # point forming the largest triangle with the previously kept point and the average of
+    # the next bucket. spikes make large triangles, so they survive the reduction.
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = np.nan_to_num(_as_float(y))
+
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def minmax_indices(y, n_out):
+    # min and max of every bucket, in their original order. cheaper than LTTB and keeps
+    # both the peaks and the dips of every bucket
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    y = np.nan_to_num(_as_float(y))
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = y[start:end]
+            indices.extend(sorted({start + int(np.argmin(bucket)), start + int(np.argmax(bucket))}))
+    return np.asarray(indices, dtype=np.int64)
+
+
+def downsample(x, y, max_points, method='lttb'):
+    # returns (x, y) with at most max_points points, unchanged when already small enough
+    if max_points is None or len(y) <= max_points:
+        return x, y
+
+    if method == 'lttb':
+        indices = lttb_indices(x, y, max_points)
+    elif method == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        raise ValueError(f'Unknown downsampling method: {method}')
+    return np.asarray(x)[indices], np.asarray(y)[indices]
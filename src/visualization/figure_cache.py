@@ -0,0 +1,104 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from config.settings import FIGURE_CACHE_SIZE, FIGURE_PATCH_MAX_POINTS
+from src.visualization.transforms import convert_bytes, percent_of
+
+
+def _chart(key):
+    # (kind, table, version, window, unit) -> (kind, table, window, unit)
+    return key[:2] + key[3:]
+
+
+def trace_meta(column, unit=None, of=None):
+    # attached to a time-series trace so FigureCache can extend it with new rows of the
+    # source frame: the column it plots and, for byte columns, the unit it is shown in.
+    # of: the trace is column as a percentage of that other column
+    meta = {'column': column}
+    if unit is not None:
+        meta['unit'] = unit
+    if of is not None:
+        meta['of'] = of
+    return meta
+
+
+class FigureCache:
+    # figures memoized on (kind, table, version, window, unit), where version is the change
+    # counter of the table (last row id or ring sequence). the least recently used entries
+    # are evicted past maxsize. when the version moved by only a few appended rows, the
+    # previous figure of the same chart is patched by extending its traces instead of rebuilt
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE, patch_max_points=FIGURE_PATCH_MAX_POINTS):
+        self.maxsize = maxsize
+        self.patch_max_points = patch_max_points
+        self._entries = OrderedDict()
+        # latest version per chart, the entry a patch starts from
+        self._latest = {}
+        self.hits = self.patches = self.builds = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def figure(self, kind, table, version, load, build, window=None, unit=None):
+        # load() returns the source frame (only called on a miss), build(df) the new figure
+        key = (kind, table, version, window, unit)
+        entry = self._entries.get(key)
+        if entry is not None and version is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        df = load()
+        if df is None or df.empty:
+            return None
+
+        chart = _chart(key)
+        fig = self._patch(chart, df)
+        if fig is None:
+            fig = build(df)
+            self.builds += 1
+        else:
+            self.patches += 1
+
+        self._entries[key] = (fig, df['timestamp'].iloc[-1], len(df))
+        self._latest[chart] = key
+        while len(self._entries) > self.maxsize:
+            evicted, _ = self._entries.popitem(last=False)
+            if self._latest.get(_chart(evicted)) == evicted:
+                del self._latest[_chart(evicted)]
+        return fig
+
+    def _patch(self, chart, df):
+        previous = self._latest.get(chart)
+        if previous is None or previous not in self._entries:
+            return None
+        fig, last_timestamp, rows = self._entries[previous]
+        if not fig.data:
+            return None
+
+        appended = df[df['timestamp'] > last_timestamp]
+        if appended.empty or len(appended) > self.patch_max_points or len(appended) >= len(df):
+            return None
+        # only plain time series are patched: every trace knows its column and holds every
+        # row (not downsampled)
+        for trace in fig.data:
+            if not trace.meta or 'column' not in trace.meta or len(trace.x) != rows:
+                return None
+
+        # the entry moves to the new version, the figure is updated in place
+        del self._entries[previous]
+        keep = len(df)
+        new_x = appended['timestamp'].to_numpy()
+        for trace in fig.data:
+            values = appended[trace.meta['column']].to_numpy(dtype=np.float64)
+            if 'unit' in trace.meta:
+                values = convert_bytes(values, trace.meta['unit'])
+            if 'of' in trace.meta:
+                values = percent_of(values, appended[trace.meta['of']].to_numpy(dtype=np.float64))
+            trace.x = np.concatenate([np.asarray(trace.x), new_x])[-keep:]
+            trace.y = np.concatenate([np.asarray(trace.y, dtype=np.float64), values])[-keep:]
+        return fig
+
+    def clear(self):
+        self._entries.clear()
+        self._latest.clear()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+UNITS = {
+    'B': 1,
+    'KB': 1024,
+    'MB': 1024**2,
+    'GB': 1024**3
+}
+
+MEMORY_COMPOSITION_COLUMNS = ['memory_used', 'memory_cached', 'memory_buffers', 'memory_available']
+MEMORY_SWAP_COLUMNS = ['memory_used', 'memory_total', 'swap_used', 'swap_total']
+
+
+def convert_bytes(x, to_unit: str):
+    # works the same on scalars, numpy arrays and pandas columns
+    return x / UNITS[to_unit]
+
+
+def scale_columns(df, columns, unit, keep=('timestamp',)):
+    # new frame holding only the kept columns (shared, not copied) and the byte columns
+    # converted to unit with one numpy division per column
+    factor = UNITS[unit]
+    data = {col: df[col] for col in keep if col in df.columns}
+    for col in columns:
+        data[col] = df[col].to_numpy(dtype=np.float64) / factor
+    return pd.DataFrame(data, index=df.index, copy=False)
+
+
+def percent_of(part, whole):
+    # element-wise part / whole * 100, 0 where whole is 0
+    part = np.asarray(part, dtype=np.float64)
+    whole = np.asarray(whole, dtype=np.float64)
+    return np.divide(part, whole, out=np.zeros_like(part), where=whole != 0) * 100
+
+
+def prepare_memory_composition(df, unit='MB'):
+    return scale_columns(df, MEMORY_COMPOSITION_COLUMNS, unit)
+
+
+def prepare_memory_swap(df, unit='MB'):
+    prepared = scale_columns(df, MEMORY_SWAP_COLUMNS, unit)
+    prepared['memory_usage_percent'] = percent_of(prepared['memory_used'], prepared['memory_total'])
+    return prepared
+
+
+def summarize_overhead(df):
+    # monitor_overhead intervals -> one row per (source, name): calls, mean/p95/max latency
+    # in ms and the total time spent, slowest first
+    grouped = df.groupby(['source', 'name'], sort=False)
+    summary = grouped.agg(
+        calls=('count', 'sum'), total_ms=('total_ms', 'sum'), p95_ms=('p95_ms', 'max'), max_ms=('max_ms', 'max')
+    ).reset_index()
+    summary['mean_ms'] = summary['total_ms'] / summary['calls'].where(summary['calls'] > 0)
+    return summary.sort_values('total_ms', ascending=False, ignore_index=True)
+
+
+def alert_spans(events, start=None, end=None):
+    # alert_events rows (firing / resolved transitions, any order) -> one row per alert episode
+    # with its start and end. episodes are clipped to start (the ones over by then are left
+    # out), one still firing runs until end
+    columns = ['rule', 'family', 'severity', 'message', 'start', 'end', 'active']
+    if events.empty:
+        return pd.DataFrame(columns=columns)
+
+    spans, open_spans = [], {}
+    for event in events.sort_values('timestamp').itertuples(index=False):
+        if event.state == 'firing':
+            open_spans[event.rule] = event
+        elif event.state == 'resolved':
+            fired = open_spans.pop(event.rule, None)
+            if fired is not None:
+                spans.append(_span(fired, fired.timestamp, event.timestamp, False))
+            else:
+                spans.append(_span(event, event.timestamp if start is None else start, event.timestamp, False))
+    for fired in open_spans.values():
+        spans.append(_span(fired, fired.timestamp, end, True))
+
+    spans = pd.DataFrame(spans, columns=columns)
+    if start is not None:
+        spans = spans[spans['active'] | (spans['end'] > start)].reset_index(drop=True)
+        spans['start'] = spans['start'].clip(lower=start)
+    return spans
+
+
+def _span(event, start, end, active):
+    return (event.rule, event.family, event.severity, event.message, start, end, active)
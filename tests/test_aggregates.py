@@ -0,0 +1,143 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.data.aggregates import _ApproxQuantile, aggregate_frame, percentile, register_functions
+from src.data.storage import DataStorage
+
+# an hour boundary, so the rollup buckets line up with the test ranges
+BASE = 1_699_999_200_000
+
+
+class TestAggregateFunctions(unittest.TestCase):
+    def test_latest_and_quantile_in_sqlite(self):
+        conn = sqlite3.connect(':memory:')
+        register_functions(conn)
+        conn.execute('CREATE TABLE t (timestamp INTEGER, value REAL)')
+        conn.executemany('INSERT INTO t VALUES (?, ?)', [(3, 30.0), (1, 10.0), (2, None), (4, 20.0)])
+        latest, median = conn.execute('SELECT latest(timestamp, value), approx_quantile(value, 0.5) FROM t').fetchone()
+        self.assertEqual(latest, 20.0)
+        self.assertEqual(median, 20.0)
+
+    def test_quantile_sample_is_bounded(self):
+        with mock.patch('src.data.aggregates.AGGREGATE_SAMPLE_SIZE', 500):
+            quantile = _ApproxQuantile()
+            for value in range(100_000):
+                quantile.step(float(value), 0.95)
+        self.assertEqual(len(quantile.sample), 500)
+        self.assertAlmostEqual(quantile.finalize(), 95_000, delta=3_000)
+
+    def test_frame_average_is_weighted_by_interval(self):
+        df = pd.DataFrame({
+            'timestamp': [0, 30_000, 30_500, 31_000],
+            'cpu_percent': [10.0, 90.0, 90.0, np.nan],
+            'interval_ms': [30_000, 500, 500, 500],
+        })
+        result = aggregate_frame(df, ['cpu_percent'], ['avg', 'count'], 60_000)
+        self.assertAlmostEqual(result['cpu_percent_avg'].iloc[0], (10 * 30 + 90 * 1) / 31)
+        self.assertEqual(result['cpu_percent_count'].iloc[0], 3)
+
+    def test_percentile_names(self):
+        self.assertEqual(percentile('p95'), 0.95)
+        self.assertAlmostEqual(percentile('p99.9'), 0.999)
+        self.assertIsNone(percentile('avg'))
+        self.assertIsNone(percentile('p101'))
+
+
+class TestStorageAggregate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = DataStorage(db_path=Path(self.tmp.name) / 'test.db', archive_dir=None)
+        # two hours of one sample per second, cpu cycling 0..99
+        for i in range(7200):
+            self.storage.save('system', {
+                'timestamp': BASE + i * 1000, 'cpu_percent': float(i % 100), 'memory_percent': 50.0 + i // 3600,
+                'disk_usage': 70.0, 'network_bytes_sent': i, 'network_bytes_recv': i
+            })
+        self.storage.flush()
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_buckets_from_raw_rows(self):
+        df = self.storage.aggregate('system', ['cpu_percent', 'memory_percent'], BASE, BASE + 7_200_000,
+                                    bucket=3600, aggregates=['avg', 'max', 'count', 'last', 'p95'])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['timestamp']))
+        self.assertEqual(list(df['cpu_percent_avg']), [49.5, 49.5])
+        self.assertEqual(list(df['cpu_percent_count']), [3600, 3600])
+        self.assertEqual(list(df['cpu_percent_last']), [99.0, 99.0])
+        self.assertEqual(list(df['memory_percent_max']), [50.0, 51.0])
+        # from a sample of the 3600 rows of each bucket
+        np.testing.assert_allclose(df['cpu_percent_p95'], 95, atol=1.5)
+
+    def test_rollup_tiers_give_the_same_buckets(self):
+        args = ('system', ['cpu_percent'], BASE, BASE + 7_200_000)
+        aggregates = ['avg', 'min', 'max', 'count', 'last']
+        with mock.patch.object(self.storage, '_aggregate_tier', return_value=None):
+            raw = self.storage.aggregate(*args, bucket=600, aggregates=aggregates)
+        self.assertEqual(self.storage._aggregate_tier('system_metrics', ['cpu_percent'], aggregates, 600_000), '5m')
+        tiered = self.storage.aggregate(*args, bucket=600, aggregates=aggregates)
+        pd.testing.assert_frame_equal(raw, tiered, check_dtype=False)
+
+    def test_whole_range_and_points(self):
+        df = self.storage.aggregate('system', ['cpu_percent'], BASE + 3_600_000, BASE + 7_200_000)
+        self.assertEqual(len(df), 1)
+        self.assertEqual((df['cpu_percent_min'][0], df['cpu_percent_max'][0]), (0.0, 99.0))
+        # 2h in about 10 buckets: 12 minutes, widened to whole 5 minute rollup buckets
+        self.assertEqual(len(self.storage.aggregate('system', ['cpu_percent'], BASE, BASE + 7_200_000, points=10)), 8)
+        self.assertTrue(self.storage.aggregate('system', ['cpu_percent'], BASE - 10_000, BASE).empty)
+
+    def test_unaligned_since_keeps_the_partial_bucket(self):
+        since = BASE + 20_000
+        for bucket in (1, 60):
+            df = self.storage.aggregate('system', ['cpu_percent'], since, since + 6_000, bucket=bucket,
+                                        aggregates=['count'])
+            self.assertEqual(df['cpu_percent_count'].sum(), 6 if bucket == 1 else 60)
+        # the whole minute around since, from the 1m tier or the raw rows alike
+        args = ('system', ['cpu_percent'], since, since + 100_000)
+        with mock.patch.object(self.storage, '_aggregate_tier', return_value=None):
+            raw = self.storage.aggregate(*args, bucket=60)
+        tiered = self.storage.aggregate(*args, bucket=60)
+        self.assertEqual(len(tiered), 2)
+        pd.testing.assert_frame_equal(raw, tiered, check_dtype=False)
+
+    def test_rejects_unknown_metrics_and_aggregates(self):
+        with self.assertRaises(ValueError):
+            self.storage.aggregate('system', ['cpu_percent; DROP TABLE system_metrics'], BASE)
+        with self.assertRaises(ValueError):
+            self.storage.aggregate('system', ['cpu_percent'], BASE, aggregates=['median'])
+        with self.assertRaises(ValueError):
+            self.storage.aggregate('cpu_cores', ['busy_percent'], BASE)
+
+
+class TestArchivedAggregate(unittest.TestCase):
+    def test_raw_rows_are_merged_from_the_archive(self):
+        day = 24 * 3600 * 1000
+        # a partition boundary
+        start = 1_699_920_000_000
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = DataStorage(db_path=Path(tmp) / 'test.db', archive_dir=Path(tmp) / 'archive')
+            for i in range(12):
+                storage.save_to_db({
+                    'timestamp': start + i * 6 * 3600 * 1000, 'cpu_percent': float(i), 'memory_percent': 50.0,
+                    'disk_usage': 70.0, 'network_bytes_sent': 0, 'network_bytes_recv': 0
+                })
+            storage.archive(now=start + 2 * day + 1000)
+            storage.prune(now=start + 9 * day)
+
+            df = storage.aggregate('system', ['cpu_percent'], start, start + 3 * day, bucket=86400,
+                                   aggregates=['count', 'max', 'p50'])
+            storage.close()
+        self.assertEqual(list(df['cpu_percent_count']), [4, 4, 4])
+        self.assertEqual(list(df['cpu_percent_max']), [3.0, 7.0, 11.0])
+        self.assertEqual(list(df['cpu_percent_p50']), [1.5, 5.5, 9.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import random
+import unittest
+
+from src.data.alerts import AlertEngine, AlertRule, Ewma, RollingExtrema, Sustained
+
+
+class TestAlertState(unittest.TestCase):
+    def test_ewma_scores_outliers(self):
+        ewma = Ewma(alpha=0.1, warmup=10)
+        rng = random.Random(0)
+        scores = [ewma.update(50 + rng.uniform(-1, 1)) for _ in range(100)]
+        self.assertIsNone(scores[0])
+        self.assertTrue(all(abs(s) < 4 for s in scores[10:]))
+        self.assertGreater(ewma.update(90), 10)
+
+    def test_rolling_extrema_match_brute_force(self):
+        extrema = RollingExtrema(window_ms=5000)
+        rng = random.Random(1)
+        history = []
+        for i in range(200):
+            value = rng.uniform(0, 100)
+            history.append((i * 1000, value))
+            extrema.update(i * 1000, value)
+            window = [v for t, v in history if t > i * 1000 - 5000]
+            self.assertEqual(extrema.min, min(window))
+            self.assertEqual(extrema.max, max(window))
+        # a 5s window at one sample per second never holds more than 5 samples
+        self.assertLessEqual(len(extrema._min), 5)
+
+    def test_sustained_fires_once_and_resolves(self):
+        sustained = Sustained(duration_ms=2000)
+        transitions = [sustained.update(t * 1000, c) for t, c in enumerate([True, True, True, True, False, False])]
+        self.assertEqual(transitions, [None, None, 'firing', None, 'resolved', None])
+
+
+class TestAlertEngine(unittest.TestCase):
+    def test_sustained_threshold(self):
+        engine = AlertEngine([AlertRule('cpu_pegged', 'system', 'cpu_percent', 'above', 90, duration=10)])
+        events = []
+        for i, cpu in enumerate([95] * 15 + [20]):
+            events += engine.observe('system', {'timestamp': i * 1000, 'cpu_percent': cpu})
+        self.assertEqual([e['state'] for e in events], ['firing', 'resolved'])
+        self.assertEqual(events[0]['value'], 95)
+        self.assertEqual(engine.active(), [])
+
+    def test_rise_over_window(self):
+        engine = AlertEngine([AlertRule('swap_climbing', 'memory', 'swap_percent', 'rise', 10, window=60)])
+        events = []
+        for i in range(30):
+            events += engine.observe('memory', {'timestamp': i * 5000, 'swap_percent': i * 1.0})
+        # 10 points above the minimum of the last minute at the 11th sample
+        self.assertEqual([e['state'] for e in events], ['firing'])
+        self.assertEqual(engine.active(), ['swap_climbing'])
+
+    def test_missing_metric_and_other_families_are_ignored(self):
+        engine = AlertEngine()
+        self.assertEqual(engine.observe('system', {'timestamp': 0}), [])
+        self.assertEqual(engine.observe('disks', {'timestamp': 0, 'entities': []}), [])
+
+    def test_disabled(self):
+        engine = AlertEngine([AlertRule('cpu', 'system', 'cpu_percent', 'above', 0)], enabled=False)
+        self.assertEqual(engine.observe('system', {'timestamp': 0, 'cpu_percent': 50}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
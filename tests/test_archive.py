@@ -0,0 +1,107 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from src.data.storage import DataStorage
+
+DAY = 24 * 3600 * 1000
+# a partition boundary, so the three days below fall into three partitions
+START = 1_699_920_000_000
+
+
+class TestParquetArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archive_dir = Path(self.tmp.name) / 'archive'
+        self.storage = DataStorage(db_path=Path(self.tmp.name) / 'test.db', archive_dir=self.archive_dir)
+        # one sample every 6 hours over 3 days
+        for i in range(12):
+            self.storage.save_to_db({
+                'timestamp': START + i * 6 * 3600 * 1000,
+                'cpu_percent': float(i),
+                'memory_percent': 50.0,
+                'disk_usage': 70.0,
+                'network_bytes_sent': 1000,
+                'network_bytes_recv': 2000,
+            })
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_only_closed_partitions_are_sealed(self):
+        # "now" is inside the third day, so only the first two days are sealed
+        self.assertEqual(self.storage.archive(now=START + 2 * DAY + 1000), 2)
+        files = sorted((self.archive_dir / 'system_metrics').glob('*.parquet'))
+        self.assertEqual([int(f.stem) for f in files], [START, START + DAY])
+        self.assertEqual(pq.read_metadata(files[0]).num_rows, 4)
+
+        # nothing new to seal
+        self.assertEqual(self.storage.archive(now=START + 2 * DAY + 1000), 0)
+
+    def test_loads_merge_archive_and_sqlite(self):
+        self.storage.archive(now=START + 2 * DAY + 1000)
+        # the archived rows are gone from SQLite once past retention
+        self.storage.prune(now=START + 9 * DAY)
+
+        df = self.storage.load_data(limit=None, since=START)
+        self.assertEqual(list(df['cpu_percent']), [float(i) for i in reversed(range(12))])
+
+        # a range spanning both stores, with column projection
+        df = self.storage.load('system', limit=None, since=START + DAY, until=START + 2 * DAY + 12 * 3600 * 1000,
+                               columns=['cpu_percent'])
+        self.assertEqual(list(df.columns), ['timestamp', 'cpu_percent'])
+        self.assertEqual(list(df['cpu_percent']), [9.0, 8.0, 7.0, 6.0, 5.0, 4.0])
+
+        # the newest rows come from SQLite alone when they fill the limit
+        df = self.storage.load_data(limit=2)
+        self.assertEqual(list(df['cpu_percent']), [11.0, 10.0])
+
+    def test_late_rows_are_sealed_again(self):
+        self.storage.archive(now=START + 2 * DAY + 1000)
+        self.storage.prune(now=START + 9 * DAY)
+        # an agent's backlog arrives after its partition was sealed and pruned
+        self.storage.save_to_db({
+            'timestamp': START + 3600 * 1000, 'cpu_percent': 100.0, 'memory_percent': 50.0, 'disk_usage': 70.0,
+            'network_bytes_sent': 1000, 'network_bytes_recv': 2000,
+        })
+        self.storage.flush()
+        self.storage.prune(now=START + 9 * DAY)
+
+        self.assertEqual(self.storage.archive(now=START + 2 * DAY + 1000), 1)
+        self.assertEqual(pq.read_metadata(self.archive_dir / 'system_metrics' / f'{START}.parquet').num_rows, 5)
+        self.storage.prune(now=START + 9 * DAY)
+        df = self.storage.load_data(limit=None, since=START)
+        self.assertEqual(len(df), 13)
+        self.assertEqual(df['cpu_percent'].iloc[-2], 100.0)
+        # nothing left to seal again
+        self.assertEqual(self.storage.archive(now=START + 2 * DAY + 1000), 0)
+
+    def test_unarchived_rows_are_not_pruned(self):
+        self.storage.prune(now=START + 30 * DAY)
+        self.assertEqual(len(self.storage.load_data(limit=None)), 12)
+
+
+    def test_open_reader_sees_a_later_archive(self):
+        # the dashboard's storage stays open while the collector archives and prunes
+        self.storage.flush()
+        reader = DataStorage(db_path=Path(self.tmp.name) / 'test.db', archive_dir=self.archive_dir)
+        self.assertEqual(len(reader.load_data(limit=None, since=START)), 12)
+        self.storage.archive(now=START + 2 * DAY + 1000)
+        self.storage.prune(now=START + 9 * DAY)
+        self.assertEqual(len(reader.load_data(limit=None, since=START)), 12)
+        reader.close()
+
+    def test_partition_limit_is_per_table(self):
+        for i in range(3):
+            self.storage.save('host', {'timestamp': START + i * DAY, 'uptime_sec': 1.0, 'users': 1, 'process_count': 1})
+        self.storage.flush()
+        self.assertEqual(self.storage.archive(now=START + 3 * DAY, max_partitions=1), 2)
+        for table in ('system_metrics', 'host_metrics'):
+            self.assertEqual(len(list((self.archive_dir / table).glob('*.parquet'))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import tempfile
+import unittest
+from src.data.backends import ProcfsBackend, PsutilBackend, get_backend
+
+STAT = b'''cpu  100 0 50 800 25 0 5 20 0 0
+cpu0 100 0 50 800 25 0 5 20 0 0
+intr 0
+'''
+MEMINFO = b'''MemTotal:        1000 kB
+MemFree:          300 kB
+MemAvailable:     600 kB
+Buffers:           50 kB
+Cached:           200 kB
+SReclaimable:      20 kB
+SwapTotal:        400 kB
+SwapFree:         300 kB
+'''
+DISKSTATS = b'''   8       0 sda 10 0 100 5 20 0 200 7 0 30 12 0 0 0 0
+   8       1 sda1 10 0 100 5 20 0 200 7 0 30 12 0 0 0 0
+ 253       0 vdb 1 0 8 1 1 0 8 1 0 4 2 0 0 0 0
+'''
+NET_DEV = b'''Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0       0          0
+  eth0:5000      50    0    0    0     0          0         0      700       7    0    0    0     0       0          0
+'''
+
+@unittest.skipUnless(sys.platform.startswith('linux'), '/proc backend is linux only')
+class TestProcfsBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        os.makedirs(os.path.join(root, 'proc', 'net'))
+        os.makedirs(os.path.join(root, 'block', 'sda'))
+        os.makedirs(os.path.join(root, 'block', 'vdb'))
+        for name, content in [('stat', STAT), ('meminfo', MEMINFO), ('diskstats', DISKSTATS), ('net/dev', NET_DEV)]:
+            with open(os.path.join(root, 'proc', name), 'wb') as f:
+                f.write(content)
+        self.backend = ProcfsBackend(proc_root=os.path.join(root, 'proc'), sys_block=os.path.join(root, 'block'))
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_cpu_times(self):
+        times = self.backend.cpu_times()
+        ticks = os.sysconf('SC_CLK_TCK')
+        self.assertAlmostEqual(times.idle, 800 / ticks)
+        self.assertAlmostEqual(times.steal, 20 / ticks)
+
+    def test_disk_counters_skip_partitions(self):
+        disk = self.backend.disk_io_counters()
+        self.assertEqual(disk.read_bytes, 108 * 512)
+        self.assertEqual(disk.write_bytes, 208 * 512)
+        self.assertEqual(disk.busy_time, 34)
+
+    def test_net_counters(self):
+        net = self.backend.net_io_counters()
+        self.assertEqual(net.bytes_recv, 6000)
+        self.assertEqual(net.bytes_sent, 1700)
+
+    def test_per_entity_counters(self):
+        self.assertEqual(list(self.backend.cpu_times_percpu()), ['cpu0'])
+        disks = self.backend.disk_io_counters_perdisk()
+        self.assertEqual(set(disks), {'sda', 'vdb'})
+        self.assertEqual(disks['vdb'].read_bytes, 8 * 512)
+        nics = self.backend.net_io_counters_pernic()
+        self.assertEqual(nics['eth0'].bytes_recv, 5000)
+        self.assertEqual(nics['eth0'].bytes_sent, 700)
+
+    def test_memory(self):
+        mem = self.backend.virtual_memory()
+        self.assertEqual(mem.total, 1000 * 1024)
+        self.assertEqual(mem.cached, 220 * 1024)
+        self.assertEqual(mem.percent, 40.0)
+        swap = self.backend.swap_memory()
+        self.assertEqual(swap.used, 100 * 1024)
+        self.assertEqual(swap.percent, 25.0)
+
+    def test_memory_matches_psutil_formula(self):
+        # psutil 6.1 (requirements.txt) on the same meminfo: used = total - free - cached - buffers,
+        # available is MemAvailable
+        mem = self.backend.virtual_memory()
+        self.assertEqual(mem.used, (1000 - 300 - 220 - 50) * 1024)
+        self.assertEqual(mem.available, 600 * 1024)
+        self.assertEqual(mem.free, 300 * 1024)
+        self.assertEqual(mem.buffers, 50 * 1024)
+
+    def test_memory_used_never_negative(self):
+        # Cached larger than what MemTotal leaves (containers): used falls back to total - free
+        with open(os.path.join(self.tmp.name, 'proc', 'meminfo'), 'wb') as f:
+            f.write(MEMINFO.replace(b'Cached:           200 kB', b'Cached:           900 kB'))
+        root = self.tmp.name
+        backend = ProcfsBackend(proc_root=os.path.join(root, 'proc'), sys_block=os.path.join(root, 'block'))
+        try:
+            self.assertEqual(backend.virtual_memory().used, 700 * 1024)
+        finally:
+            backend.close()
+
+    def test_matches_psutil_on_this_host(self):
+        backend = ProcfsBackend()
+        try:
+            self.assertEqual(backend.virtual_memory().total, PsutilBackend().virtual_memory().total)
+            self.assertEqual(backend.disk_usage_percent('/'), PsutilBackend().disk_usage_percent('/'))
+        finally:
+            backend.close()
+
+class TestGetBackend(unittest.TestCase):
+    def test_psutil(self):
+        self.assertEqual(get_backend('psutil').name, 'psutil')
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            get_backend('nope')
+
+if __name__ == '__main__':
+    unittest.main()
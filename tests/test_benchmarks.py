@@ -0,0 +1,58 @@
+import json
+import sqlite3
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from benchmarks import run
+from config.settings import COUNTER_MIN_INTERVAL
+from benchmarks.synthetic import SyntheticBackend, bulk_load, synthetic_process_source
+from src.data.collector import SystemDataCollector
+from src.data.registry import registry
+
+
+class TestSyntheticSources(unittest.TestCase):
+    def test_collector_runs_on_synthetic_sources(self):
+        with synthetic_process_source(50):
+            collector = SystemDataCollector(backend=SyntheticBackend(cores=2, disks=1, nics=3))
+            collector.collect_process_metrics()
+            time.sleep(COUNTER_MIN_INTERVAL)
+            cores = collector.collect_cpu_cores()
+            processes = collector.collect_process_metrics()
+            system = collector.collect_system_data()
+
+        self.assertEqual([e['entity'] for e in cores['entities']], ['cpu0', 'cpu1'])
+        self.assertTrue(all(0 <= e['busy_percent'] <= 100 for e in cores['entities']))
+        self.assertTrue(processes['processes'])
+        self.assertGreater(system['network_bytes_recv'], 0)
+
+    def test_bulk_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / 'bench.db'
+            bulk_load(db_path, registry.get('system'), 250, chunk=100)
+            bulk_load(db_path, registry.get('disks'), 10, entities=5)
+            with sqlite3.connect(db_path) as conn:
+                self.assertEqual(conn.execute('SELECT COUNT(*) FROM system_metrics').fetchone()[0], 250)
+                # 2 ticks of 5 disks
+                self.assertEqual(conn.execute('SELECT COUNT(DISTINCT timestamp) FROM disk_metrics').fetchone()[0], 2)
+
+
+class TestBenchmarkReport(unittest.TestCase):
+    def test_report_is_json_and_comparable(self):
+        report = run.run(suites=['probes', 'loads'], sizes=[200], ticks=3, probe_processes=20, repeat=1)
+        report = json.loads(json.dumps(report))
+        self.assertIn('commit', report['machine'])
+        self.assertIn('p95_sec', report['results']['probes']['system'])
+        self.assertIn('latest_window_sec', report['results']['loads']['200'])
+        # every probe measured a full sample, not its too-soon early exit
+        probes = [family.name for family in registry if family.probe is not None]
+        self.assertTrue(all(report['results']['probes'][name]['rows'] > 0 for name in probes))
+
+        rows = run.compare(report, report)
+        self.assertTrue(rows)
+        self.assertTrue(all(ratio == 1.0 for *_, ratio in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import warnings
+import numpy as np
+import pandas as pd
+from src.data.buffer import RingBuffer
+
+def rows(start, stop):
+    return pd.DataFrame({'id': range(start, stop), 'cpu_percent': [float(i) for i in range(start, stop)]})
+
+class TestRingBuffer(unittest.TestCase):
+    def test_keeps_newest_rows_in_order(self):
+        buffer = RingBuffer(4)
+        buffer.extend(rows(1, 4))
+        buffer.extend(rows(4, 7))
+
+        df = buffer.frame()
+        self.assertEqual(list(df['id']), [3, 4, 5, 6])
+        self.assertEqual(buffer.last_id, 6)
+
+    def test_batch_larger_than_capacity(self):
+        buffer = RingBuffer(3)
+        buffer.extend(rows(1, 11))
+        self.assertEqual(list(buffer.frame()['cpu_percent']), [8.0, 9.0, 10.0])
+
+    def test_new_column_keeps_the_window(self):
+        buffer = RingBuffer(3)
+        buffer.extend(rows(1, 3))
+        buffer.extend(rows(3, 4).assign(interval_ms=1000))
+        df = buffer.frame()
+        self.assertEqual(list(df.columns), ['id', 'cpu_percent', 'interval_ms'])
+        self.assertEqual(list(df['id']), [1, 2, 3])
+        np.testing.assert_array_equal(df['interval_ms'], [np.nan, np.nan, 1000])
+
+    def test_nan_in_an_integer_column(self):
+        buffer = RingBuffer(3)
+        buffer.extend(pd.DataFrame({'id': [1], 'interval_ms': [500]}))
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            buffer.extend(pd.DataFrame({'id': [2], 'interval_ms': [np.nan]}))
+        np.testing.assert_array_equal(buffer.frame()['interval_ms'], [500, np.nan])
+        self.assertEqual(buffer.frame()['id'].dtype, np.int64)
+
+    def test_empty(self):
+        buffer = RingBuffer(3)
+        buffer.extend(pd.DataFrame())
+        self.assertTrue(buffer.frame().empty)
+
+if __name__ == '__main__':
+    unittest.main()
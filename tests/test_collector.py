@@ -1,20 +1,45 @@
+import time
 import unittest
+from config.settings import COUNTER_MIN_INTERVAL
 from src.data.collector import SystemDataCollector
 
 class TestSystemDataCollector(unittest.TestCase):
+    def setUp(self):
+        self.collector = SystemDataCollector()
+
     def test_collect_system_data(self):
-        data = SystemDataCollector.collect_system_data()
+        # right after the start the cpu counters have barely moved
+        self.assertIsNone(self.collector.collect_system_data())
+        time.sleep(COUNTER_MIN_INTERVAL)
+        data = self.collector.collect_system_data()
         self.assertIsNotNone(data)
         self.assertIn('cpu_percent', data)
         self.assertIn('memory_percent', data)
         self.assertIn('disk_usage', data)
+        self.assertGreaterEqual(data['interval_ms'], COUNTER_MIN_INTERVAL * 1000)
+        self.assertGreaterEqual(data['network_bytes_recv_per_sec'], 0)
     
     def test_collect_system_memory(self):
-        data = SystemDataCollector.collect_system_memory()
+        data = self.collector.collect_system_memory()
         self.assertIsNotNone(data)
         self.assertIn('swap_total', data)
         self.assertIn('swap_percent', data)
         self.assertIn('memory_cached', data)
 
+    def test_collect_system_io_wait_time_does_not_block(self):
+        start = time.monotonic()
+        data = self.collector.collect_system_io_wait_time()
+        self.assertLess(time.monotonic() - start, 0.5)
+        if data is not None:
+            self.assertIn('busy_percentage', data)
+            self.assertIn('interval_ms', data)
+
+    def test_collect_process_metrics(self):
+        self.collector.collect_process_metrics()
+        data = self.collector.collect_process_metrics()
+        self.assertIsNotNone(data)
+        self.assertTrue(data['processes'])
+        self.assertIn('cpu_percent', data['processes'][0])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
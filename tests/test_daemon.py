@@ -0,0 +1,127 @@
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+from src.data.alerts import AlertEngine, AlertRule
+from src.data import daemon
+from src.data.daemon import CollectorDaemon
+from src.data.exporter import MetricsServer, MetricsSnapshot
+from src.data.registry import registry
+
+
+class FakeCollector:
+    def __init__(self, slow=()):
+        self.slow = slow
+        self.release = threading.Event()
+
+    def collect(self, family):
+        if family.name in self.slow:
+            self.release.wait(5)
+        return {'timestamp': 0, 'family': family.name, 'cpu_percent': 100.0}
+
+    def close(self):
+        self.release.set()
+
+
+class FakeStorage:
+    def __init__(self):
+        self.saved = {}
+
+    def save(self, name, data):
+        self.saved[name] = data
+
+    def flush_if_due(self):
+        pass
+
+    def archive(self):
+        pass
+
+    def prune(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestCollectorDaemon(unittest.TestCase):
+    def test_tick_shares_one_timestamp(self):
+        storage = FakeStorage()
+        daemon = CollectorDaemon(FakeCollector(), storage, interval=1)
+        daemon.run_once()
+        daemon.close()
+
+        self.assertEqual(set(storage.saved), {family.name for family in registry if family.probe is not None})
+        self.assertEqual(len({data['timestamp'] for data in storage.saved.values()}), 1)
+        self.assertGreater(storage.saved['system']['timestamp'], 0)
+
+    def test_overrunning_probe_is_skipped(self):
+        storage = FakeStorage()
+        collector = FakeCollector(slow=('process',))
+        daemon = CollectorDaemon(collector, storage, interval=1, probe_timeout=0.05, min_intervals={})
+        # fall back to the daemon-wide deadline for this test
+        family = registry.get('process')
+        timeout, family.timeout = family.timeout, None
+        try:
+            daemon.run_once()
+            self.assertNotIn('process', storage.saved)
+            self.assertIn('system', storage.saved)
+            self.assertEqual(daemon.timeouts['process'], 1)
+
+            # still running on the next tick, so it isn't started a second time
+            daemon.run_once()
+            self.assertEqual(daemon.timeouts['process'], 2)
+        finally:
+            family.timeout = timeout
+            daemon.close()
+
+    def test_families_respect_their_budget(self):
+        storage = FakeStorage()
+        daemon = CollectorDaemon(FakeCollector(), storage, interval=1, min_intervals={'process': 60})
+        daemon.run_once()
+        self.assertIsNone(storage.saved['system']['interval_ms'])
+        first = storage.saved['system']['timestamp']
+        storage.saved.clear()
+        time.sleep(0.01)
+        daemon.run_once()
+        daemon.close()
+
+        self.assertNotIn('process', storage.saved)
+        self.assertIn('system', storage.saved)
+        self.assertEqual(storage.saved['system']['interval_ms'], storage.saved['system']['timestamp'] - first)
+
+    def test_alert_events_are_saved_with_the_tick(self):
+        storage = FakeStorage()
+        daemon = CollectorDaemon(FakeCollector(), storage, interval=1)
+        daemon.alerts = AlertEngine([AlertRule('cpu_pegged', 'system', 'cpu_percent', 'above', 90)])
+        daemon.run_once()
+        daemon.close()
+
+        events = storage.saved['alerts']
+        self.assertEqual(events['timestamp'], storage.saved['system']['timestamp'])
+        self.assertEqual([(e['rule'], e['state']) for e in events['events']], [('cpu_pegged', 'firing')])
+
+    def test_metrics_snapshot_is_published_every_tick(self):
+        metrics = MetricsServer('tcp://127.0.0.1:0', MetricsSnapshot(prefix='test'))
+        daemon = CollectorDaemon(FakeCollector(), FakeStorage(), interval=1, metrics=metrics)
+        daemon.alerts = AlertEngine([AlertRule('cpu_pegged', 'system', 'cpu_percent', 'above', 90)])
+        daemon.run_once()
+        daemon.close()
+
+        body = metrics.snapshot.body().decode()
+        self.assertIn('test_system_cpu_percent 100.0', body)
+        self.assertIn('test_alert_active{rule="cpu_pegged"} 1', body)
+
+
+    def test_metrics_port_in_use_does_not_stop_the_collector(self):
+        with socket.socket() as busy, mock.patch.object(daemon, 'CollectorDaemon') as collector:
+            busy.bind(('127.0.0.1', 0))
+            busy.listen()
+            daemon.main(['--metrics', f'tcp://127.0.0.1:{busy.getsockname()[1]}'])
+        collector.return_value.run.assert_called_once()
+        self.assertIsNone(collector.call_args.kwargs['metrics'])
+
+
+if __name__ == '__main__':
+    unittest.main()
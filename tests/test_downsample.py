@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.visualization.downsample import lttb_indices, minmax_indices, downsample
+from src.visualization.charts import ChartGenerator
+
+class TestDownsample(unittest.TestCase):
+    def setUp(self):
+        self.x = np.arange(10_000)
+        self.y = np.sin(self.x / 500.0)
+        self.y[4321] = 50.0  # a single spike
+
+    def test_lttb_bounds_points_and_keeps_endpoints(self):
+        indices = lttb_indices(self.x, self.y, 200)
+        self.assertEqual(len(indices), 200)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 9_999)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_spike_is_preserved(self):
+        self.assertIn(4321, lttb_indices(self.x, self.y, 100))
+        self.assertIn(4321, minmax_indices(self.y, 100))
+
+    def test_minmax_bounds_points(self):
+        self.assertLessEqual(len(minmax_indices(self.y, 100)), 100)
+
+    def test_small_series_unchanged(self):
+        x, y = downsample(self.x[:50], self.y[:50], 100)
+        self.assertEqual(len(y), 50)
+
+    def test_datetime_x(self):
+        x = pd.date_range('2024-01-01', periods=1_000, freq='s')
+        ds_x, ds_y = downsample(x, np.random.default_rng(0).random(1_000), 100)
+        self.assertEqual(len(ds_x), 100)
+        self.assertTrue(np.issubdtype(ds_x.dtype, np.datetime64))
+
+    def test_chart_traces_are_bounded(self):
+        df = pd.DataFrame({
+            'timestamp': pd.date_range('2024-01-01', periods=5_000, freq='s'),
+            'read_io_bytes_per_sec': self.y[:5_000],
+            'write_io_bytes_per_sec': self.y[:5_000],
+            'busy_percentage': self.y[:5_000],
+        })
+        fig = ChartGenerator.create_system_io_wait_char(df, max_points=300)
+        self.assertTrue(all(len(trace.y) == 300 for trace in fig.data))
+
+    def test_memory_chart_traces_are_bounded(self):
+        columns = ['memory_used', 'memory_cached', 'memory_buffers', 'memory_available', 'memory_total',
+                   'swap_used', 'swap_total']
+        df = pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=5_000, freq='s')})
+        for col in columns:
+            df[col] = (self.y[:5_000] + 2) * 1024 ** 3
+        for build in (ChartGenerator.create_memory_composition_chart, ChartGenerator.create_memory_swap_comparison_chart):
+            fig = build(df, unit='GB', max_points=300)
+            self.assertTrue(all(len(trace.y) == 300 and trace.meta for trace in fig.data))
+
+if __name__ == '__main__':
+    unittest.main()
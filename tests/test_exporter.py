@@ -0,0 +1,82 @@
+import gzip
+import unittest
+import urllib.error
+import urllib.request
+
+from src.data.exporter import MetricsServer, MetricsSnapshot
+
+
+class TestMetricsSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = MetricsSnapshot(prefix='test')
+        self.snapshot.update('system', {'timestamp': 1_700_000_000_000, 'cpu_percent': 12.5, 'memory_percent': 50.0,
+                                        'disk_usage': 70.0, 'network_bytes_sent': 100, 'network_bytes_recv': 200})
+        self.snapshot.update('cpu_cores', {'timestamp': 1_700_000_000_000, 'entities': [
+            {'entity': 'cpu0', 'busy_percent': 10.0}, {'entity': 'cpu1', 'busy_percent': 20.0}
+        ]})
+        self.snapshot.update('process', {'timestamp': 1_700_000_000_000, 'processes': [
+            {'pid': 7, 'name': 'say "hi"', 'cpu_percent': 1.0, 'memory_rss': 1024,
+             'read_bytes_per_sec': None, 'write_bytes_per_sec': 0.0}
+        ]})
+
+    def test_nothing_is_rendered_before_publish(self):
+        self.assertNotIn(b'test_system_cpu_percent', self.snapshot.body())
+
+    def test_prometheus_text(self):
+        self.snapshot.publish(1_700_000_000_000, active_alerts=['cpu_pegged'], rules=['cpu_pegged', 'memory_high'])
+        lines = self.snapshot.body().decode().splitlines()
+
+        self.assertIn('# TYPE test_system_cpu_percent gauge', lines)
+        self.assertIn('test_system_cpu_percent 12.5', lines)
+        self.assertIn('# TYPE test_system_network_bytes_sent_total counter', lines)
+        self.assertIn('test_system_network_bytes_sent_total 100', lines)
+        self.assertIn('test_cpu_cores_busy_percent{cpu="cpu1"} 20.0', lines)
+        self.assertIn('test_process_memory_rss{pid="7",name="say \\"hi\\""} 1024', lines)
+        # missing values are left out instead of exported as 0
+        self.assertFalse([line for line in lines if line.startswith('test_process_read_bytes_per_sec')])
+        self.assertIn('test_alert_active{rule="cpu_pegged"} 1', lines)
+        self.assertIn('test_alert_active{rule="memory_high"} 0', lines)
+        self.assertIn('test_last_tick_timestamp_seconds 1700000000.0', lines)
+
+    def test_openmetrics_text(self):
+        self.snapshot.publish(1_700_000_000_000)
+        text = gzip.decompress(self.snapshot.body(openmetrics=True, compressed=True)).decode()
+        self.assertIn('# TYPE test_system_network_bytes_sent counter\n', text)
+        self.assertIn('test_system_network_bytes_sent_total 100\n', text)
+        self.assertTrue(text.endswith('# EOF\n'))
+
+
+class TestMetricsServer(unittest.TestCase):
+    def setUp(self):
+        self.server = MetricsServer('tcp://127.0.0.1:0', MetricsSnapshot(prefix='test'))
+        self.server.start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_scrape_serves_the_published_snapshot(self):
+        self.server.snapshot.update('system', {'timestamp': 0, 'cpu_percent': 99.0})
+        with urllib.request.urlopen(f'{self.url}/metrics') as response:
+            self.assertNotIn(b'test_system_cpu_percent', response.read())
+
+        self.server.snapshot.publish(0)
+        request = urllib.request.Request(f'{self.url}/metrics', headers={
+            'Accept': 'application/openmetrics-text; version=1.0.0', 'Accept-Encoding': 'gzip'
+        })
+        with urllib.request.urlopen(request) as response:
+            self.assertTrue(response.headers['Content-Type'].startswith('application/openmetrics-text'))
+            self.assertIn(b'test_system_cpu_percent 99.0', gzip.decompress(response.read()))
+
+    def test_unknown_path(self):
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f'{self.url}/')
+        self.assertEqual(error.exception.code, 404)
+
+    def test_unix_address_is_rejected(self):
+        with self.assertRaises(ValueError):
+            MetricsServer('unix:///tmp/metrics.sock')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import pandas as pd
+
+from src.visualization.charts import ChartGenerator
+from src.data.registry import registry
+from src.visualization.figure_cache import FigureCache
+
+
+def frame(start, end):
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(range(start, end), unit='s'),
+        'cpu_percent': [float(i) for i in range(start, end)],
+        'memory_percent': [50.0] * (end - start),
+    })
+
+
+class TestFigureCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = FigureCache(maxsize=2, patch_max_points=5)
+
+    def figure(self, version, df, build=ChartGenerator.create_cpu_memory_chart, kind='cpu_memory'):
+        return self.cache.figure(kind, 'system_metrics', version, lambda: df, build, window=10)
+
+    def test_unchanged_version_is_a_hit(self):
+        fig = self.figure(1, frame(0, 10))
+        self.assertIs(self.figure(1, None), fig)
+        self.assertEqual((self.cache.hits, self.cache.builds), (1, 1))
+
+    def test_few_appended_rows_patch_the_traces(self):
+        fig = self.figure(1, frame(0, 10))
+        patched = self.figure(3, frame(2, 12))
+
+        self.assertIs(patched, fig)
+        self.assertEqual(self.cache.patches, 1)
+        self.assertEqual(list(patched.data[0].y), [float(i) for i in range(2, 12)])
+        self.assertEqual(len(patched.data[1].x), 10)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_many_appended_rows_rebuild(self):
+        fig = self.figure(1, frame(0, 10))
+        self.assertIsNot(self.figure(2, frame(8, 18)), fig)
+        self.assertEqual(self.cache.builds, 2)
+
+    def test_untagged_traces_rebuild(self):
+        df = frame(0, 10)
+        build = lambda df: ChartGenerator.create_breakdown_chart(df.assign(entity='cpu0'), registry.get('cpu_cores'),
+                                                                'cpu_percent')
+        self.figure(1, df, build, 'breakdown')
+        self.figure(2, frame(0, 11), build, 'breakdown')
+        self.assertEqual((self.cache.patches, self.cache.builds), (0, 2))
+
+    def test_derived_percent_traces_patch(self):
+        # the swap chart's memory percent is memory_used of memory_total
+        gib = 1024 ** 3
+        memory = lambda start, end: frame(start, end).assign(memory_used=1.0 * gib, memory_total=4.0 * gib,
+                                                             swap_used=0.0, swap_total=1.0)
+        build = lambda df: ChartGenerator.create_memory_swap_comparison_chart(df, unit='GB')
+        self.figure(1, memory(0, 10), build, 'memory_swap')
+        fig = self.figure(2, pd.concat([memory(0, 10), memory(10, 11).assign(memory_used=2.0 * gib)]), build,
+                          'memory_swap')
+        self.assertEqual((self.cache.patches, self.cache.builds), (1, 1))
+        self.assertEqual(list(fig.data[0].y[-2:]), [1.0, 2.0])
+        self.assertEqual(list(fig.data[2].y[-2:]), [25.0, 50.0])
+
+    def test_lru_eviction(self):
+        first = self.figure(1, frame(0, 10), kind='a')
+        self.figure(1, frame(0, 10), kind='b')
+        self.figure(1, frame(0, 10), kind='a')
+        self.figure(1, frame(0, 10), kind='c')
+        self.assertEqual(len(self.cache), 2)
+        # 'a' was used more recently than 'b', so 'b' was evicted
+        self.assertIs(self.figure(1, None, kind='a'), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
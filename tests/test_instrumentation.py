@@ -0,0 +1,85 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from src.data import instrumentation
+from src.data.instrumentation import Histogram, Timings, TimingsWindow, timed
+from src.visualization.transforms import summarize_overhead
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_are_bucket_upper_bounds(self):
+        h = Histogram()
+        for _ in range(90):
+            h.add(0.0001)    # 100 us -> bucket below 128 us
+        for _ in range(10):
+            h.add(0.01)      # 10 ms
+        self.assertEqual(h.count, 100)
+        self.assertAlmostEqual(h.quantile(0.5), 128e-6)
+        self.assertAlmostEqual(h.quantile(0.95), 0.01)
+        self.assertAlmostEqual(h.max, 0.01)
+
+
+class TestTimings(unittest.TestCase):
+    def test_snapshot_starts_a_new_interval(self):
+        t = Timings(enabled=True)
+        t.record('probe', 0.002)
+        t.record('probe', 0.004)
+        rows = t.snapshot('collector')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['count'], 2)
+        self.assertAlmostEqual(rows[0]['total_ms'], 6.0)
+        self.assertEqual(t.snapshot('collector'), [])
+
+    def test_timed_records_calls(self):
+        t = Timings(enabled=True)
+        with mock.patch.object(instrumentation, 'timings', t):
+            @timed
+            def work():
+                return 42
+            self.assertEqual(work(), 42)
+        self.assertEqual(t.snapshot('x')[0]['name'], work.__qualname__)
+
+    def test_disabled_leaves_function_untouched(self):
+        def work():
+            return 42
+        with mock.patch.object(instrumentation, 'timings', Timings(enabled=False)):
+            self.assertIs(timed(work), work)
+            self.assertIs(timed(name='other')(work), work)
+
+
+class TestTimingsWindow(unittest.TestCase):
+    def test_readers_share_one_history(self):
+        t = Timings(enabled=True)
+        window = TimingsWindow('dashboard', window=60, interval=5, timings=t)
+        t.record('chart', 0.001)
+        first = window.rows(1_000)
+        # a second reader within the interval sees the same rows, nothing is drained
+        t.record('chart', 0.002)
+        self.assertEqual(window.rows(2_000), first)
+        self.assertEqual(len(window.rows(6_000)), 2)
+        # older than the window
+        self.assertEqual([row['timestamp'] for row in window.rows(62_000)], [6_000])
+
+
+class TestSummarizeOverhead(unittest.TestCase):
+    def test_intervals_are_merged(self):
+        df = pd.DataFrame({
+            'source': ['collector', 'collector', 'dashboard'],
+            'name': ['probe', 'probe', 'chart'],
+            'count': [2, 2, 1],
+            'total_ms': [4.0, 8.0, 1.0],
+            'max_ms': [3.0, 5.0, 1.0],
+            'p50_ms': [2.0, 4.0, 1.0],
+            'p95_ms': [3.0, 5.0, 1.0],
+        })
+        summary = summarize_overhead(df)
+        self.assertEqual(list(summary['name']), ['probe', 'chart'])
+        self.assertEqual(summary.loc[0, 'calls'], 4)
+        self.assertEqual(summary.loc[0, 'mean_ms'], 3.0)
+        self.assertEqual(summary.loc[0, 'max_ms'], 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
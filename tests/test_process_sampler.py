@@ -0,0 +1,106 @@
+import os
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+import pandas as pd
+import psutil
+from src.data.process_sampler import ProcessSampler, top_processes
+from src.visualization.charts import ChartGenerator
+
+def row(pid, cpu=0.0, rss=0, read=0.0, write=0.0):
+    return {'pid': pid, 'name': f'p{pid}', 'cpu_percent': cpu, 'memory_rss': rss,
+            'read_bytes_per_sec': read, 'write_bytes_per_sec': write}
+
+IoCounters = namedtuple('IoCounters', ['read_bytes', 'write_bytes'])
+MemoryInfo = namedtuple('MemoryInfo', ['rss'])
+
+
+class FakeProcess:
+    def __init__(self, pid, created, read_bytes):
+        self.pid, self.created, self.read_bytes = pid, created, read_bytes
+
+    def create_time(self):
+        return self.created
+
+    def name(self):
+        return f'p{self.created}'
+
+    def oneshot(self):
+        return mock.MagicMock()
+
+    def cpu_percent(self, interval=None):
+        return 1.0
+
+    def memory_info(self):
+        return MemoryInfo(1)
+
+    def io_counters(self):
+        return IoCounters(self.read_bytes, 0)
+
+
+class FakePsutil:
+    # one pid, whose process and its counters can be replaced between ticks
+    NoSuchProcess, AccessDenied, ZombieProcess = psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess
+
+    def __init__(self):
+        self.process = FakeProcess(100, 1.0, 0)
+
+    def pids(self):
+        return [self.process.pid]
+
+    def Process(self, pid):
+        return self.process
+
+
+class TestProcessSampler(unittest.TestCase):
+    def test_handles_are_cached_across_ticks(self):
+        sampler = ProcessSampler()
+        sampler.sample()
+        cached = {pid: proc for (pid, _), proc in sampler._procs.items()}
+        rows = sampler.sample()
+
+        self.assertIn(os.getpid(), cached)
+        # the handle of a process that is still running is reused
+        self.assertIs({pid: proc for (pid, _), proc in sampler._procs.items()}[os.getpid()], cached[os.getpid()])
+        own = next(r for r in rows if r['pid'] == os.getpid())
+        self.assertGreater(own['memory_rss'], 0)
+        self.assertGreaterEqual(own['read_bytes_per_sec'], 0)
+
+    def test_new_process_is_not_reported_on_its_first_tick(self):
+        sampler = ProcessSampler()
+        first = sampler.sample()
+        self.assertNotIn(os.getpid(), [r['pid'] for r in first])
+        self.assertIn(os.getpid(), [r['pid'] for r in sampler.sample()])
+
+    def test_reused_pid_is_a_new_process(self):
+        fake = FakePsutil()
+        clock = iter(range(100)).__next__
+        with mock.patch('src.data.process_sampler.psutil', fake):
+            sampler = ProcessSampler(clock=clock)
+            sampler.sample()
+            fake.process.read_bytes = 5_000
+            self.assertEqual([r['read_bytes_per_sec'] for r in sampler.sample()], [5_000.0])
+
+            # pid 100 exits and the kernel gives it to a new process
+            fake.process = FakeProcess(100, 2.0, 100)
+            self.assertEqual(sampler.sample(), [])
+            fake.process.read_bytes = 300
+            rows = sampler.sample()
+        # measured from the new process's own counters
+        self.assertEqual([(r['name'], r['read_bytes_per_sec']) for r in rows], [('p2.0', 200.0)])
+
+
+class TestTopProcesses(unittest.TestCase):
+    def test_union_of_each_resource(self):
+        rows = [row(1, cpu=90), row(2, rss=10**9), row(3, read=10**6), row(4)]
+        self.assertEqual(sorted(r['pid'] for r in top_processes(rows, 1)), [1, 2, 3])
+
+    def test_chart(self):
+        df = pd.DataFrame([row(1, cpu=90, rss=10**8), row(2, cpu=5, rss=10**9, write=10**6)])
+        fig = ChartGenerator.create_top_process_chart(df, n=1)
+        self.assertEqual(list(fig.data[0].y), ['p1 (1)'])
+        self.assertEqual(list(fig.data[1].y), ['p2 (2)'])
+
+if __name__ == '__main__':
+    unittest.main()
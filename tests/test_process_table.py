@@ -0,0 +1,36 @@
+import unittest
+from src.data.process_table import ProcessTable
+from src.visualization.charts import ChartGenerator
+
+class TestProcessTable(unittest.TestCase):
+    def setUp(self):
+        # two processes share the name 'bash', 99 has a parent that is gone
+        self.table = ProcessTable(
+            pids=[1, 10, 11, 12, 99],
+            ppids=[0, 1, 10, 10, 50],
+            names=['init', 'bash', 'bash', 'vim', 'orphan']
+        )
+
+    def test_links_follow_ppid(self):
+        source, target, value = self.table.sankey_links()
+        self.assertEqual(list(zip(source, target)), [(0, 1), (1, 2), (1, 3)])
+        self.assertEqual(value, [1, 1, 1])
+
+    def test_roots_and_children(self):
+        self.assertEqual(self.table.roots, [0, 4])
+        self.assertEqual(self.table.children[1], [2, 3])
+
+    def test_labels_are_unique_per_pid(self):
+        self.assertEqual(self.table.labels()[1:3], ['bash (10)', 'bash (11)'])
+
+    def test_self_parent_is_root(self):
+        table = ProcessTable(pids=[0, 1], ppids=[0, 0], names=['kernel', 'init'])
+        self.assertEqual(table.parents, [-1, 0])
+
+    def test_chart(self):
+        fig = ChartGenerator.create_process_chart(self.table)
+        self.assertEqual(len(fig.data[0].node.label), 5)
+        self.assertEqual(list(fig.data[0].link.target), [1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
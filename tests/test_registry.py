@@ -0,0 +1,91 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.data.registry import MetricFamily, MetricRegistry, registry
+from src.data.storage import DataStorage
+
+
+class TestMetricFamily(unittest.TestCase):
+    def setUp(self):
+        self.family = MetricFamily('test', 'test_metrics', [('value', 'REAL'), ('label', 'TEXT', True)], probe='collect_test')
+
+    def test_generated_schema(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute(self.family.create_table_query())
+        columns = {row[1]: (row[2], row[3]) for row in conn.execute('PRAGMA table_info(test_metrics)')}
+        self.assertEqual(columns['timestamp'], ('INTEGER', 1))
+        self.assertEqual(columns['value'], ('REAL', 1))
+        self.assertEqual(columns['label'], ('TEXT', 0))
+
+        conn.execute(self.family.insert_query(), next(self.family.rows({'value': 1.5, 'extra': 0}, 1000)))
+        self.assertEqual(conn.execute('SELECT timestamp, value, label FROM test_metrics').fetchall(), [(1000, 1.5, None)])
+
+    def test_rows_key_gives_one_row_per_entry(self):
+        family = MetricFamily('multi', 'multi_metrics', [('pid', 'INTEGER')], probe='collect_multi', rows_key='items')
+        rows = list(family.rows({'items': [{'pid': 1}, {'pid': 2}], 'interval_ms': 1000}, 5, host_id=3))
+        self.assertEqual(rows, [
+            {'pid': 1, 'interval_ms': 1000, 'timestamp': 5, 'host_id': 3},
+            {'pid': 2, 'interval_ms': 1000, 'timestamp': 5, 'host_id': 3},
+        ])
+        self.assertFalse(family.rollup)
+
+    def test_duplicate_and_disabled_families(self):
+        reg = MetricRegistry()
+        reg.register(self.family)
+        with self.assertRaises(ValueError):
+            reg.register(self.family)
+
+        reg.register(MetricFamily('off', 'off_metrics', [('value', 'REAL')], probe='collect_off', enabled=False))
+        self.assertEqual([f.name for f in reg], ['test'])
+        self.assertEqual(len(reg.families(enabled_only=False)), 2)
+
+
+class TestRegistryStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = DataStorage(db_path=Path(self.tmp.name) / 'test.db', archive_dir=None)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_save_and_load_any_family(self):
+        # opt-in families get their tables too, so enabling one needs no migration
+        self.storage.save('sensors', {
+            'timestamp': 1_700_000_000_000, 'temperature_max': 55.0, 'fan_rpm_max': None, 'battery_percent': 80.0
+        })
+        df = self.storage.load('sensors')
+        self.assertEqual(len(df), 1)
+        self.assertEqual(df.iloc[0]['temperature_max'], 55.0)
+
+    def test_breakdown_family_is_long_format(self):
+        for timestamp, busy in [(1_700_000_000_000, (10.0, 90.0)), (1_700_000_005_000, (20.0, 80.0))]:
+            self.storage.save('cpu_cores', {
+                'timestamp': timestamp,
+                'entities': [{'entity': 'cpu0', 'busy_percent': busy[0]}, {'entity': 'cpu1', 'busy_percent': busy[1]}],
+            })
+
+        df = self.storage.load_breakdown('cpu_cores', ticks=1)
+        self.assertEqual(list(df['entity']), ['cpu0', 'cpu1'])
+        self.assertEqual(list(df['busy_percent']), [20.0, 80.0])
+
+        # each entity name is stored once
+        with self.storage._reader() as conn:
+            self.assertEqual(conn.execute("SELECT count(*) FROM entities WHERE kind = 'cpu'").fetchone()[0], 2)
+
+        self.assertEqual(self.storage.prune(now=1_700_000_000_000 + 8 * 24 * 3600 * 1000), 4)
+        self.assertTrue(self.storage.load_breakdown('cpu_cores').empty)
+
+    def test_every_family_probe_exists(self):
+        from src.data.collector import SystemDataCollector
+        for family in registry.families(enabled_only=False):
+            if family.probe is None:
+                # written by the daemon itself
+                continue
+            self.assertTrue(callable(getattr(SystemDataCollector, family.probe, None)), family.probe)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from src.data.storage import DataStorage
+from src.data.rollup import RollupManager
+
+BASE = 1_700_000_040_000 - 1_700_000_040_000 % 3_600_000
+
+def io_row(timestamp, busy, interval_ms=1000):
+    return {
+        'timestamp': timestamp,
+        'read_io_bytes_per_sec': busy * 10,
+        'write_io_bytes_per_sec': 0.0,
+        'busy_percentage': busy,
+        'interval_ms': interval_ms
+    }
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / 'test.db'
+        self.storage = DataStorage(db_path=self.db_path, archive_dir=None)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def _tier(self, tier):
+        self.storage.flush()
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                f'SELECT timestamp, sample_count, interval_sum, busy_percentage_min, busy_percentage_max, '
+                f'busy_percentage_sum, busy_percentage_last FROM system_io_wait_{tier} ORDER BY timestamp'
+            ).fetchall()
+
+    def test_incremental_aggregates(self):
+        # two samples in the first minute, one in the second
+        for offset, busy in [(0, 10.0), (30_000, 30.0), (60_000, 5.0)]:
+            self.storage.save_to_db_system_io_wait(io_row(BASE + offset, busy))
+
+        self.assertEqual(self._tier('1m'), [
+            (BASE, 2, 2000.0, 10.0, 30.0, 40_000.0, 30.0),
+            (BASE + 60_000, 1, 1000.0, 5.0, 5.0, 5000.0, 5.0),
+        ])
+        self.assertEqual(self._tier('1h'), [(BASE, 3, 3000.0, 5.0, 30.0, 45_000.0, 5.0)])
+
+    def test_average_is_weighted_by_interval(self):
+        # a quiet minute sampled once after 30s, then a burst sampled every 0.5s
+        self.storage.save_to_db_system_io_wait(io_row(BASE, 10.0, interval_ms=30_000))
+        for i in range(1, 11):
+            self.storage.save_to_db_system_io_wait(io_row(BASE + 30_000 + i * 500, 90.0, interval_ms=500))
+        self.storage.flush()
+
+        _, df = self.storage.load_data_io_wait(limit=None, since=BASE, until=BASE + 300 * 60_000, min_points=100)
+        # 30s at 10% and 5s at 90%, not the 83% of the 11 samples
+        self.assertAlmostEqual(df['busy_percentage'].iloc[-1], (10 * 30 + 90 * 5) / 35)
+        df = self.storage.aggregate('system_io_wait', ['busy_percentage'], BASE, BASE + 60_000, bucket=60)
+        self.assertAlmostEqual(df['busy_percentage_avg'].iloc[0], (10 * 30 + 90 * 5) / 35)
+
+    def test_out_of_order_sample_keeps_last(self):
+        self.storage.save_to_db_system_io_wait(io_row(BASE + 30_000, 30.0))
+        self.storage.save_to_db_system_io_wait(io_row(BASE, 10.0))
+        self.assertEqual(self._tier('1m')[0][-1], 30.0)
+
+    def test_backfill_matches_incremental(self):
+        for i in range(10):
+            self.storage.save_to_db_system_io_wait(io_row(BASE + i * 25_000, float(i)))
+        incremental = self._tier('5m')
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM system_io_wait_5m')
+            self.storage._rollups.backfill(conn, 'system_io_wait')
+        self.assertEqual(self._tier('5m'), incremental)
+
+    def test_v4_tiers_are_rebuilt_weighted(self):
+        self.storage.save_to_db_system_io_wait(io_row(BASE, 10.0, interval_ms=3000))
+        self.storage.save_to_db_system_io_wait(io_row(BASE + 30_000, 30.0))
+        weighted = self._tier('1m')
+        self.storage.close()
+        # the tiers of a v4 database: plain sums and no interval_sum
+        with sqlite3.connect(self.db_path) as conn:
+            for tier in ('1m', '5m', '1h'):
+                conn.execute(f'ALTER TABLE system_io_wait_{tier} DROP COLUMN interval_sum')
+                conn.execute(f'UPDATE system_io_wait_{tier} SET busy_percentage_sum = 40.0')
+            conn.execute('PRAGMA user_version = 4')
+
+        self.storage = DataStorage(db_path=self.db_path, archive_dir=None)
+        self.assertEqual(self._tier('1m'), weighted)
+
+    def test_loader_picks_rollup_tier(self):
+        for i in range(180):
+            self.storage.save_to_db_system_io_wait(io_row(BASE + i * 60_000, float(i)))
+
+        _, df = self.storage.load_data_io_wait(limit=None, since=BASE, until=BASE + 180 * 60_000, min_points=30)
+        # 3 hours: 36 five-minute buckets, the hourly tier would only give 3
+        self.assertEqual(len(df), 36)
+        self.assertIn('busy_percentage_max', df.columns)
+        self.assertEqual(df['busy_percentage'].iloc[-1], 2.0)
+
+    def test_prune_removes_old_rows(self):
+        self.storage.save_to_db_system_io_wait(io_row(BASE, 1.0))
+        self.storage.save_to_db_system_io_wait(io_row(BASE + 10 * 24 * 3600 * 1000, 1.0))
+        self.storage.flush()
+
+        deleted = self.storage.prune(now=BASE + 10 * 24 * 3600 * 1000)
+        self.assertEqual(deleted, 1)
+        _, df = self.storage.load_data_io_wait()
+        self.assertEqual(len(df), 1)
+
+class TestPickTier(unittest.TestCase):
+    def test_falls_back_to_raw(self):
+        rollups = RollupManager({}, {'1m': 60, '5m': 300, '1h': 3600})
+        self.assertEqual(rollups.pick_tier(0, 7 * 24 * 3600 * 1000, 100), '1h')
+        self.assertEqual(rollups.pick_tier(0, 24 * 3600 * 1000, 100), '5m')
+        self.assertIsNone(rollups.pick_tier(0, 3600 * 1000, 100))
+
+if __name__ == '__main__':
+    unittest.main()
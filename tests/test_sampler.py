@@ -0,0 +1,87 @@
+import unittest
+from collections import namedtuple
+from src.data.sampler import CounterDelta, EntityDelta, rate, cpu_busy_percent
+
+Counters = namedtuple('Counters', ['read_bytes', 'write_bytes'])
+
+class FakeSource:
+    def __init__(self, readings, times):
+        self.readings = list(readings)
+        self.times = list(times)
+
+    def read(self):
+        return self.readings.pop(0)
+
+    def clock(self):
+        return self.times.pop(0)
+
+class TestCounterDelta(unittest.TestCase):
+    def test_deltas_use_real_elapsed_time(self):
+        source = FakeSource([Counters(100, 50), Counters(400, 50)], [10.0, 12.5])
+        deltas, elapsed = CounterDelta(source.read, clock=source.clock).sample()
+
+        self.assertEqual(deltas, {'read_bytes': 300, 'write_bytes': 0})
+        self.assertEqual(elapsed, 2.5)
+        self.assertEqual(rate(deltas['read_bytes'], elapsed), 120)
+
+    def test_counter_reset_counts_from_zero(self):
+        source = FakeSource([Counters(1000, 50), Counters(30, 80)], [0.0, 1.0])
+        counter = CounterDelta(source.read, clock=source.clock)
+        deltas, _ = counter.sample()
+
+        self.assertEqual(deltas['read_bytes'], 30)
+        self.assertEqual(deltas['write_bytes'], 30)
+        self.assertEqual(counter.resets, 1)
+
+    def test_true_wrap(self):
+        source = FakeSource([Counters(2 ** 64 - 10, 0), Counters(5, 0)], [0.0, 1.0])
+        deltas, _ = CounterDelta(source.read, clock=source.clock).sample()
+        self.assertEqual(deltas['read_bytes'], 15)
+
+    def test_cpu_times_never_step_back(self):
+        CpuTimes = namedtuple('CpuTimes', ['user', 'idle', 'iowait'])
+        source = FakeSource([CpuTimes(100.0, 500.0, 20.0), CpuTimes(180.0, 520.0, 19.9)], [0.0, 1.0])
+        counter = CounterDelta(source.read, clock=source.clock, wraps=False)
+        deltas, _ = counter.sample()
+
+        self.assertEqual(deltas, {'user': 80.0, 'idle': 20.0, 'iowait': 0})
+        self.assertEqual(cpu_busy_percent(deltas), 80.0)
+        self.assertEqual(counter.resets, 0)
+
+    def test_too_short_interval_keeps_the_previous_reading(self):
+        source = FakeSource([Counters(100, 0), Counters(101, 0), Counters(400, 0)], [0.0, 0.01, 1.0])
+        counter = CounterDelta(source.read, clock=source.clock, min_elapsed=0.25)
+        self.assertEqual(counter.sample(), (None, 0.01))
+        deltas, elapsed = counter.sample()
+        self.assertEqual((deltas['read_bytes'], elapsed), (300, 1.0))
+
+    def test_missing_counters(self):
+        source = FakeSource([None, None], [0.0, 1.0])
+        deltas, elapsed = CounterDelta(source.read, clock=source.clock).sample()
+        self.assertIsNone(deltas)
+        self.assertEqual(elapsed, 1.0)
+
+class TestEntityDelta(unittest.TestCase):
+    def test_new_entities_start_next_sample(self):
+        source = FakeSource([
+            {'sda': Counters(100, 0)},
+            {'sda': Counters(300, 10), 'sdb': Counters(5, 5)},
+            {'sdb': Counters(10, 5)},
+        ], [0.0, 1.0, 2.0])
+        counter = EntityDelta(source.read, clock=source.clock)
+
+        deltas, _ = counter.sample()
+        self.assertEqual(deltas, {'sda': {'read_bytes': 200, 'write_bytes': 10}})
+        deltas, _ = counter.sample()
+        self.assertEqual(deltas, {'sdb': {'read_bytes': 5, 'write_bytes': 0}})
+
+class TestCpuBusyPercent(unittest.TestCase):
+    def test_idle_and_iowait_are_not_busy(self):
+        deltas = {'user': 30, 'system': 10, 'idle': 50, 'iowait': 10, 'guest': 5}
+        self.assertEqual(cpu_busy_percent(deltas), 40.0)
+
+    def test_no_elapsed_ticks(self):
+        self.assertEqual(cpu_busy_percent({'user': 0, 'idle': 0}), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
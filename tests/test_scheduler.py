@@ -0,0 +1,105 @@
+import random
+import threading
+import unittest
+from src.data.scheduler import AdaptiveScheduler, FixedRateScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestFixedRateScheduler(unittest.TestCase):
+    def test_runs_until_stopped(self):
+        stop_event = threading.Event()
+        ticks = []
+
+        def tick():
+            ticks.append(1)
+            if len(ticks) == 3:
+                stop_event.set()
+
+        FixedRateScheduler(0.01).run(tick, stop_event)
+        self.assertEqual(len(ticks), 3)
+
+    def test_overrun_skips_missed_ticks(self):
+        clock = FakeClock()
+        stop_event = threading.Event()
+        scheduler = FixedRateScheduler(1, clock=clock)
+
+        def tick():
+            # the tick takes 2.5 intervals
+            clock.now += 2.5
+            stop_event.set()
+
+        scheduler.run(tick, stop_event)
+        self.assertEqual(scheduler.missed_ticks, 2)
+
+    def test_rejects_non_positive_interval(self):
+        with self.assertRaises(ValueError):
+            FixedRateScheduler(0)
+
+class TestAdaptiveScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = AdaptiveScheduler(5, min_interval=0.5, max_interval=30, watch=[('system', 'cpu_percent')],
+                                           delta_threshold=10, drift_threshold=5, quiet_ticks=3)
+
+    def tick(self, cpu_percent):
+        self.scheduler.observe('system', {'cpu_percent': cpu_percent})
+        return self.scheduler.adapt()
+
+    def test_jump_switches_to_fast_sampling(self):
+        self.assertEqual(self.tick(10.0), 5)
+        self.assertEqual(self.tick(40.0), 0.5)
+
+    def test_steady_climb_switches_to_fast_sampling(self):
+        # every step is below the delta threshold, the spread of the recent samples isn't
+        self.tick(10.0)
+        self.assertEqual(self.tick(17.0), 5)
+        self.assertEqual(self.tick(24.0), 0.5)
+
+    def test_quiet_system_backs_off_to_max_interval(self):
+        self.tick(10.0)
+        self.tick(40.0)
+        intervals = [self.tick(40.0) for _ in range(40)]
+        # fast right after the jump, then doubled after every 3 quiet ticks
+        self.assertEqual(intervals[0], 0.5)
+        self.assertEqual(intervals, sorted(intervals))
+        self.assertEqual(sorted(set(intervals)), [0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30])
+
+    def test_steady_noise_backs_off(self):
+        # +-10 points around 50: steps above the delta threshold, but nothing out of the ordinary
+        rng = random.Random(0)
+        intervals = [self.tick(50 + rng.uniform(-10, 10)) for _ in range(200)]
+        self.assertEqual(intervals[-1], 30)
+
+    def test_spike_out_of_the_noise_switches_to_fast_sampling(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            self.tick(50 + rng.uniform(-10, 10))
+        self.assertEqual(self.tick(95.0), 0.5)
+
+    def test_unwatched_families_are_ignored(self):
+        self.scheduler.observe('memory', {'cpu_percent': 0.0})
+        self.scheduler.observe('memory', {'cpu_percent': 100.0})
+        self.assertEqual(self.scheduler.adapt(), 5)
+
+    def test_overrun_starts_next_tick_one_interval_later(self):
+        clock = FakeClock()
+        stop_event = threading.Event()
+        scheduler = AdaptiveScheduler(1, min_interval=1, max_interval=1, clock=clock)
+
+        def tick():
+            clock.now += 2.5
+            stop_event.set()
+
+        scheduler.run(tick, stop_event)
+        self.assertEqual(scheduler.missed_ticks, 1)
+
+    def test_rejects_bad_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptiveScheduler(5, min_interval=10, max_interval=1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,17 @@
+import sqlite3
+import tempfile
 import unittest
+from pathlib import Path
 import pandas as pd
+from src.data.rollup import rollup_table
 from src.data.storage import DataStorage
+from config.settings import ROLLUP_TIERS
 from datetime import datetime
 
 class TestDataStorage(unittest.TestCase):
     def setUp(self):
-        self.storage = DataStorage()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = DataStorage(db_path=Path(self.tmp.name) / 'test.db', archive_dir=None)
         self.test_data = {
             'timestamp': datetime.now(), 
             'cpu_percent': 50.0, 
@@ -15,6 +21,10 @@ class TestDataStorage(unittest.TestCase):
             'network_bytes_recv': 2000 
         }
 
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
     def test_save_and_load_data(self):
         self.storage.save_to_db(self.test_data)
 
@@ -26,5 +36,219 @@ class TestDataStorage(unittest.TestCase):
 
         self.assertEqual(loaded_data.iloc[0]['cpu_percent'], self.test_data['cpu_percent'])
 
+class TestBatchedWrites(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / 'test.db'
+        self.storage = DataStorage(db_path=self.db_path, batch_size=3, flush_interval=float('inf'))
+        self.row = {
+            'timestamp': '2024-01-01 00:00:00',
+            'cpu_percent': 50.0,
+            'memory_percent': 60.0,
+            'disk_usage': 70.0,
+            'network_bytes_sent': 1000,
+            'network_bytes_recv': 2000
+        }
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def _count_on_disk(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute('SELECT COUNT(*) FROM system_metrics').fetchone()[0]
+
+    def test_rows_are_buffered_until_batch_is_full(self):
+        self.storage.save_to_db(self.row)
+        self.storage.save_to_db(self.row)
+        self.assertEqual(self._count_on_disk(), 0)
+
+        self.storage.save_to_db(self.row)
+        self.assertEqual(self._count_on_disk(), 3)
+
+    def test_load_sees_buffered_rows(self):
+        self.storage.save_to_db(self.row)
+        self.assertEqual(len(self.storage.load_data()), 1)
+
+    def test_bad_row_only_drops_itself(self):
+        self.storage.save_to_db(self.row)
+        # NOT NULL violation on the second row of the system statement
+        self.storage.save_to_db(dict(self.row, cpu_percent=None))
+        self.storage.save('host', {'timestamp': 0, 'uptime_sec': 1.0, 'users': 1, 'process_count': 1})
+        self.storage.save_to_db(self.row)
+        self.storage.flush()
+
+        with sqlite3.connect(self.db_path) as conn:
+            # the batch is retried row by row: the bad row is undone with its rollups
+            self.assertEqual(self._count_on_disk(), 2)
+            for tier in ROLLUP_TIERS:
+                self.assertEqual(
+                    conn.execute(f'SELECT sum(sample_count) FROM {rollup_table("system_metrics", tier)}').fetchone()[0], 2
+                )
+            # the other statements of the batch are kept
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM host_metrics').fetchone()[0], 1)
+
+    def test_wal_journal(self):
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+class TestLoadSince(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = DataStorage(db_path=Path(self.tmp.name) / 'test.db')
+        for i in range(5):
+            self.storage.save_to_db_system_io_wait({
+                'timestamp': 1_700_000_000_000 + i * 1000,
+                'read_io_bytes_per_sec': 0.0,
+                'write_io_bytes_per_sec': 0.0,
+                'busy_percentage': float(i)
+            })
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_returns_only_new_rows(self):
+        df = self.storage.load_since('system_io_wait', last_id=3)
+        self.assertEqual(list(df['id']), [4, 5])
+
+    def test_limit_keeps_newest(self):
+        df = self.storage.load_since('system_io_wait', last_id=0, limit=2)
+        self.assertEqual(list(df['busy_percentage']), [3.0, 4.0])
+
+    def test_unknown_table(self):
+        with self.assertRaises(ValueError):
+            self.storage.load_since('sqlite_master')
+
+    def test_change_counter_moves_on_append(self):
+        before = self.storage.change_counter('system_io_wait')
+        self.assertEqual(self.storage.change_counter('system_io_wait'), before)
+        self.storage.save_to_db_system_io_wait({
+            'timestamp': 1_700_000_010_000,
+            'read_io_bytes_per_sec': 0.0,
+            'write_io_bytes_per_sec': 0.0,
+            'busy_percentage': 0.0
+        })
+        self.assertNotEqual(self.storage.change_counter('system_io_wait'), before)
+
+class TestTimestamps(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / 'test.db'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _row(self, timestamp, cpu_percent=50.0):
+        return {
+            'timestamp': timestamp,
+            'cpu_percent': cpu_percent,
+            'memory_percent': 60.0,
+            'disk_usage': 70.0,
+            'network_bytes_sent': 1000,
+            'network_bytes_recv': 2000
+        }
+
+    def test_since_until_range(self):
+        storage = DataStorage(db_path=self.db_path)
+        for i in range(10):
+            storage.save_to_db(self._row(1_700_000_000_000 + i * 1000, cpu_percent=i))
+
+        df = storage.load_data(since=1_700_000_002_000, until=1_700_000_005_000)
+        storage.close()
+
+        self.assertEqual(list(df['cpu_percent']), [4.0, 3.0, 2.0])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['timestamp']))
+
+    def test_range_query_uses_timestamp_index(self):
+        DataStorage(db_path=self.db_path).close()
+        with sqlite3.connect(self.db_path) as conn:
+            plan = conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM memory_metrics WHERE timestamp >= 0 ORDER BY timestamp DESC LIMIT 10'
+            ).fetchall()
+        self.assertIn('idx_memory_metrics_timestamp', str(plan))
+
+    def test_migrates_legacy_string_timestamps(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE system_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME NOT NULL,
+                    cpu_percent REAL NOT NULL,
+                    memory_percent REAL NOT NULL,
+                    disk_usage REAL NOT NULL,
+                    network_bytes_sent REAL NOT NULL,
+                    network_bytes_recv REAL NOT NULL
+                )
+            ''')
+            conn.execute("INSERT INTO system_metrics VALUES (NULL, '2024-01-01 12:00:00', 1, 2, 3, 4, 5)")
+
+        storage = DataStorage(db_path=self.db_path)
+        df = storage.load_data()
+        storage.close()
+
+        self.assertEqual(df.iloc[0]['timestamp'], pd.Timestamp('2024-01-01 12:00:00'))
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute('SELECT typeof(timestamp) FROM system_metrics').fetchone()[0], 'integer')
+            # rows from before agent mode belong to this machine
+            self.assertEqual(conn.execute('SELECT host_id FROM system_metrics').fetchone()[0], 0)
+            # and their sampling interval is unknown
+            self.assertIsNone(conn.execute('SELECT interval_ms FROM system_metrics').fetchone()[0])
+
+    def test_new_nullable_fields_are_added_with_their_rollups(self):
+        rates = ('network_bytes_sent_per_sec', 'network_bytes_recv_per_sec')
+        storage = DataStorage(db_path=self.db_path)
+        storage.save_to_db(self._row(1_700_000_000_000))
+        storage.close()
+        # a v5 database, from before the network rates
+        with sqlite3.connect(self.db_path) as conn:
+            for column in rates:
+                conn.execute(f'ALTER TABLE system_metrics DROP COLUMN {column}')
+                for tier in ROLLUP_TIERS:
+                    for name in ('min', 'max', 'sum', 'last'):
+                        conn.execute(f'ALTER TABLE {rollup_table("system_metrics", tier)} DROP COLUMN {column}_{name}')
+            conn.execute('PRAGMA user_version = 5')
+
+        storage = DataStorage(db_path=self.db_path)
+        # a second sample in the bucket that existed before the upgrade
+        storage.save_to_db({**self._row(1_700_000_001_000), 'interval_ms': 1000,
+                            'network_bytes_sent_per_sec': 10.0, 'network_bytes_recv_per_sec': 20.0})
+        storage.close()
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertIsNone(conn.execute('SELECT network_bytes_sent_per_sec FROM system_metrics').fetchone()[0])
+            tier = rollup_table('system_metrics', next(iter(ROLLUP_TIERS)))
+            row = conn.execute(f'SELECT network_bytes_recv_per_sec_min, network_bytes_recv_per_sec_max, '
+                               f'network_bytes_recv_per_sec_sum FROM {tier}').fetchone()
+        self.assertEqual(row, (20.0, 20.0, 20_000.0))
+
+class TestHosts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = DataStorage(db_path=Path(self.tmp.name) / 'test.db', archive_dir=None)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_rows_are_separated_by_host(self):
+        web = self.storage.host_id('web-1')
+        self.assertEqual(self.storage.host_id('web-1'), web)
+        self.assertEqual(list(self.storage.hosts())[1:], [web])
+        for host_id, cpu in ((0, 10.0), (web, 90.0)):
+            self.storage.save('system', {
+                'timestamp': 1_700_000_000_000, 'cpu_percent': cpu, 'memory_percent': 1.0, 'disk_usage': 1.0,
+                'network_bytes_sent': 1, 'network_bytes_recv': 1
+            }, host_id=host_id)
+            self.storage.save('cpu_cores', {
+                'timestamp': 1_700_000_000_000, 'entities': [{'entity': 'cpu0', 'busy_percent': cpu}]
+            }, host_id=host_id)
+
+        self.assertEqual(list(self.storage.load('system')['cpu_percent']), [10.0])
+        self.assertEqual(list(self.storage.load('system', host_id=web)['cpu_percent']), [90.0])
+        self.assertEqual(list(self.storage.load_since('system_metrics', host_id=web)['cpu_percent']), [90.0])
+        # the same core name is a different entity on every host
+        self.assertEqual(list(self.storage.load_breakdown('cpu_cores', host_id=web)['busy_percent']), [90.0])
+        self.assertEqual(list(self.storage.load_breakdown('cpu_cores')['busy_percent']), [10.0])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
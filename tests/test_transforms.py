@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.visualization.transforms import alert_spans, convert_bytes, scale_columns, percent_of, prepare_memory_swap
+from src.visualization.charts import ChartGenerator
+
+GB = 1024**3
+
+class TestTransforms(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'timestamp': pd.date_range('2024-01-01', periods=3, freq='s'),
+            'memory_total': [8 * GB, 8 * GB, 0],
+            'memory_used': [2 * GB, 4 * GB, 0],
+            'memory_available': [6 * GB, 4 * GB, 0],
+            'memory_cached': [GB, GB, 0],
+            'memory_buffers': [0, 0, 0],
+            'swap_total': [GB, GB, GB],
+            'swap_used': [0, GB // 2, 0],
+        })
+
+    def test_convert_bytes_scalar_and_column(self):
+        self.assertEqual(convert_bytes(2048, 'KB'), 2)
+        self.assertEqual(list(convert_bytes(self.df['memory_used'], 'GB')), [2.0, 4.0, 0.0])
+
+    def test_scale_columns_keeps_only_needed_columns(self):
+        scaled = scale_columns(self.df, ['memory_used'], 'GB')
+        self.assertEqual(list(scaled.columns), ['timestamp', 'memory_used'])
+        self.assertEqual(list(scaled['memory_used']), [2.0, 4.0, 0.0])
+        # the source frame is left untouched
+        self.assertEqual(self.df['memory_used'].iloc[0], 2 * GB)
+
+    def test_percent_of_handles_zero(self):
+        self.assertEqual(list(percent_of([1, 1], [4, 0])), [25.0, 0.0])
+
+    def test_memory_usage_percent(self):
+        prepared = prepare_memory_swap(self.df, 'GB')
+        np.testing.assert_allclose(prepared['memory_usage_percent'], [25.0, 50.0, 0.0])
+
+    def test_memory_charts(self):
+        composition = ChartGenerator.create_memory_composition_chart(self.df, unit='GB')
+        self.assertEqual([t.name for t in composition.data],
+                         ['memory_used', 'memory_cached', 'memory_buffers', 'memory_available'])
+        swap = ChartGenerator.create_memory_swap_comparison_chart(self.df, unit='GB')
+        self.assertEqual(len(swap.data), 3)
+    def test_alert_spans_and_annotations(self):
+        t = pd.date_range('2024-01-01', periods=6, freq='min')
+        events = pd.DataFrame({
+            'timestamp': [t[4], t[0], t[2], t[1], t[5]],
+            'rule': ['io', 'cpu', 'cpu', 'old', 'io'],
+            'family': ['system_io_wait', 'system', 'system', 'system', 'system_io_wait'],
+            'severity': ['warning', 'critical', 'critical', 'info', 'warning'],
+            'state': ['resolved', 'firing', 'resolved', 'resolved', 'firing'],
+            'message': ['io', 'cpu', 'cpu', 'old', 'io'],
+        })
+        spans = alert_spans(events, start=t[1], end=t[5])
+        # cpu clipped to the window, io started before it, "old" was over before it
+        self.assertEqual(list(spans['rule']), ['cpu', 'io', 'io'])
+        self.assertEqual(list(spans['start']), [t[1], t[1], t[5]])
+        self.assertEqual(list(spans['active']), [False, False, True])
+
+        fig = ChartGenerator.create_system_io_wait_char(pd.DataFrame({
+            'timestamp': t, 'read_io_bytes_per_sec': 0.0, 'write_io_bytes_per_sec': 0.0, 'busy_percentage': 1.0
+        }))
+        ChartGenerator.annotate_alerts(fig, spans)
+        ChartGenerator.annotate_alerts(fig, spans)
+        self.assertEqual(len([s for s in fig.layout.shapes if s.name == 'alert']), 3)
+        self.assertEqual(len(alert_spans(events.iloc[0:0])), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import socket
+import sqlite3
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.data.agent import AgentSink
+from src.data.ingest import IngestServer
+from src.data.storage import DataStorage
+from src.data.wire import (
+    BATCH, HEADER, MAGIC, MAX_FRAME_SIZE, VERSION, FrameError, codec, decode_batch, decode_hello, encode_batch,
+    parse_address, read_frame
+)
+
+
+class TestWireFormat(unittest.TestCase):
+    def test_rows_round_trip(self):
+        blocks = {
+            'system': [{'timestamp': 1_700_000_000_000, 'cpu_percent': 12.5, 'memory_percent': 50.0,
+                        'disk_usage': None, 'network_bytes_sent': 1, 'network_bytes_recv': 2,
+                        'network_bytes_sent_per_sec': 0.5, 'network_bytes_recv_per_sec': None, 'interval_ms': 5000}],
+            'process': [{'timestamp': 1_700_000_000_000, 'pid': 42, 'name': 'python3', 'cpu_percent': 1.0,
+                         'memory_rss': 1 << 30, 'read_bytes_per_sec': None, 'write_bytes_per_sec': 0.0,
+                         'interval_ms': 5000},
+                        {'timestamp': 1_700_000_000_000, 'pid': 43, 'name': None, 'cpu_percent': 0.0,
+                         'memory_rss': 0, 'read_bytes_per_sec': 0.0, 'write_bytes_per_sec': 0.0,
+                         'interval_ms': None}],
+            'cpu_cores': [{'timestamp': 1_700_000_000_000, 'entity': 'cpu0', 'busy_percent': 99.0, 'interval_ms': 500}],
+        }
+        decoded = dict(decode_batch(encode_batch(blocks)[8:]))
+        self.assertEqual(decoded, blocks)
+
+    def test_truncated_block_is_rejected(self):
+        body = codec('system').encode([{'timestamp': 0, 'cpu_percent': 1.0}])
+        with self.assertRaises(FrameError):
+            codec('system').decode(body[:-1], 1)
+
+    def test_read_frame(self):
+        left, right = socket.socketpair()
+        with left, right:
+            left.sendall(encode_batch({'cpu_cores': [{'timestamp': 0, 'entity': 'cpu0', 'busy_percent': 1.0}]}))
+            left.shutdown(socket.SHUT_WR)
+            frame_type, payload = read_frame(right)
+            self.assertEqual(frame_type, BATCH)
+            self.assertEqual(decode_batch(payload)[0][1][0]['entity'], 'cpu0')
+            self.assertIsNone(read_frame(right))
+
+    def test_oversized_frame_is_rejected_before_reading_it(self):
+        left, right = socket.socketpair()
+        with left, right:
+            left.sendall(HEADER.pack(MAGIC, VERSION, BATCH, MAX_FRAME_SIZE + 1))
+            with self.assertRaises(FrameError):
+                read_frame(right)
+
+    def test_malformed_payloads_raise_frame_errors(self):
+        payload = encode_batch({'process': [{'timestamp': 0, 'pid': 1, 'name': 'init'}]})[HEADER.size:]
+        for broken in (payload[:-3], b'\x06system\x01', b'\x04nics' + bytes(7), payload[:-4] + b'\xff\xfe\xfd\xfc'):
+            with self.assertRaises(FrameError):
+                decode_batch(broken)
+        with self.assertRaises(FrameError):
+            decode_hello(b'\xff')
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('tcp://127.0.0.1:0'), (socket.AF_INET, ('127.0.0.1', 0)))
+        self.assertEqual(parse_address('unix:///tmp/ingest.sock'), (socket.AF_UNIX, '/tmp/ingest.sock'))
+        with self.assertRaises(ValueError):
+            parse_address('udp://127.0.0.1:9500')
+
+
+class TestAgentToIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = DataStorage(db_path=Path(self.tmp.name) / 'test.db', archive_dir=None)
+        self.server = IngestServer('tcp://127.0.0.1:0', self.storage)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.close()
+        self.tmp.cleanup()
+
+    def test_samples_arrive_tagged_with_their_host(self):
+        sink = AgentSink(f'tcp://127.0.0.1:{self.server.server_address[1]}', host='web-1', batch_size=10)
+        for i in range(5):
+            timestamp = 1_700_000_000_000 + i * 1000
+            sink.save('system', {'timestamp': timestamp, 'cpu_percent': float(i), 'memory_percent': 1.0,
+                                 'disk_usage': 1.0, 'network_bytes_sent': 1, 'network_bytes_recv': 1})
+            sink.save('cpu_cores', {'timestamp': timestamp, 'entities': [
+                {'entity': 'cpu0', 'busy_percent': 5.0}, {'entity': 'cpu1', 'busy_percent': 7.5}
+            ]})
+            sink.flush_if_due()
+        sink.close()
+        self.assertEqual(sink.sent_frames, 2)
+
+        deadline = time.monotonic() + 5
+        while self.server.rows < 15 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.rows, 15)
+
+        self.assertEqual(list(self.storage.hosts().values())[1:], ['web-1'])
+        web = self.storage.host_id('web-1')
+        self.assertEqual(list(self.storage.load('system', host_id=web)['cpu_percent']), [4.0, 3.0, 2.0, 1.0, 0.0])
+        self.assertTrue(self.storage.load('system').empty)
+        self.assertEqual(len(self.storage.load_breakdown('cpu_cores', host_id=web)), 10)
+
+    def test_rejected_block_does_not_drop_the_connection(self):
+        save_rows = self.storage.save_rows
+
+        def failing(family_name, rows, host_id):
+            if family_name == 'system':
+                raise sqlite3.OperationalError('database is locked')
+            return save_rows(family_name, rows, host_id)
+
+        sink = AgentSink(f'tcp://127.0.0.1:{self.server.server_address[1]}', host='web-1')
+        with mock.patch.object(self.storage, 'save_rows', side_effect=failing):
+            for i in range(2):
+                timestamp = 1_700_000_000_000 + i * 1000
+                sink.save('system', {'timestamp': timestamp, 'cpu_percent': 1.0})
+                sink.save('cpu_cores', {'timestamp': timestamp, 'entities': [{'entity': 'cpu0', 'busy_percent': 5.0}]})
+                # one frame per sample, both over the same connection
+                sink.flush()
+                deadline = time.monotonic() + 5
+                while self.server.batches <= i and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            sink.close()
+
+        self.assertEqual((self.server.batches, self.server.rows), (2, 2))
+        web = self.storage.host_id('web-1')
+        self.assertEqual(len(self.storage.load_breakdown('cpu_cores', host_id=web)), 2)
+
+    def test_unreachable_server_keeps_batches(self):
+        sink = AgentSink('tcp://127.0.0.1:1', batch_size=1, max_pending=2)
+        for i in range(3):
+            sink.save('system', {'timestamp': i, 'cpu_percent': 1.0})
+            sink.flush()
+        self.assertEqual((sink.sent_frames, sink.dropped_frames, len(sink._unsent)), (0, 1, 2))
+
+
+    def test_flush_does_not_wait_for_the_server(self):
+        sink = AgentSink('tcp://127.0.0.1:1', batch_size=1)
+        # a connection attempt that hangs, as to a host dropping the packets
+        with mock.patch.object(sink, '_connect', side_effect=lambda: time.sleep(0.5)):
+            start = time.monotonic()
+            for i in range(3):
+                sink.save('system', {'timestamp': i, 'cpu_percent': 1.0})
+                sink.flush()
+            self.assertLess(time.monotonic() - start, 0.2)
+            sink.close()
+        self.assertEqual(len(sink._unsent), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()